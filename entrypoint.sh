@@ -5,6 +5,11 @@ python manage.py wait_for_database
 
 type="${1:-prod}"
 
+if [ "$type" = "worker" ]; then
+  # Retries and delayed jobs (enqueue_in) are run only by a worker with the scheduler.
+  exec python manage.py rqworker default --with-scheduler
+fi
+
 if [ "$type" = "dev" ]; then
   uv run pygmentize -S monokai -f html -a .codehilite >/app/seminare/style/static/code.css
 
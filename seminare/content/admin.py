@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from seminare.content.models import MenuGroup, MenuItem, Page, Post
+from seminare.content.utils import invalidate_navbar_menu
 
 
 @admin.register(Page)
@@ -14,15 +15,48 @@ class PostAdmin(admin.ModelAdmin):
     list_display = ["title", "slug", "author"]
 
 
+class InvalidateNavbarMenuAdmin(admin.ModelAdmin):
+    def get_contest_ids(self, objs) -> set[int]:
+        """
+        Returns contests whose navbar menu shows `objs`. Models without a contest
+        field override this.
+        """
+        return {obj.contest_id for obj in objs}
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.invalidate([obj])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.invalidate([obj])
+
+    def delete_queryset(self, request, queryset):
+        objs = list(queryset)
+        super().delete_queryset(request, queryset)
+        self.invalidate(objs)
+
+    def invalidate(self, objs) -> None:
+        for contest_id in self.get_contest_ids(objs):
+            invalidate_navbar_menu(contest_id)
+
+
 @admin.register(MenuGroup)
-class MenuGroupAdmin(admin.ModelAdmin):
+class MenuGroupAdmin(InvalidateNavbarMenuAdmin):
     list_display = ["title", "contest", "order"]
     list_filter = ["contest"]
     list_editable = ["order"]
 
 
 @admin.register(MenuItem)
-class MenuItemAdmin(admin.ModelAdmin):
+class MenuItemAdmin(InvalidateNavbarMenuAdmin):
     list_display = ["title", "group", "order"]
     list_filter = ["group__contest", "group"]
     list_editable = ["order"]
+
+    def get_contest_ids(self, objs) -> set[int]:
+        return set(
+            MenuGroup.objects.filter(
+                id__in=[item.group_id for item in objs]
+            ).values_list("contest_id", flat=True)
+        )
@@ -2,6 +2,7 @@ from django import template
 from django.urls import reverse
 
 from seminare.content.models import MenuItem
+from seminare.content.utils import get_navbar_menu
 from seminare.contests.utils import get_current_contest
 from seminare.users.logic.permissions import is_contest_organizer
 
@@ -11,11 +12,7 @@ register = template.Library()
 @register.inclusion_tag("navbar/menu.html", takes_context=True)
 def navbar_menu(context):
     contest = get_current_contest(context["request"])
-    items = list(
-        MenuItem.objects.filter(group__contest=contest).select_related("group").all()
-    )
-
-    context["items"] = items
+    context["menu"] = get_navbar_menu(contest)
 
     user = context["user"]
     if user.is_authenticated:
@@ -0,0 +1,76 @@
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from seminare.content.models import MenuGroup, MenuItem, Post
+from seminare.content.utils import get_navbar_menu, invalidate_navbar_menu
+from seminare.contests.models import Contest
+from seminare.users.models import User
+
+
+class NavbarMenuCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        site = Site.objects.create(domain="test.localhost", name="test.localhost")
+        cls.contest = Contest.objects.create(
+            name="Test", short_name="test", contact_email="test@example.com", site=site
+        )
+        cls.group = MenuGroup.objects.create(
+            contest=cls.contest, title="Zadania", order=1
+        )
+        MenuItem.objects.create(group=cls.group, title="Úlohy", order=1, url="/ulohy")
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_menu_is_cached(self):
+        menu = get_navbar_menu(self.contest)
+        self.assertIn("Úlohy", menu["computer"])
+        self.assertIn("Úlohy", menu["mobile"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_navbar_menu(self.contest), menu)
+
+    def test_invalidation(self):
+        get_navbar_menu(self.contest)
+        MenuItem.objects.create(
+            group=self.group, title="Výsledky", order=2, url="/vysledky"
+        )
+        self.assertNotIn("Výsledky", get_navbar_menu(self.contest)["computer"])
+
+        invalidate_navbar_menu(self.contest.id)
+        self.assertIn("Výsledky", get_navbar_menu(self.contest)["computer"])
+
+
+class PostListConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        site = Site.objects.create(domain="test.localhost", name="test.localhost")
+        cls.contest = Contest.objects.create(
+            name="Test", short_name="test", contact_email="test@example.com", site=site
+        )
+        cls.author = User.objects.create(username="author")
+
+    def get(self, **headers):
+        return self.client.get(
+            reverse("post_list"), headers={"host": "test.localhost", **headers}
+        )
+
+    def test_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+        response = self.get(if_none_match=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_etag(self):
+        etag = self.get()["ETag"]
+
+        post = Post.objects.create(slug="novinky", title="Novinky", author=self.author)
+        post.contests.add(self.contest)
+
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
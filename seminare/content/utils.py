@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+from seminare.content.models import MenuItem
+from seminare.contests.models import Contest
+from seminare.utils import (
+    bump_cache_version,
+    get_cache_version,
+    get_versioned_cache_timeout,
+)
+
+NAVBAR_MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_menu_version_key(contest_id: int) -> str:
+    return f"navbar_menu/{contest_id}/version"
+
+
+def invalidate_navbar_menu(contest_id: int) -> None:
+    """
+    Invalidates rendered navbar menu of the contest. Must be called after any MenuGroup or MenuItem change.
+    """
+    bump_cache_version(get_menu_version_key(contest_id))
+
+
+def get_navbar_menu(contest: Contest) -> dict[str, SafeString]:
+    """
+    Returns rendered public menu groups of `contest` for the computer and mobile navbar.
+
+    Fragments do not depend on the user, so they are shared between all requests
+    and are valid until invalidate_navbar_menu() is called.
+    """
+    version = get_cache_version(get_menu_version_key(contest.id))
+    key = f"navbar_menu/{contest.id}/{version}"
+    fragments = cache.get(key)
+
+    if fragments is None:
+        items = list(
+            MenuItem.objects.filter(group__contest=contest).select_related("group")
+        )
+        fragments = {
+            "computer": render_to_string(
+                "navbar/_computer_groups.html", {"items": items}
+            ),
+            "mobile": render_to_string("navbar/_mobile_groups.html", {"items": items}),
+        }
+        cache.set(
+            key,
+            fragments,
+            timeout=get_versioned_cache_timeout(NAVBAR_MENU_CACHE_TIMEOUT),
+        )
+
+    return {name: mark_safe(html) for name, html in fragments.items()}
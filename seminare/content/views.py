@@ -1,9 +1,13 @@
+from functools import cached_property
+
+from django.db.models import Count, Max
 from django.http import Http404, HttpRequest, HttpResponseBase
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.views.generic import DetailView, ListView
 
 from seminare.content.models import Page, Post
+from seminare.contests.mixins import ConditionalGetMixin
 from seminare.contests.utils import get_current_contest
 from seminare.users.logic.permissions import has_contest_role, is_contest_organizer
 from seminare.users.models import ContestRole, User
@@ -43,7 +47,7 @@ class PageDetailView(DetailView):
         return ctx
 
 
-class PostListView(ListView):
+class PostListView(ConditionalGetMixin, ListView):
     template_name = "post/list.html"
     paginate_by = 15
 
@@ -53,6 +57,21 @@ class PostListView(ListView):
             "author"
         )
 
+    @cached_property
+    def posts_state(self) -> dict:
+        return Post.objects.filter(
+            contests__id=get_current_contest(self.request).id
+        ).aggregate(updated_at=Max("updated_at"), count=Count("id"))
+
+    def get_etag_parts(self) -> list:
+        return super().get_etag_parts() + [
+            self.posts_state["updated_at"],
+            self.posts_state["count"],
+        ]
+
+    def get_last_modified(self):
+        return self.posts_state["updated_at"]
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["is_organizer"] = isinstance(
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContestsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "seminare.contests"
+
+    def ready(self) -> None:
+        from seminare.contests import signals  # noqa: F401
@@ -10,7 +10,13 @@ from django.utils import timezone
 
 from seminare.contests.models import Contest, RuleData
 from seminare.problems.models import Problem, ProblemSet
-from seminare.submits.models import BaseSubmit, FileSubmit, JudgeSubmit, TextSubmit
+from seminare.submits.models import (
+    BaseSubmit,
+    FileSubmit,
+    GradingStats,
+    JudgeSubmit,
+    TextSubmit,
+)
 from seminare.users.models import Enrollment, Grade, School, User
 
 
@@ -426,9 +432,13 @@ class Command(BaseCommand):
                             ]
                         )
 
+            for submit in submits[0]:
+                submit.is_late = submit.created_at > submit.problem.problem_set.end_date
             FileSubmit.objects.bulk_create(submits[0])
             JudgeSubmit.objects.bulk_create(submits[1])
             TextSubmit.objects.bulk_create(submits[2])
+            # bulk_create bypasses FileSubmit.save(), which maintains the counters.
+            GradingStats.rebuild()
         finally:
             # enable create_at auto dates
             for field in (FileSubmit, JudgeSubmit, TextSubmit):
@@ -0,0 +1,19 @@
+from seminare.contests.models import Contest
+from seminare.contests.utils import get_current_contest
+
+
+class CurrentContestMiddleware:
+    """
+    Attaches the current contest to every request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            get_current_contest(request)
+        except Contest.DoesNotExist:
+            pass
+
+        return self.get_response(request)
@@ -0,0 +1,66 @@
+import hashlib
+from datetime import datetime
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from seminare import VERSION
+from seminare.content.utils import get_menu_version_key
+from seminare.contests.utils import get_current_contest
+from seminare.users.logic.permissions import CONTEST_ROLES_VERSION_KEY
+from seminare.utils import get_cache_version
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified validators to GET responses, so that repeated
+    requests are answered with 304 Not Modified without rendering the view.
+
+    Views extend get_etag_parts() with every value the response depends on
+    and may provide get_last_modified(). By default, responses are private and
+    must be revalidated on every request.
+    """
+
+    cache_control: dict = {"private": True, "no_cache": True}
+
+    def get_etag_parts(self) -> list:
+        """
+        Returns values the response depends on. Defaults to state rendered in the page layout.
+        """
+        contest = get_current_contest(self.request)  # pyright: ignore
+        return [
+            VERSION,
+            self.request.get_full_path(),  # pyright: ignore
+            self.request.user.pk,  # pyright: ignore
+            get_cache_version(CONTEST_ROLES_VERSION_KEY),
+            get_cache_version(get_menu_version_key(contest.id)),
+        ]
+
+    def get_last_modified(self) -> datetime | None:
+        return None
+
+    def get_cache_control(self) -> dict:
+        return self.cache_control
+
+    def dispatch(self, request, *args, **kwargs):
+        # Pending messages are rendered only once, so the page must not be revalidated.
+        if request.method not in ("GET", "HEAD") or get_messages(request):
+            return super().dispatch(request, *args, **kwargs)  # pyright: ignore
+
+        digest = hashlib.sha1(repr(self.get_etag_parts()).encode()).hexdigest()
+        etag = f'"{digest}"'
+        last_modified = self.get_last_modified()
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)  # pyright: ignore
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_cache_control(response, **self.get_cache_control())
+
+        return response
@@ -0,0 +1,17 @@
+from django.contrib.sites.models import Site
+from django.db.models.signals import post_delete, post_save
+
+from seminare.contests.models import Contest
+from seminare.contests.utils import invalidate_contests
+
+for model in (Contest, Site):
+    post_save.connect(
+        invalidate_contests,
+        sender=model,
+        dispatch_uid=f"contest_cache_{model.__name__}",
+    )
+    post_delete.connect(
+        invalidate_contests,
+        sender=model,
+        dispatch_uid=f"contest_cache_{model.__name__}",
+    )
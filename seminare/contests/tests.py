@@ -0,0 +1,42 @@
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase
+
+from seminare.contests.models import Contest
+from seminare.contests.utils import get_contest_by_host
+
+
+class ContestCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.site = Site.objects.create(domain="test.localhost", name="test.localhost")
+        cls.contest = Contest.objects.create(
+            name="Test",
+            short_name="test",
+            contact_email="test@example.com",
+            site=cls.site,
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_lookup_without_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_contest_by_host("test.localhost"), self.contest)
+
+        with self.assertNumQueries(0):
+            contest = get_contest_by_host("test.localhost:8000")
+        self.assertEqual(contest, self.contest)
+        # Requests do not share instances.
+        self.assertIsNot(contest, get_contest_by_host("test.localhost"))
+
+        with self.assertNumQueries(1), self.assertRaises(Contest.DoesNotExist):
+            get_contest_by_host("unknown.localhost")
+
+    def test_invalidation(self):
+        self.site.domain = "other.localhost"
+        self.site.save()
+
+        self.assertEqual(get_contest_by_host("other.localhost"), self.contest)
+        with self.assertRaises(Contest.DoesNotExist):
+            get_contest_by_host("test.localhost")
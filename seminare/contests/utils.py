@@ -1,13 +1,78 @@
-from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.db.models import Q
 from django.http import HttpRequest
+from django.http.request import split_domain_port
 
 from seminare.contests.models import Contest
+from seminare.utils import (
+    bump_cache_version,
+    get_cache_version,
+    get_versioned_cache_timeout,
+)
+
+CONTESTS_VERSION_KEY = "contests/version"
+CONTESTS_CACHE_TIMEOUT = 60 * 60
+
+
+def get_contests_by_domain() -> dict[str, Contest]:
+    """
+    Returns a mapping domain -> Contest with all contests.
+
+    The mapping is stored in the shared cache and is valid until invalidate_contests()
+    is called. Every call returns new Contest instances, which are not shared with
+    other requests.
+    """
+    key = f"contests/{get_cache_version(CONTESTS_VERSION_KEY)}"
+    contests = cache.get(key)
+
+    if contests is None:
+        contests = {
+            contest.site.domain.lower(): contest
+            for contest in Contest.objects.select_related("site")
+        }
+        cache.set(
+            key, contests, timeout=get_versioned_cache_timeout(CONTESTS_CACHE_TIMEOUT)
+        )
+
+    return contests
+
+
+def invalidate_contests(**kwargs) -> None:
+    """
+    Invalidates cached contests. Must be called after any Contest or Site change.
+    """
+    bump_cache_version(CONTESTS_VERSION_KEY)
+
+
+def get_contest_by_host(host: str) -> Contest:
+    """
+    Returns the Contest whose site domain matches `host` (with or without port).
+    """
+    contests = get_contests_by_domain()
+
+    host = host.lower()
+    domain, _ = split_domain_port(host)
+
+    for candidate in (host, domain):
+        if candidate in contests:
+            return contests[candidate]
+
+    # The contest might have been created while the cached mapping was not invalidated.
+    contest = (
+        Contest.objects.select_related("site")
+        .filter(Q(site__domain__iexact=host) | Q(site__domain__iexact=domain))
+        .first()
+    )
+    if contest is None:
+        raise Contest.DoesNotExist(f"No contest for host {host}.")
+
+    invalidate_contests()
+    return contest
 
 
 def get_current_contest(request: HttpRequest) -> Contest:
     if not hasattr(request, "_contest"):
-        site = get_current_site(request)
-        contest = Contest.objects.get(site=site)
+        contest = get_contest_by_host(request.get_host())
 
         setattr(request, "_contest", contest)
 
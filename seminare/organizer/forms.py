@@ -92,7 +92,14 @@ class ProblemSetForm(forms.ModelForm):
 
 
 class ProblemSetCSVExportForm(forms.Form):
+    ALL_TABLES = "__all__"
+
     result_table = forms.ChoiceField(label="Výsledkovka")
+    format = forms.ChoiceField(
+        label="Formát",
+        choices=[("csv", "CSV"), ("xlsx", "Excel (XLSX)")],
+        help_text="Všetky výsledkovky sa v CSV exportujú ako ZIP, v Exceli ako hárky jedného súboru.",
+    )
     include_ghost = forms.BooleanField(
         required=False,
         label="Zahrnúť ghost používateľov",
@@ -104,7 +111,7 @@ class ProblemSetCSVExportForm(forms.Form):
 
         self.fields["result_table"].choices = [
             (key, value) for key, value in rule_engine.get_result_tables().items()
-        ]
+        ] + [(self.ALL_TABLES, "Všetky výsledkovky")]
 
 
 class GradingForm(forms.Form):
@@ -122,6 +129,14 @@ class GradingUploadForm(forms.Form):
     )
 
 
+class RejudgeForm(forms.Form):
+    effective_only = forms.BooleanField(
+        required=False,
+        label="Iba započítané riešenia",
+        help_text="Pretestovať iba riešenia, ktoré sa započítavajú do výsledkov.",
+    )
+
+
 class ProblemForm(forms.ModelForm):
     class Meta:
         model = Problem
@@ -0,0 +1,515 @@
+import csv
+import hashlib
+import multiprocessing
+import os
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+import django_rq
+from django.core.files.storage import storages
+from django.db import connections
+from django.utils import timezone
+from django.utils.text import slugify
+
+from seminare.problems.models import ProblemSet, ProblemSetFrozenResults
+from seminare.rules import RuleEngine
+from seminare.rules.results import ColumnHeader
+from seminare.submits.models import BaseSubmit
+from seminare.users.models import School, User
+from seminare.utils import get_job_progress, set_job_progress, stream_zip
+
+ExportRow = list[str | Decimal]
+
+RESULT_TABLE_HEADER = ["Meno", "Email", "Škola", "Ročník"]
+
+XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+{sheets}
+</Types>"""
+
+XLSX_SHEET_CONTENT_TYPE = '<Override PartName="/xl/worksheets/sheet{id}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+
+XLSX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>{sheets}</sheets>
+</workbook>"""
+
+XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{sheets}
+</Relationships>"""
+
+XLSX_WORKBOOK_SHEET_REL = '<Relationship Id="rId{id}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet{id}.xml"/>'
+
+XLSX_INVALID_SHEET_NAME = re.compile(r"[\[\]:*?/\\]")
+
+
+def get_result_table_rows(data: dict, include_ghost: bool) -> Iterator[ExportRow]:
+    """
+    Yields the header and rows of a serialized result table (see Table.serialize).
+    """
+    yield (
+        RESULT_TABLE_HEADER
+        + [ColumnHeader.deserialize(column).export() for column in data["columns"]]
+        + ["Body spolu"]
+    )
+
+    schools = {
+        int(id): str(School(name=school["name"], address=school["address"]))
+        for id, school in data["_schools"].items()
+    }
+    for row in data["rows"]:
+        if row.get("ghost", False) and not include_ghost:
+            continue
+
+        enrollment = row["enrollment"]
+        user = User(
+            username=enrollment["user"]["username"],
+            first_name=enrollment["user"]["first_name"],
+            last_name=enrollment["user"]["last_name"],
+        )
+        yield (
+            [
+                user.display_name,
+                enrollment["user"]["email"],
+                schools[enrollment["school_id"]],
+                enrollment["grade"],
+            ]
+            + [column["cell"] if column else "" for column in row["columns"]]
+            + [Decimal(row["total"])]
+        )
+
+
+def get_result_tables_sheets(
+    rule_engine: RuleEngine, tables: Iterable[str], include_ghost: bool
+) -> Iterator[tuple[str, Iterator[ExportRow]]]:
+    """
+    Yields (table name, rows) of result tables. Tables are loaded one at a time,
+    when the previous one was consumed.
+    """
+    names = rule_engine.get_result_tables()
+    for table in tables:
+        data = rule_engine.get_result_table_data(table)
+        yield names.get(table, table), get_result_table_rows(data, include_ghost)
+
+
+class _Echo:
+    """
+    File-like object returning what is written, so csv.writer produces lines.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(rows: Iterable[ExportRow]) -> Iterator[str]:
+    """
+    Yields rows formatted as CSV lines, e.g. for a StreamingHttpResponse.
+    """
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def get_xlsx_cell(value: str | Decimal) -> str:
+    if isinstance(value, Decimal):
+        return f"<c><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def get_xlsx_sheet(rows: Iterable[ExportRow]) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    yield '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    for row in rows:
+        yield "<row>" + "".join(get_xlsx_cell(value) for value in row) + "</row>"
+    yield "</sheetData></worksheet>"
+
+
+def get_xlsx_sheet_name(name: str, id: int) -> str:
+    """
+    Returns a unique worksheet name, which has at most 31 characters.
+    """
+    return f"{id}. {XLSX_INVALID_SHEET_NAME.sub('', name)}"[:31]
+
+
+def stream_xlsx(sheets: Iterable[tuple[str, Iterable[ExportRow]]]) -> Iterator[bytes]:
+    """
+    Yields a minimal XLSX workbook with one worksheet per (name, rows) pair.
+
+    Worksheets are written before the workbook parts that list them, so rows are
+    streamed and never held in memory.
+    """
+
+    def get_entries():
+        names = []
+        for id, (name, rows) in enumerate(sheets, start=1):
+            names.append(get_xlsx_sheet_name(name, id))
+            yield f"xl/worksheets/sheet{id}.xml", get_xlsx_sheet(rows)
+
+        ids = range(1, len(names) + 1)
+        yield (
+            "[Content_Types].xml",
+            XLSX_CONTENT_TYPES.format(
+                sheets="\n".join(XLSX_SHEET_CONTENT_TYPE.format(id=id) for id in ids)
+            ),
+        )
+        yield "_rels/.rels", XLSX_RELS
+        yield (
+            "xl/workbook.xml",
+            XLSX_WORKBOOK.format(
+                sheets="".join(
+                    f'<sheet name={quoteattr(name)} sheetId="{id}" r:id="rId{id}"/>'
+                    for id, name in zip(ids, names)
+                )
+            ),
+        )
+        yield (
+            "xl/_rels/workbook.xml.rels",
+            XLSX_WORKBOOK_RELS.format(
+                sheets="\n".join(XLSX_WORKBOOK_SHEET_REL.format(id=id) for id in ids)
+            ),
+        )
+
+    return stream_zip(get_entries())
+
+
+def stream_csv_archive(
+    sheets: Iterable[tuple[str, Iterable[ExportRow]]],
+) -> Iterator[bytes]:
+    """
+    Yields a ZIP archive with one CSV file per (name, rows) pair.
+    """
+    return stream_zip(
+        (f"{slugify(name)}.csv", stream_csv(rows)) for name, rows in sheets
+    )
+
+
+CONTEST_EXPORT_TIMEOUT = 60 * 60
+CONTEST_EXPORT_WORKERS = 4
+
+PROBLEM_STATS_HEADER = ["Kolo", "Úloha", "Názov", "Typ", "Odovzdania", "Riešitelia"]
+SCORE_DISTRIBUTION_HEADER = ["Kolo", "Úloha", "Body", "Riešitelia"]
+
+
+@dataclass
+class ProblemSetExport:
+    """
+    Files and analytics rows of one problem set in the contest export.
+    """
+
+    entries: list[tuple[str, str]] = field(default_factory=list)
+    problem_stats: list[ExportRow] = field(default_factory=list)
+    score_distribution: list[ExportRow] = field(default_factory=list)
+
+
+def export_problem_set(problem_set_id: int) -> ProblemSetExport:
+    """
+    Returns CSV files of all result tables of the problem set, together with submit
+    counts and score distributions of its problems.
+    """
+    problem_set = ProblemSet.objects.select_related("contest").get(id=problem_set_id)
+    rule_engine = problem_set.get_rule_engine()
+    export = ProblemSetExport()
+
+    for name, rows in get_result_tables_sheets(
+        rule_engine, rule_engine.get_result_tables(), include_ghost=False
+    ):
+        export.entries.append(
+            (f"{problem_set.slug}/{slugify(name)}.csv", "".join(stream_csv(rows)))
+        )
+
+    problems = list(problem_set.problems.order_by("number"))
+    enrollments = rule_engine.get_enrollments()
+    # Scores of effective submits, including scores that are not published yet.
+    points: dict[tuple[int, int], Decimal] = defaultdict(Decimal)
+    for submit_cls in BaseSubmit.get_submit_types():
+        accepting = [
+            problem
+            for problem in problems
+            if submit_cls in problem.accepted_submit_classes
+        ]
+        if not accepting:
+            continue
+
+        submits = Counter(
+            submit_cls.objects.filter(problem__in=accepting).values_list(
+                "problem_id", flat=True
+            )
+        )
+        solvers = Counter()
+        for (
+            enrollment_id,
+            problem_id,
+            score,
+        ) in rule_engine.get_enrollments_problems_effective_submits(
+            submit_cls, enrollments, accepting
+        ).values_list("enrollment_id", "problem_id", "score"):
+            solvers[problem_id] += 1
+            points[(enrollment_id, problem_id)] += score or 0
+
+        for problem in accepting:
+            export.problem_stats.append(
+                [
+                    problem_set.slug,
+                    str(problem.number),
+                    problem.name,
+                    submit_cls.type,
+                    str(submits[problem.id]),
+                    str(solvers[problem.id]),
+                ]
+            )
+
+    distribution = Counter(
+        (problem_id, score) for (_, problem_id), score in points.items()
+    )
+    numbers = {problem.id: problem.number for problem in problems}
+    for (problem_id, score), count in sorted(
+        distribution.items(), key=lambda item: (numbers[item[0][0]], item[0][1])
+    ):
+        export.score_distribution.append(
+            [problem_set.slug, str(numbers[problem_id]), score, str(count)]
+        )
+
+    return export
+
+
+def _export_problem_set_in_worker(problem_set_id: int) -> ProblemSetExport:
+    try:
+        return export_problem_set(problem_set_id)
+    finally:
+        connections.close_all()
+
+
+def export_problem_sets(
+    problem_set_ids: list[int], workers: int
+) -> Iterator[ProblemSetExport]:
+    """
+    Yields exports of the problem sets in order, computed by `workers` processes.
+    """
+    if workers <= 1 or len(problem_set_ids) <= 1:
+        yield from map(export_problem_set, problem_set_ids)
+        return
+
+    # Forked workers would otherwise share the database connection of this process.
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(problem_set_ids)),
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        yield from executor.map(_export_problem_set_in_worker, problem_set_ids)
+
+
+def get_contest_export_problem_sets(contest_id: int):
+    return ProblemSet.objects.filter(contest_id=contest_id).order_by("start_date", "id")
+
+
+def get_contest_export_fingerprint(contest_id: int) -> str:
+    """
+    Returns a fingerprint of the problem sets of the contest and versions of frozen
+    results of the finalized ones. Live results are not part of it, since they change
+    with every submit; they are exported as they were when the archive was built.
+    """
+    digest = hashlib.sha1()
+    for problem_set in get_contest_export_problem_sets(contest_id).values_list(
+        "id", "slug", "name", "is_finalized"
+    ):
+        digest.update(f"{problem_set}\0".encode())
+    for frozen in (
+        ProblemSetFrozenResults.objects.filter(
+            problem_set__contest_id=contest_id, problem_set__is_finalized=True
+        )
+        .order_by("problem_set_id", "table")
+        .values_list("problem_set_id", "table", "updated_at")
+    ):
+        digest.update(f"{frozen}\0".encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class ContestExport:
+    name: str
+    fingerprint: str
+    built_at: datetime
+
+
+def get_contest_export_dir(contest_id: int) -> str:
+    return f"exports/{contest_id}"
+
+
+def get_latest_contest_export(contest_id: int) -> ContestExport | None:
+    """
+    Returns the newest finished export archive of the contest, if there is any.
+    Archives are named {fingerprint}-{build timestamp}.zip.
+    """
+    storage = storages["private"]
+    directory = get_contest_export_dir(contest_id)
+    if not storage.exists(directory):
+        return None
+
+    exports = []
+    for file in storage.listdir(directory)[1]:
+        stem, ext = os.path.splitext(file)
+        fingerprint, _, timestamp = stem.partition("-")
+        if ext != ".zip" or not timestamp.isdigit():
+            continue
+        exports.append(
+            ContestExport(
+                name=f"{directory}/{file}",
+                fingerprint=fingerprint,
+                built_at=datetime.fromtimestamp(int(timestamp), tz=UTC),
+            )
+        )
+
+    return max(exports, key=lambda export: export.built_at, default=None)
+
+
+def get_contest_export_building_key(contest_id: int) -> str:
+    return f"contest_export/{contest_id}/building"
+
+
+def get_contest_export_progress_key(contest_id: int) -> str:
+    return f"contest_export/{contest_id}/progress"
+
+
+def start_contest_export_build(contest_id: int) -> bool:
+    """
+    Marks the export of the contest as being built. Returns False if it already is.
+
+    The mark is kept in Redis, as the build runs in a worker.
+    """
+    return bool(
+        django_rq.get_connection().set(
+            get_contest_export_building_key(contest_id),
+            1,
+            nx=True,
+            ex=CONTEST_EXPORT_TIMEOUT,
+        )
+    )
+
+
+def is_contest_export_building(contest_id: int) -> bool:
+    return bool(
+        django_rq.get_connection().exists(get_contest_export_building_key(contest_id))
+    )
+
+
+def set_contest_export_progress(contest_id: int, done: int, total: int) -> None:
+    set_job_progress(
+        get_contest_export_progress_key(contest_id), done, total, CONTEST_EXPORT_TIMEOUT
+    )
+
+
+def get_contest_export_progress(contest_id: int) -> tuple[int, int] | None:
+    """
+    Returns (exported problem sets, total problem sets) while the export is being built.
+    """
+    return get_job_progress(get_contest_export_progress_key(contest_id))
+
+
+def finish_contest_export_build(contest_id: int) -> None:
+    django_rq.get_connection().delete(
+        get_contest_export_building_key(contest_id),
+        get_contest_export_progress_key(contest_id),
+    )
+
+
+def build_contest_export(
+    contest_id: int,
+    progress: Callable[[int, int], None] | None = None,
+    workers: int = CONTEST_EXPORT_WORKERS,
+) -> str:
+    """
+    Writes a ZIP archive with result tables of all problem sets of the contest and
+    statistics of their problems into private storage and returns its name.
+
+    Problem sets are exported in parallel worker processes. When all problem sets are
+    finalized and the newest archive has the same fingerprint, it is returned instead.
+    Previous archives are deleted afterwards.
+    """
+    storage = storages["private"]
+    fingerprint = get_contest_export_fingerprint(contest_id)
+    latest = get_latest_contest_export(contest_id)
+    if (
+        latest is not None
+        and latest.fingerprint == fingerprint
+        and not get_contest_export_problem_sets(contest_id)
+        .filter(is_finalized=False)
+        .exists()
+    ):
+        return latest.name
+
+    directory = get_contest_export_dir(contest_id)
+    previous = []
+    if storage.exists(directory):
+        previous = [
+            f"{directory}/{file}"
+            for file in storage.listdir(directory)[1]
+            if file.endswith(".zip")
+        ]
+    name = f"{directory}/{fingerprint}-{int(timezone.now().timestamp())}.zip"
+
+    problem_set_ids = list(
+        get_contest_export_problem_sets(contest_id).values_list("id", flat=True)
+    )
+    exports = []
+    for export in export_problem_sets(problem_set_ids, workers):
+        exports.append(export)
+        if progress is not None:
+            progress(len(exports), len(problem_set_ids))
+
+    entries = [entry for export in exports for entry in export.entries]
+    entries.append(
+        (
+            "statistiky/ulohy.csv",
+            "".join(
+                stream_csv(
+                    [PROBLEM_STATS_HEADER]
+                    + [row for export in exports for row in export.problem_stats]
+                )
+            ),
+        )
+    )
+    entries.append(
+        (
+            "statistiky/body.csv",
+            "".join(
+                stream_csv(
+                    [SCORE_DISTRIBUTION_HEADER]
+                    + [row for export in exports for row in export.score_distribution]
+                )
+            ),
+        )
+    )
+
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            for chunk in stream_zip(entries):
+                file.write(chunk)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+    for old_name in previous:
+        if old_name != name:
+            storage.delete(old_name)
+
+    return name
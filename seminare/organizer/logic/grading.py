@@ -0,0 +1,471 @@
+import hashlib
+import json
+import os
+import secrets
+import zipfile
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Callable, Iterable
+
+import django_rq
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.template.defaultfilters import slugify
+
+from seminare.problems.models import Problem
+from seminare.rules import RuleEngine, invalidate_problem
+from seminare.submits.models import (
+    BaseSubmit,
+    FileSubmit,
+    JudgeSubmit,
+    TextSubmit,
+)
+from seminare.submits.tasks import schedule_grading_stats_refresh
+from seminare.users.models import Enrollment, User
+from seminare.utils import (
+    ZIP_CHUNK_SIZE,
+    get_job_progress,
+    get_zip_info,
+    set_job_progress,
+    write_zip_entry,
+)
+
+ArchiveEntry = tuple[str, str | FieldFile]
+
+GRADING_ARCHIVE_BUILD_TIMEOUT = 60 * 60
+GRADING_UPLOAD_TIMEOUT = 60 * 60
+
+
+def get_effective_submits(
+    rule_engine: RuleEngine,
+    problem: Problem,
+    enrollments: Iterable[Enrollment],
+    limit_types: Iterable[str] | None = None,
+) -> dict[int, dict[str, BaseSubmit | None]]:
+    """
+    Returns one submit of each type for every user.
+    Returned as dict [enrollment_id][submit_type]
+    """
+    submits_user = defaultdict(dict)
+
+    for submit_cls in BaseSubmit.get_submit_types():
+        if limit_types and submit_cls.type not in limit_types:
+            continue
+
+        submit_objs = rule_engine.get_enrollments_problems_effective_submits(
+            submit_cls, enrollments, [problem]
+        ).select_related("scored_by")
+
+        for submit in submit_objs:
+            submits_user[submit.enrollment_id][submit_cls.type] = submit
+
+    return submits_user
+
+
+def get_grading_archive_entries(
+    rule_engine: RuleEngine, problem: Problem
+) -> list[ArchiveEntry]:
+    """
+    Returns entries of the bulk grading archive, one folder per contestant.
+    """
+    enrollments = list(rule_engine.get_enrollments().select_related("user"))
+    enrollments_by_id = {enrollment.id: enrollment for enrollment in enrollments}
+    submits = get_effective_submits(rule_engine, problem, enrollments)
+
+    entries = []
+    for i, (enrollment_id, data) in enumerate(submits.items()):
+        enrollment = enrollments_by_id[enrollment_id]
+        user_name = slugify(enrollment.user.display_name)
+        zip_path = f"{i:03d}-{user_name}-{enrollment.id}/"
+        for type, submit in data.items():
+            if type == "file":
+                assert isinstance(submit, FileSubmit)
+                # Submits still being processed do not have a file yet.
+                if submit.file:
+                    suffix = Path(submit.file.name).suffix
+                    entries.append((f"{zip_path}{user_name}{suffix}", submit.file))
+                if submit.comment_file:
+                    suffix = Path(submit.comment_file.name).suffix
+                    entries.append(
+                        (f"{zip_path}{user_name}.komentar{suffix}", submit.comment_file)
+                    )
+                score = f"{submit.score}" if submit.score is not None else ""
+                entries.append((f"{zip_path}body.txt", score))
+                entries.append((f"{zip_path}komentar.txt", submit.comment or ""))
+            elif type == "judge":
+                assert isinstance(submit, JudgeSubmit)
+                suffix = Path(submit.program.name or "").suffix
+                entries.append((f"{zip_path}judge{suffix}", submit.program))
+            elif type == "text":
+                assert isinstance(submit, TextSubmit)
+                entries.append((f"{zip_path}answer.txt", submit.value))
+
+    return entries
+
+
+def get_entry_key(content: str | FieldFile) -> str:
+    """
+    Identifies content of an archive entry. Uploaded files get unique names, so their
+    name identifies them; text is identified by its hash.
+    """
+    if isinstance(content, str):
+        return "sha1:" + hashlib.sha1(content.encode()).hexdigest()
+    return f"file:{content.name}"
+
+
+def get_archive_fingerprint(entries: Iterable[ArchiveEntry]) -> str:
+    digest = hashlib.sha1()
+    for name, content in entries:
+        digest.update(f"{name}\0{get_entry_key(content)}\0".encode())
+    return digest.hexdigest()
+
+
+def get_grading_archive_dir(problem_id: int) -> str:
+    return f"grading/{problem_id}"
+
+
+def get_grading_archive_name(problem_id: int, fingerprint: str) -> str:
+    return f"{get_grading_archive_dir(problem_id)}/{fingerprint}.zip"
+
+
+def get_grading_archive_building_key(problem_id: int) -> str:
+    return f"grading_archive/{problem_id}/building"
+
+
+def get_grading_archive_progress_key(problem_id: int) -> str:
+    return f"grading_archive/{problem_id}/progress"
+
+
+def start_grading_archive_build(problem_id: int) -> bool:
+    """
+    Marks the archive of the problem as being built. Returns False if it already is.
+
+    The mark is kept in Redis, as the build runs in a worker.
+    """
+    return bool(
+        django_rq.get_connection().set(
+            get_grading_archive_building_key(problem_id),
+            1,
+            nx=True,
+            ex=GRADING_ARCHIVE_BUILD_TIMEOUT,
+        )
+    )
+
+
+def is_grading_archive_building(problem_id: int) -> bool:
+    return bool(
+        django_rq.get_connection().exists(get_grading_archive_building_key(problem_id))
+    )
+
+
+def set_grading_archive_progress(problem_id: int, done: int, total: int) -> None:
+    set_job_progress(
+        get_grading_archive_progress_key(problem_id),
+        done,
+        total,
+        GRADING_ARCHIVE_BUILD_TIMEOUT,
+    )
+
+
+def get_grading_archive_progress(problem_id: int) -> tuple[int, int] | None:
+    """
+    Returns (written entries, total entries) while the archive is being built.
+    """
+    return get_job_progress(get_grading_archive_progress_key(problem_id))
+
+
+def finish_grading_archive_build(problem_id: int) -> None:
+    django_rq.get_connection().delete(
+        get_grading_archive_building_key(problem_id),
+        get_grading_archive_progress_key(problem_id),
+    )
+
+
+def build_grading_archive(
+    problem_id: int,
+    entries: list[ArchiveEntry],
+    progress: Callable[[int, int], None] | None = None,
+) -> str:
+    """
+    Writes the archive of `entries` into private storage and returns its name.
+
+    Each entry carries its key (see get_entry_key) in the ZIP comment, so entries that
+    did not change are copied from the previous archive of the problem instead of being
+    read from submit storage again. Previous archives are deleted afterwards.
+    """
+    storage = storages["private"]
+    directory = get_grading_archive_dir(problem_id)
+    name = get_grading_archive_name(problem_id, get_archive_fingerprint(entries))
+    if storage.exists(name):
+        return name
+
+    previous = []
+    if storage.exists(directory):
+        previous = [
+            f"{directory}/{file}"
+            for file in storage.listdir(directory)[1]
+            if file.endswith(".zip")
+        ]
+    previous.sort(key=storage.get_modified_time)
+
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    old_archive = zipfile.ZipFile(storage.path(previous[-1])) if previous else None
+    try:
+        reusable = {}
+        if old_archive is not None:
+            reusable = {info.filename: info for info in old_archive.infolist()}
+
+        with zipfile.ZipFile(tmp_path, "w") as zip_file:
+            for i, (entry_name, content) in enumerate(entries):
+                info = get_zip_info(entry_name)
+                info.comment = get_entry_key(content).encode()
+
+                old_info = reusable.get(entry_name)
+                if old_archive and old_info and old_info.comment == info.comment:
+                    with old_archive.open(old_info) as old_entry:
+                        for _ in write_zip_entry(zip_file, info, old_entry):
+                            pass
+                else:
+                    for _ in write_zip_entry(zip_file, info, content):
+                        pass
+
+                if progress is not None:
+                    progress(i + 1, len(entries))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if old_archive is not None:
+            old_archive.close()
+
+    os.replace(tmp_path, path)
+    for old_name in previous:
+        storage.delete(old_name)
+
+    return name
+
+
+UploadError = tuple[str, str]
+
+
+@dataclass
+class GradingUploadStatus:
+    processed: int = 0
+    total: int = 0
+    errors: list[UploadError] = field(default_factory=list)
+    running: bool = True
+
+
+def get_grading_upload_status_key(problem_id: int) -> str:
+    return f"grading_upload/{problem_id}"
+
+
+def get_grading_upload_running_key(problem_id: int) -> str:
+    return f"grading_upload/{problem_id}/running"
+
+
+def get_grading_upload_name(problem_id: int) -> str:
+    return f"{get_grading_archive_dir(problem_id)}/uploads/{secrets.token_hex(16)}.zip"
+
+
+def get_grading_upload_status(problem_id: int) -> GradingUploadStatus | None:
+    """
+    Returns status of the last graded archive upload of the problem. Finished uploads
+    are kept for a while, so that their errors can be shown.
+    """
+    state = django_rq.get_connection().get(get_grading_upload_status_key(problem_id))
+    if state is None:
+        return None
+    state = json.loads(state)
+    state["errors"] = [tuple(error) for error in state["errors"]]
+    return GradingUploadStatus(**state)
+
+
+def set_grading_upload_status(problem_id: int, status: GradingUploadStatus) -> None:
+    django_rq.get_connection().set(
+        get_grading_upload_status_key(problem_id),
+        json.dumps(asdict(status)),
+        ex=GRADING_UPLOAD_TIMEOUT,
+    )
+
+
+def start_grading_upload(problem_id: int) -> bool:
+    """
+    Marks an upload of the problem as being processed. Returns False if one already is.
+
+    The status is kept in Redis, as the upload is processed by a worker.
+    """
+    if not django_rq.get_connection().set(
+        get_grading_upload_running_key(problem_id),
+        1,
+        nx=True,
+        ex=GRADING_UPLOAD_TIMEOUT,
+    ):
+        return False
+    set_grading_upload_status(problem_id, GradingUploadStatus())
+    return True
+
+
+def finish_grading_upload(problem_id: int, status: GradingUploadStatus) -> None:
+    status.running = False
+    set_grading_upload_status(problem_id, status)
+    django_rq.get_connection().delete(get_grading_upload_running_key(problem_id))
+
+
+def get_zip_member_hash(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo) -> str:
+    digest = hashlib.sha256()
+    with zip_file.open(info) as member:
+        while chunk := member.read(ZIP_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_zip_text(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo) -> str:
+    with zip_file.open(info) as member:
+        return member.read().decode("utf-8").strip()
+
+
+def parse_score(text: str) -> Decimal:
+    score = Decimal(text)
+    field = FileSubmit._meta.get_field("score")
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places)  # pyright: ignore
+    if not score.is_finite() or abs(score) >= limit:
+        raise InvalidOperation(text)
+    return score.quantize(Decimal(1).scaleb(-field.decimal_places))  # pyright: ignore
+
+
+def apply_grading_upload(
+    zip_file: zipfile.ZipFile,
+    submits: dict[int, dict[str, BaseSubmit | None]],
+    user: User,
+    progress: Callable[[int, int], None] | None = None,
+) -> list[UploadError]:
+    """
+    Applies scores, comments and comment files from a graded bulk grading archive
+    to the effective file submits and returns the list of (file, error) pairs.
+
+    The archive is processed member by member. PDFs are compared with the submit
+    files by their stored hashes and only changed comment files are copied into
+    storage. Changes are saved with a single bulk update and nothing is saved if
+    any member is invalid.
+    """
+    errors = []
+    changed: dict[int, FileSubmit] = {}
+    hashed: dict[int, FileSubmit] = {}
+    comment_files: dict[int, tuple[zipfile.ZipInfo, str, str]] = {}
+
+    members = [info for info in zip_file.infolist() if not info.is_dir()]
+    for i, info in enumerate(members):
+        if progress is not None:
+            progress(i, len(members))
+
+        try:
+            folder, file_name = info.filename.split("/")[-2:]
+            enrollment_id = int(folder.split("-")[-1])
+        except ValueError:
+            errors.append((info.filename, "Neplatný súbor"))
+            continue
+
+        submit = submits.get(enrollment_id, {}).get("file")
+        if submit is None:
+            continue
+        assert isinstance(submit, FileSubmit)
+
+        if file_name in ("body.txt", "komentar.txt"):
+            try:
+                text = read_zip_text(zip_file, info)
+            except (UnicodeDecodeError, zipfile.BadZipFile):
+                errors.append((info.filename, "Nečitateľný súbor"))
+                continue
+
+            if file_name == "body.txt":
+                if not text:
+                    continue
+                try:
+                    score = parse_score(text)
+                except InvalidOperation:
+                    errors.append((info.filename, f"Neplatný počet bodov: {text}"))
+                    continue
+                if score != submit.score:
+                    submit.score = score
+                    changed[submit.id] = submit
+            elif text != submit.comment:
+                submit.comment = text
+                changed[submit.id] = submit
+
+        elif file_name.endswith(".pdf"):
+            if submit.update_file_hashes():
+                hashed[submit.id] = submit
+
+            try:
+                member_hash = get_zip_member_hash(zip_file, info)
+            except zipfile.BadZipFile:
+                errors.append((info.filename, "Nečitateľný súbor"))
+                continue
+
+            if member_hash not in (submit.file_hash, submit.comment_file_hash):
+                comment_files[submit.id] = (info, file_name, member_hash)
+                changed[submit.id] = submit
+
+    if progress is not None:
+        progress(len(members), len(members))
+
+    if errors:
+        return errors
+
+    stored = []
+    try:
+        for submit_id, (info, file_name, member_hash) in comment_files.items():
+            submit = changed[submit_id]
+            with zip_file.open(info) as member:
+                content = File(member, name=file_name)
+                content.size = info.file_size
+                submit.comment_file.save(file_name, content, save=False)
+            stored.append(submit.comment_file)
+            submit.comment_file_hash = member_hash
+
+        for submit in changed.values():
+            submit.scored_by = user
+            submit.update_scored_at()
+
+        if updated := list((hashed | changed).values()):
+            with transaction.atomic():
+                FileSubmit.objects.bulk_update(
+                    updated,
+                    fields=[
+                        "score",
+                        "scored_at",
+                        "comment",
+                        "comment_file",
+                        "file_hash",
+                        "comment_file_hash",
+                        "scored_by",
+                    ],
+                    batch_size=500,
+                )
+    except Exception:
+        # Submits still point to their previous comment files.
+        for file in stored:
+            file.storage.delete(file.name)
+        raise
+
+    # bulk_update does not send signals, which would invalidate the results.
+    if changed:
+        problem_id = next(iter(changed.values())).problem_id
+        problem_set_id = (
+            Problem.objects.filter(id=problem_id)
+            .values_list("problem_set_id", flat=True)
+            .get()
+        )
+        invalidate_problem(problem_id, problem_set_id)
+        schedule_grading_stats_refresh(problem_id)
+
+    return errors
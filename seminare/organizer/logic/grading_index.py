@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import CharField, F, QuerySet, Value
+
+from seminare.problems.models import Problem
+from seminare.rules import RuleEngine, get_problem_version
+from seminare.submits.models import BaseSubmit, FileSubmit, JudgeSubmit
+from seminare.users.models import User
+from seminare.utils import get_versioned_cache_timeout
+
+GRADING_INDEX_TIMEOUT = 60 * 60
+
+GRADING_INDEX_FIELDS = (
+    "submit_type",
+    "id",
+    "enrollment_id",
+    "enrollment__user_id",
+    "enrollment__user__username",
+    "enrollment__user__first_name",
+    "enrollment__user__last_name",
+    "score",
+    "comment",
+    "scored_by__username",
+    "scored_by__first_name",
+    "scored_by__last_name",
+    "file_name",
+)
+
+
+@dataclass(slots=True, frozen=True)
+class IndexedSubmit:
+    type: str
+    id: int
+    score: Decimal | None
+    comment: str
+    scored_by_name: str
+    file_name: str
+
+    @property
+    def submit_id(self) -> str:
+        return f"{self.type[0].upper()}-{self.id}"
+
+
+@dataclass(slots=True)
+class GradingIndexRow:
+    enrollment_id: int
+    user_id: int
+    user_name: str
+    submits: dict[str, IndexedSubmit] = field(default_factory=dict)
+
+
+def get_display_name(username: str | None, first_name: str, last_name: str) -> str:
+    if username is None:
+        return ""
+    return User(
+        username=username, first_name=first_name, last_name=last_name
+    ).display_name
+
+
+def get_file_name_expression(submit_cls: type[BaseSubmit]):
+    if submit_cls is FileSubmit:
+        return F("file")
+    if submit_cls is JudgeSubmit:
+        return F("program")
+    return Value("", output_field=CharField())
+
+
+def get_grading_index_queryset(rule_engine: RuleEngine, problem: Problem) -> QuerySet:
+    """
+    Returns effective submits of every type for the problem as one UNION query.
+    """
+    enrollments = rule_engine.get_enrollments()
+    querysets = [
+        rule_engine.get_enrollments_problems_effective_submits(
+            submit_cls, enrollments, [problem]
+        )
+        .annotate(
+            submit_type=Value(submit_cls.type, output_field=CharField()),
+            file_name=get_file_name_expression(submit_cls),
+        )
+        .values_list(*GRADING_INDEX_FIELDS)
+        for submit_cls in BaseSubmit.get_submit_types()
+    ]
+    return querysets[0].union(*querysets[1:], all=True)
+
+
+def build_grading_index(
+    rule_engine: RuleEngine, problem: Problem
+) -> list[GradingIndexRow]:
+    rows: dict[int, GradingIndexRow] = {}
+    for (
+        submit_type,
+        id,
+        enrollment_id,
+        user_id,
+        username,
+        first_name,
+        last_name,
+        score,
+        comment,
+        *scored_by,
+        file_name,
+    ) in get_grading_index_queryset(rule_engine, problem):
+        if enrollment_id not in rows:
+            rows[enrollment_id] = GradingIndexRow(
+                enrollment_id=enrollment_id,
+                user_id=user_id,
+                user_name=get_display_name(username, first_name, last_name),
+            )
+        rows[enrollment_id].submits[submit_type] = IndexedSubmit(
+            type=submit_type,
+            id=id,
+            score=score,
+            comment=comment,
+            scored_by_name=get_display_name(*scored_by),
+            file_name=file_name,
+        )
+
+    return sorted(rows.values(), key=lambda row: row.user_id)
+
+
+def get_grading_index_cache_key(problem: Problem) -> str:
+    version = get_problem_version(problem.id)
+    return f"grading_index/{problem.id}/{version}"
+
+
+def get_grading_index(
+    rule_engine: RuleEngine, problem: Problem
+) -> list[GradingIndexRow]:
+    """
+    Returns enrollments with at least one submit for the problem, together with
+    their effective submit of each type.
+
+    The index is cached under the version of the problem, which changes whenever
+    a submit of the problem is created or graded.
+    """
+    key = get_grading_index_cache_key(problem)
+    index = cache.get(key)
+    if index is None:
+        index = build_grading_index(rule_engine, problem)
+        cache.set(
+            key, index, timeout=get_versioned_cache_timeout(GRADING_INDEX_TIMEOUT)
+        )
+    return index
+
+
+def get_grading_neighbours(
+    index: list[GradingIndexRow], submit_type: str, user_id: int
+) -> tuple[IndexedSubmit | None, IndexedSubmit | None]:
+    """
+    Returns the previous and the next ungraded effective submit of the type
+    around the user, in the order of the grading index.
+    """
+    previous = None
+    for row in index:
+        submit = row.submits.get(submit_type)
+        if submit is None or submit.score is not None or row.user_id == user_id:
+            continue
+        if row.user_id > user_id:
+            return previous, submit
+        previous = submit
+
+    return previous, None
@@ -0,0 +1,117 @@
+import zipfile
+
+from django.core.files.storage import storages
+from django_rq import job
+
+from seminare.organizer.logic.export import (
+    CONTEST_EXPORT_TIMEOUT,
+    build_contest_export,
+    finish_contest_export_build,
+    set_contest_export_progress,
+)
+from seminare.organizer.logic.grading import (
+    GRADING_ARCHIVE_BUILD_TIMEOUT,
+    GRADING_UPLOAD_TIMEOUT,
+    GradingUploadStatus,
+    apply_grading_upload,
+    build_grading_archive,
+    finish_grading_archive_build,
+    finish_grading_upload,
+    get_effective_submits,
+    get_grading_archive_entries,
+    set_grading_archive_progress,
+    set_grading_upload_status,
+)
+from seminare.problems.models import Problem
+from seminare.users.models import User
+
+
+@job("default", timeout=GRADING_ARCHIVE_BUILD_TIMEOUT)
+def build_problem_grading_archive(problem_id: int):
+    """
+    Builds the bulk grading archive of a problem into private storage.
+
+    The build has to be started with start_grading_archive_build() first.
+    """
+
+    def set_progress(done: int, total: int):
+        set_grading_archive_progress(problem_id, done, total)
+
+    try:
+        problem = (
+            Problem.objects.filter(id=problem_id)
+            .select_related("problem_set__contest")
+            .first()
+        )
+        if problem is None:
+            return
+
+        rule_engine = problem.problem_set.get_rule_engine()
+        entries = get_grading_archive_entries(rule_engine, problem)
+        build_grading_archive(problem_id, entries, progress=set_progress)
+    finally:
+        finish_grading_archive_build(problem_id)
+
+
+@job("default", timeout=GRADING_UPLOAD_TIMEOUT)
+def apply_problem_grading_upload(problem_id: int, name: str, user_id: int):
+    """
+    Applies a graded archive stored in private storage to the submits of a problem
+    and deletes it afterwards.
+
+    The upload has to be started with start_grading_upload() first.
+    """
+    status = GradingUploadStatus()
+
+    def set_progress(done: int, total: int):
+        status.processed, status.total = done, total
+        set_grading_upload_status(problem_id, status)
+
+    try:
+        problem = (
+            Problem.objects.filter(id=problem_id)
+            .select_related("problem_set__contest")
+            .first()
+        )
+        user = User.objects.filter(id=user_id).first()
+        if problem is None or user is None:
+            return
+
+        rule_engine = problem.problem_set.get_rule_engine()
+        submits = get_effective_submits(
+            rule_engine, problem, rule_engine.get_enrollments(), ["file"]
+        )
+        try:
+            with (
+                storages["private"].open(name) as file,
+                zipfile.ZipFile(file) as zip_file,
+            ):
+                status.errors = apply_grading_upload(
+                    zip_file, submits, user, progress=set_progress
+                )
+        except zipfile.BadZipFile:
+            status.errors = [("", "Súbor nie je platný ZIP.")]
+    except Exception:
+        status.errors = [("", "Pri spracovaní nastala chyba, nič sa neuložilo.")]
+        raise
+    finally:
+        finish_grading_upload(problem_id, status)
+        storages["private"].delete(name)
+
+
+@job("default", timeout=CONTEST_EXPORT_TIMEOUT)
+def build_contest_results_export(contest_id: int):
+    """
+    Builds the export of results and statistics of all problem sets of a contest
+    into private storage.
+
+    The build has to be started with start_contest_export_build() first.
+    """
+
+    def set_progress(done: int, total: int):
+        set_contest_export_progress(contest_id, done, total)
+
+    try:
+        build_contest_export(contest_id, progress=set_progress)
+    finally:
+        finish_contest_export_build(contest_id)
@@ -0,0 +1,333 @@
+import hashlib
+import zipfile
+from decimal import Decimal
+from io import BytesIO
+
+import django_rq
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, storages
+from django.test import SimpleTestCase
+
+from seminare.organizer.logic.export import (
+    build_contest_export,
+    get_latest_contest_export,
+    get_result_table_rows,
+    stream_csv,
+    stream_xlsx,
+)
+from seminare.organizer.logic.grading import (
+    apply_grading_upload,
+    build_grading_archive,
+    get_grading_upload_name,
+    get_grading_upload_running_key,
+    get_grading_upload_status,
+    start_grading_upload,
+)
+from seminare.organizer.logic.grading_index import (
+    GradingIndexRow,
+    IndexedSubmit,
+    get_grading_index,
+    get_grading_neighbours,
+)
+from seminare.organizer.tasks import apply_problem_grading_upload
+from seminare.problems.models import Problem, ProblemSet
+from seminare.rules import get_results_version
+from seminare.submits.models import FileSubmit
+from seminare.submits.tests import (
+    SubmitTestCase,
+    TemporaryMediaMixin,
+    TemporaryPrivateStorageMixin,
+)
+from seminare.users.models import Enrollment, School, User
+
+
+class GradingArchiveTests(
+    TemporaryPrivateStorageMixin, TemporaryMediaMixin, SimpleTestCase
+):
+    def test_incremental_build(self):
+        name = default_storage.save("riesenie.pdf", ContentFile(b"%PDF-1"))
+        pdf = FileSubmit(file=name).file
+
+        first = build_grading_archive(1, [("a/a.pdf", pdf), ("a/body.txt", "1")])
+        # The submit file is not read again, the entry is copied from the first archive.
+        default_storage.delete(name)
+        second = build_grading_archive(1, [("a/a.pdf", pdf), ("a/body.txt", "2")])
+
+        self.assertNotEqual(first, second)
+        self.assertFalse(storages["private"].exists(first))
+        with zipfile.ZipFile(storages["private"].path(second)) as archive:
+            self.assertEqual(archive.read("a/a.pdf"), b"%PDF-1")
+            self.assertEqual(archive.read("a/body.txt"), b"2")
+            self.assertEqual(
+                archive.getinfo("a/a.pdf").compress_type, zipfile.ZIP_STORED
+            )
+
+        self.assertEqual(
+            build_grading_archive(1, [("a/a.pdf", pdf), ("a/body.txt", "2")]), second
+        )
+
+
+class GradingUploadTests(TemporaryPrivateStorageMixin, SubmitTestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
+        cls.grader = User.objects.create(username="grader")
+
+    def build_zip(self, files: dict[str, bytes]) -> BytesIO:
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            for name, content in files.items():
+                zip_file.writestr(
+                    f"000-contestant-{self.enrollment.id}/{name}", content
+                )
+        return buffer
+
+    def upload(self, submit: FileSubmit, files: dict[str, bytes]) -> list:
+        with zipfile.ZipFile(self.build_zip(files)) as zip_file:
+            return apply_grading_upload(
+                zip_file, {self.enrollment.id: {"file": submit}}, self.grader
+            )
+
+    def test_upload(self):
+        submit = FileSubmit.objects.create(
+            problem=self.problem,
+            enrollment=self.enrollment,
+            file=ContentFile(b"%PDF-riesenie", name="riesenie.pdf"),
+        )
+        # Files are hashed only once an upload compares against them.
+        self.assertEqual(submit.file_hash, "")
+
+        errors = self.upload(
+            FileSubmit.objects.get(id=submit.id),
+            {"body.txt": b"1.5x", "contestant.pdf": b"%PDF-komentar"},
+        )
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(FileSubmit.objects.get(id=submit.id).comment_file)
+
+        version = get_results_version(self.problem.problem_set_id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            errors = self.upload(
+                FileSubmit.objects.get(id=submit.id),
+                {
+                    "body.txt": b"7.5",
+                    "komentar.txt": "Pekné".encode(),
+                    "contestant.pdf": b"%PDF-riesenie",
+                    "contestant.komentar.pdf": b"%PDF-komentar",
+                },
+            )
+        self.assertEqual(errors, [])
+        # Grading stats are refreshed in the background.
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_results_version(self.problem.problem_set_id), version + 1)
+
+        submit = FileSubmit.objects.get(id=submit.id)
+        self.assertEqual((submit.score, submit.comment), (Decimal("7.5"), "Pekné"))
+        self.assertIsNotNone(submit.scored_at)
+        self.assertEqual(submit.file_hash, hashlib.sha256(b"%PDF-riesenie").hexdigest())
+        self.assertEqual(submit.comment_file.read(), b"%PDF-komentar")
+        self.assertEqual(
+            submit.comment_file_hash, hashlib.sha256(b"%PDF-komentar").hexdigest()
+        )
+        comment_file = submit.comment_file.name
+
+        # Unchanged files are recognized by their hashes and not stored again.
+        self.assertEqual(self.upload(submit, {"a.komentar.pdf": b"%PDF-komentar"}), [])
+        self.assertEqual(
+            FileSubmit.objects.get(id=submit.id).comment_file.name, comment_file
+        )
+
+    def test_background_upload(self):
+        FileSubmit.objects.create(
+            problem=self.problem,
+            enrollment=self.enrollment,
+            file=ContentFile(b"%PDF-riesenie", name="riesenie.pdf"),
+        )
+        files = {"body.txt": b"abc", "komentar.txt": b"\xff"}
+
+        django_rq.get_connection().delete(
+            get_grading_upload_running_key(self.problem.id)
+        )
+        self.assertTrue(start_grading_upload(self.problem.id))
+        self.assertFalse(start_grading_upload(self.problem.id))
+        name = storages["private"].save(
+            get_grading_upload_name(self.problem.id), self.build_zip(files)
+        )
+        apply_problem_grading_upload(self.problem.id, name, self.grader.id)
+
+        status = get_grading_upload_status(self.problem.id)
+        assert status is not None
+        self.assertFalse(status.running)
+        self.assertEqual((status.processed, status.total), (2, 2))
+        self.assertEqual(
+            [file.split("/")[-1] for file, _ in status.errors],
+            ["body.txt", "komentar.txt"],
+        )
+        self.assertFalse(storages["private"].exists(name))
+        self.assertIsNone(FileSubmit.objects.get().score)
+        self.assertTrue(start_grading_upload(self.problem.id))
+
+
+class GradingIndexTests(SubmitTestCase):
+    def test_index(self):
+        FileSubmit.objects.create(problem=self.problem, enrollment=self.enrollment)
+        submit = FileSubmit.objects.create(
+            problem=self.problem, enrollment=self.enrollment, score=3
+        )
+        rule_engine = self.problem.problem_set.get_rule_engine()
+
+        with self.assertNumQueries(1):
+            index = get_grading_index(rule_engine, self.problem)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index[0].user_name, "contestant")
+        self.assertEqual(index[0].submits["file"].submit_id, submit.submit_id)
+
+        with self.assertNumQueries(0):
+            get_grading_index(rule_engine, self.problem)
+
+        # Submits of other problems do not invalidate the index.
+        other = Problem.objects.create(
+            name="Iná úloha", number=2, problem_set=self.problem.problem_set
+        )
+        FileSubmit.objects.create(problem=other, enrollment=self.enrollment)
+        with self.assertNumQueries(0):
+            get_grading_index(rule_engine, self.problem)
+
+        submit.score = None
+        submit.comment = "Chýba dôkaz."
+        submit.save()
+        file = get_grading_index(rule_engine, self.problem)[0].submits["file"]
+        self.assertEqual(
+            (file.id, file.score, file.comment), (submit.id, None, "Chýba dôkaz.")
+        )
+
+    def test_neighbours(self):
+        index = [
+            GradingIndexRow(
+                enrollment_id=user_id,
+                user_id=user_id,
+                user_name="",
+                submits={"file": IndexedSubmit("file", user_id, score, "", "", "")},
+            )
+            for user_id, score in [(1, None), (2, 5), (3, None), (4, None), (5, 1)]
+        ]
+
+        self.assertEqual(
+            [
+                tuple(
+                    submit and submit.id
+                    for submit in get_grading_neighbours(index, "file", user_id)
+                )
+                for user_id in (1, 2, 3, 5)
+            ],
+            [(None, 3), (1, 3), (1, 4), (4, None)],
+        )
+        self.assertEqual(get_grading_neighbours(index, "judge", 1), (None, None))
+
+
+class ResultTableExportTests(SimpleTestCase):
+    data = {
+        "columns": [{"title": "1", "link": None, "tooltip": "Úloha"}],
+        "rows": [
+            {
+                "rank": 1,
+                "enrollment": {
+                    "id": 1,
+                    "grade": "SS1",
+                    "school_id": 7,
+                    "user": {
+                        "id": 1,
+                        "username": "jozko",
+                        "email": "j@example.com",
+                        "first_name": "Jožko",
+                        "last_name": "Mrkvička",
+                    },
+                },
+                "ghost": False,
+                "columns": [{"cell": "9", "tooltip": None, "ghost": False}],
+                "total": "9.00",
+            },
+            {
+                "rank": None,
+                "enrollment": {
+                    "id": 2,
+                    "grade": "SS2",
+                    "school_id": 7,
+                    "user": {
+                        "id": 2,
+                        "username": "ghost",
+                        "email": "",
+                        "first_name": "",
+                        "last_name": "",
+                    },
+                },
+                "ghost": True,
+                "columns": [None],
+                "total": "0",
+            },
+        ],
+        "_schools": {
+            "7": {
+                "name": "Gymnázium",
+                "short_name": "G",
+                "edu_id": "",
+                "address": "Bratislava",
+            }
+        },
+    }
+
+    def test_csv(self):
+        rows = get_result_table_rows(self.data, include_ghost=False)
+        self.assertEqual(
+            "".join(stream_csv(rows)).splitlines(),
+            [
+                "Meno,Email,Škola,Ročník,1 (Úloha),Body spolu",
+                'Jožko Mrkvička,j@example.com,"Gymnázium, Bratislava",SS1,9,9.00',
+            ],
+        )
+        rows = list(get_result_table_rows(self.data, include_ghost=True))
+        self.assertEqual(rows[2][0], "ghost")
+
+    def test_xlsx(self):
+        sheets = [("Výsledky <A>", get_result_table_rows(self.data, False))]
+        archive = zipfile.ZipFile(BytesIO(b"".join(stream_xlsx(sheets))))
+
+        self.assertIn(
+            'name="1. Výsledky &lt;A&gt;"', archive.read("xl/workbook.xml").decode()
+        )
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn('<t xml:space="preserve">Jožko Mrkvička</t>', sheet)
+        self.assertIn("<c><v>9.00</v></c>", sheet)
+
+
+class ContestExportTests(TemporaryPrivateStorageMixin, SubmitTestCase):
+    def test_build(self):
+        Enrollment.objects.filter(id=self.enrollment.id).update(
+            school=School.objects.create(name="Gymnázium", address="Bratislava")
+        )
+        FileSubmit.objects.create(
+            problem=self.problem, enrollment=self.enrollment, score=4
+        )
+
+        name = build_contest_export(self.contest.id, workers=1)
+        with zipfile.ZipFile(storages["private"].path(name)) as archive:
+            self.assertIn("contestant", archive.read("kolo/spolocna.csv").decode())
+            self.assertEqual(
+                archive.read("statistiky/ulohy.csv").decode().splitlines()[1],
+                "kolo,1,Úloha,file,1,1",
+            )
+            self.assertEqual(
+                archive.read("statistiky/body.csv").decode().splitlines()[1:],
+                ["kolo,1,4.00,1"],
+            )
+
+        self.assertEqual(get_latest_contest_export(self.contest.id).name, name)  # pyright: ignore
+
+        problem_set = ProblemSet.objects.get(id=self.problem.problem_set_id)
+        problem_set.is_finalized = True
+        problem_set.save()
+        new_name = build_contest_export(self.contest.id, workers=1)
+        self.assertNotEqual(new_name, name)
+        self.assertFalse(storages["private"].exists(name))
+
+        # Finalized results are exported again only after they change.
+        self.assertEqual(build_contest_export(self.contest.id, workers=1), new_name)
@@ -18,6 +18,12 @@ app_name = "org"
 urlpatterns = [
     path("", dashboard.ContestDashboardView.as_view(), name="contest_dashboard"),
     path("kola/", problemset.ProblemSetListView.as_view(), name="problemset_list"),
+    path("export/", problemset.ContestExportView.as_view(), name="contest_export"),
+    path(
+        "export/stiahnut/",
+        problemset.ContestExportDownloadView.as_view(),
+        name="contest_export_download",
+    ),
     path(
         "kola/vytvorit/",
         problemset.ProblemSetCreateView.as_view(),
@@ -43,6 +49,11 @@ urlpatterns = [
         grading.GradingPublishView.as_view(),
         name="grading_publish",
     ),
+    path(
+        "kola/<problem_set_slug>/ulohy/<int:number>/opravovanie/pretestovat/",
+        grading.RejudgeView.as_view(),
+        name="grading_rejudge",
+    ),
     path(
         "kola/<problem_set_slug>/ulohy/<int:number>/opravovanie/hromadne/",
         grading.BulkGradingView.as_view(),
@@ -53,6 +64,16 @@ urlpatterns = [
         grading.BulkGradingDownloadView.as_view(),
         name="bulk_grading_download",
     ),
+    path(
+        "kola/<problem_set_slug>/ulohy/<int:number>/opravovanie/hromadne/zip/",
+        grading.BulkGradingArchiveView.as_view(),
+        name="bulk_grading_archive",
+    ),
+    path(
+        "kola/<problem_set_slug>/ulohy/<int:number>/opravovanie/hromadne/nahravanie/",
+        grading.BulkGradingUploadView.as_view(),
+        name="bulk_grading_upload",
+    ),
     path(
         "kola/<problem_set_slug>/ulohy/<int:number>/opravovanie/<submit_id:submit_id>/",
         grading.GradingSubmitView.as_view(),
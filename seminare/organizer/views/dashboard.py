@@ -1,8 +1,56 @@
+from collections import defaultdict
+
 from django.views.generic import TemplateView
 
 from seminare.organizer.views import WithContest
+from seminare.submits.models import GRADING_LATENCY_BUCKETS, GradingStats
 from seminare.users.mixins.permissions import ContestOrganizerRequired
 
 
+def get_latency_label(bucket: int | None) -> str:
+    if bucket is None:
+        return "-"
+    if bucket == len(GRADING_LATENCY_BUCKETS):
+        hours = GRADING_LATENCY_BUCKETS[-1]
+        prefix = "viac ako"
+    else:
+        hours = GRADING_LATENCY_BUCKETS[bucket]
+        prefix = "do"
+    if hours < 24:
+        return f"{prefix} {hours} h"
+    return f"{prefix} {hours // 24} d"
+
+
 class ContestDashboardView(ContestOrganizerRequired, WithContest, TemplateView):
     template_name = "org/contest_dashboard.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+
+        stats = (
+            GradingStats.objects.filter(
+                problem__problem_set__contest=self.contest,
+                problem__problem_set__is_finalized=False,
+            )
+            .select_related("problem__problem_set", "problem__reviewer")
+            .order_by("-problem__problem_set__end_date", "problem__number")
+        )
+        problems = []
+        backlog = defaultdict(int)
+        for problem_stats in stats:
+            problem = problem_stats.problem
+            problems.append(
+                (
+                    problem,
+                    problem_stats,
+                    get_latency_label(problem_stats.get_median_latency_bucket()),
+                )
+            )
+            if problem_stats.ungraded:
+                backlog[problem.reviewer] += problem_stats.ungraded
+
+        ctx["grading_stats"] = problems
+        ctx["reviewer_backlog"] = sorted(
+            backlog.items(), key=lambda item: item[1], reverse=True
+        )
+        return ctx
@@ -1,20 +1,32 @@
-import zipfile
-from collections import defaultdict
-from io import BytesIO
-from pathlib import Path
-from typing import Iterable
-
-from django.core.files.base import ContentFile
-from django.db.models.fields.files import FieldFile
+from django.core.files.storage import storages
 from django.forms import Form
-from django.http import FileResponse, HttpResponseRedirect
-from django.template.defaultfilters import slugify
+from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from django.views.generic import FormView, TemplateView, View
 
-from seminare.organizer.forms import GradingForm, GradingUploadForm
+from seminare.organizer.forms import GradingForm, GradingUploadForm, RejudgeForm
+from seminare.organizer.logic.grading import (
+    get_archive_fingerprint,
+    get_grading_archive_entries,
+    get_grading_archive_name,
+    get_grading_archive_progress,
+    get_grading_upload_name,
+    get_grading_upload_status,
+    is_grading_archive_building,
+    start_grading_archive_build,
+    start_grading_upload,
+)
+from seminare.organizer.logic.grading_index import (
+    IndexedSubmit,
+    get_grading_index,
+    get_grading_neighbours,
+)
+from seminare.organizer.tasks import (
+    apply_problem_grading_upload,
+    build_problem_grading_archive,
+)
 from seminare.organizer.views import (
     MixinProtocol,
     WithBreadcrumbs,
@@ -23,9 +35,11 @@ from seminare.organizer.views import (
 )
 from seminare.organizer.views.generic import GenericFormView
 from seminare.rules import RuleEngine
-from seminare.submits.models import BaseSubmit, FileSubmit, JudgeSubmit, TextSubmit
+from seminare.submits.judge import get_rejudge_progress, start_rejudge
+from seminare.submits.models import BaseSubmit, FileSubmit
+from seminare.submits.tasks import rejudge_problem
 from seminare.users.mixins.permissions import ContestOrganizerRequired
-from seminare.users.models import Enrollment
+from seminare.utils import sendfile
 
 
 class WithSubmitList(WithProblem, MixinProtocol):
@@ -33,44 +47,25 @@ class WithSubmitList(WithProblem, MixinProtocol):
     def rule_engine(self) -> RuleEngine:
         return self.problem.problem_set.get_rule_engine()
 
-    def get_submits(
-        self,
-        enrollments: Iterable[Enrollment],
-        limit_types: Iterable[str] | None = None,
-    ) -> dict[int, dict[str, BaseSubmit | None]]:
+    def get_users_with_submits(self, limit_types=None):
         """
-        Returns one submit of each type for every user.
-        Returned as dict [enrollment_id][submit_type]
+        Returns rows of the grading index with submits of the given types.
         """
-        submits_user = defaultdict(dict)
-
-        for submit_cls in BaseSubmit.get_submit_types():
-            if limit_types and submit_cls.type not in limit_types:
-                continue
-
-            submit_objs = self.rule_engine.get_enrollments_problems_effective_submits(
-                submit_cls, enrollments, [self.problem]
-            ).select_related("scored_by")
-
-            for submit in submit_objs:
-                submits_user[submit.enrollment_id][submit_cls.type] = submit
-
-        return submits_user
-
-    def get_users_with_submits(self, limit_types=None):
         data = []
-        enrollments = self.rule_engine.get_enrollments().select_related("user")
-        submits = self.get_submits(enrollments, limit_types)
-
-        for enrollment in enrollments:
-            row: dict = {"user": enrollment.user}
-            if not submits[enrollment.id]:
+        for row in get_grading_index(self.rule_engine, self.problem):
+            submits = {
+                type: submit
+                for type, submit in row.submits.items()
+                if not limit_types or type in limit_types
+            }
+            if not submits:
                 continue
 
-            row.update(submits[enrollment.id])
+            item: dict = {"user_id": row.user_id, "user_name": row.user_name}
+            item.update(submits)
             if limit_types and len(limit_types) == 1:
-                row["submit"] = submits[enrollment.id].get(limit_types[0])
-            data.append(row)
+                item["submit"] = submits.get(limit_types[0])
+            data.append(item)
 
         return data
 
@@ -98,6 +93,18 @@ class GradingOverviewView(
                 ),
             ),
         ]
+        if self.problem.judge_points > 0:
+            ctx["links"].append(
+                (
+                    "default",
+                    "mdi:refresh",
+                    "Pretestovať",
+                    reverse(
+                        "org:grading_rejudge",
+                        args=[self.problem_set.slug, self.problem.number],
+                    ),
+                ),
+            )
         if not self.problem.points_publicly_visible:
             ctx["links"].append(
                 (
@@ -172,11 +179,41 @@ class GradingSubmitView(ContestOrganizerRequired, WithSubmit, WithSubmitList, Fo
 
         return out
 
+    @cached_property
+    def neighbours(self) -> tuple[IndexedSubmit | None, IndexedSubmit | None]:
+        """
+        Previous and next ungraded submits of the grading queue.
+        """
+        return get_grading_neighbours(
+            get_grading_index(self.rule_engine, self.problem),
+            self.submit.type,
+            self.submit.enrollment.user_id,
+        )
+
+    def get_submit_url(self, submit: IndexedSubmit | BaseSubmit) -> str:
+        return reverse(
+            "org:grading_submit",
+            args=[self.problem.problem_set.slug, self.problem.number, submit.submit_id],
+        )
+
+    def get_prefetch_urls(self) -> list[str]:
+        next_submit = self.neighbours[1]
+        if next_submit is None:
+            return []
+
+        urls = [self.get_submit_url(next_submit)]
+        if next_submit.type == FileSubmit.type and next_submit.file_name:
+            storage = FileSubmit._meta.get_field("file").storage  # pyright: ignore
+            urls.append(storage.url(next_submit.file_name))
+        return urls
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["other_submits"] = self.get_other_submits()
         ctx["other_users"] = self.get_users_with_submits([self.submit.type])
         ctx["points_visible"] = True
+        ctx["previous_submit"], ctx["next_submit"] = self.neighbours
+        ctx["prefetch_urls"] = self.get_prefetch_urls()
         return ctx
 
     def get_initial(self):
@@ -195,18 +232,15 @@ class GradingSubmitView(ContestOrganizerRequired, WithSubmit, WithSubmitList, Fo
         self.submit.comment = form.cleaned_data.get("comment")
         self.submit.score = form.cleaned_data.get("score")
         self.submit.scored_by = self.request.user
+        # The queue is taken before saving, so that it is read from the cached index.
+        next_submit = self.neighbours[1] if "next" in self.request.POST else None
         self.submit.save()
+        if next_submit is not None:
+            return HttpResponseRedirect(self.get_submit_url(next_submit))
         return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
-        return reverse(
-            "org:grading_submit",
-            args=[
-                self.submit.problem.problem_set.slug,
-                self.submit.problem.number,
-                self.submit.submit_id,
-            ],
-        )
+        return self.get_submit_url(self.submit)
 
 
 class GradingPublishView(ContestOrganizerRequired, WithProblem, GenericFormView):
@@ -242,115 +276,69 @@ class GradingPublishView(ContestOrganizerRequired, WithProblem, GenericFormView)
         )
 
 
+class RejudgeView(ContestOrganizerRequired, WithProblem, GenericFormView):
+    form_class = RejudgeForm
+    form_title = "Pretestovať riešenia"
+    form_submit_label = "Pretestovať"
+
+    @property
+    def form_description(self):
+        progress = get_rejudge_progress(self.problem.id)
+        if progress is None:
+            return "Všetky riešenia úlohy sa znova pošlú do testovača."
+        if progress.sending:
+            return f"Prebieha pretestovanie: odoslaných {progress.sent + progress.failed} z {progress.total} riešení."
+        return f"Prebieha pretestovanie: otestovaných {progress.reported} z {progress.sent} riešení, {progress.failed} sa nepodarilo odoslať."
+
+    def get_breadcrumbs(self):
+        return [
+            ("Sady úloh", reverse("org:problemset_list")),
+            (self.problem.problem_set, ""),
+            (
+                "Úlohy",
+                reverse(
+                    "org:problem_list",
+                    args=[self.problem.problem_set.slug],
+                ),
+            ),
+            (self.problem, ""),
+            ("Opravovanie", ""),
+            ("Pretestovať", ""),
+        ]
+
+    def form_valid(self, form):
+        if not start_rejudge(self.problem.id):
+            form.add_error(None, "Pretestovanie tejto úlohy už prebieha.")
+            return self.form_invalid(form)
+
+        rejudge_problem.delay(self.problem.id, form.cleaned_data["effective_only"])
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        return reverse(
+            "org:grading_rejudge", args=[self.problem_set.slug, self.problem.number]
+        )
+
+
 class BulkGradingView(ContestOrganizerRequired, WithSubmitList, GenericFormView):
     form_class = GradingUploadForm
     form_title = "Hromadné opravovanie"
+    form_header_template = "org/grading/_bulk_header.html"
+    form_multipart = True
+
     form_description = mark_safe(
         "Hromadné opravovanie funguje tak, že si stiahneš ZIP so všetkými riešeniami a pozeráš si ich lokálne. Keď niektoré riešenie opravíš, zapíšeš komentár a body do príslušných súborov <code>komentar.txt</code> a <code>body.txt</code> v priečinku riešiteľa. Poprípade môžeš aj nahrať upravený súbor s riešením a komentárom tak, že mu zmeníš príponu z <code>.pdf</code> na <code>.komentar.pdf</code>."
     )
-    form_header_template = "org/grading/_bulk_header.html"
-    form_multipart = True
 
     def form_valid(self, form):
-        enrollments = self.rule_engine.get_enrollments().select_related("user")
-
-        submits = self.get_submits(enrollments)
-
-        with zipfile.ZipFile(form.cleaned_data["file"]) as zip_file:
-            for file_info in zip_file.infolist():
-                if not file_info.is_dir():
-                    try:
-                        folder, file_name = file_info.filename.split("/")[-2:]
-                        user_id = int(folder.split("-")[-1])
-                    except Exception:
-                        form.add_error(
-                            "file", f"Neplatný súbor: {file_info.filename}. "
-                        )
-                        return self.form_invalid(form)
-                    submit = submits[user_id].get("file")
-
-                    if submit is None:
-                        continue
-
-                    assert isinstance(submit, FileSubmit)
-
-                    if not submit:
-                        continue
-
-                    if file_name == "body.txt":
-                        try:
-                            score_rawtext = (
-                                zip_file.read(file_info.filename)
-                                .decode("utf-8")
-                                .strip()
-                            )
-                        except Exception:
-                            form.add_error(
-                                "file", f"Nečitateľný súbor: {file_info.filename}"
-                            )
-                            return self.form_invalid(form)
-                        if not score_rawtext:
-                            continue
-                        try:
-                            score = float(score_rawtext)
-                        except Exception:
-                            form.add_error(
-                                "file",
-                                f"Neplatný počet bodov v {file_info.filename}: {score_rawtext}",
-                            )
-                            return self.form_invalid(form)
-                        if score == submit.score:
-                            continue
-
-                        submit.score = score
-                        submit.scored_by = self.request.user
-                        submit.save(update_fields=["score", "scored_by"])
-                    elif file_name == "komentar.txt":
-                        try:
-                            comment = (
-                                zip_file.read(file_info.filename)
-                                .decode("utf-8")
-                                .strip()
-                            )
-                        except Exception:
-                            form.add_error(
-                                "file", f"Nečitateľný súbor: {file_info.filename}"
-                            )
-                            return self.form_invalid(form)
-                        if comment == submit.comment:
-                            continue
-
-                        submit.comment = comment
-                        submit.scored_by = self.request.user
-                        submit.save(update_fields=["comment", "scored_by"])
-
-                    elif file_name.split(".")[-1] == "pdf":
-                        assert isinstance(submit.comment_file, FieldFile)
-
-                        if (
-                            submit.file
-                            and submit.file.read()
-                            == zip_file.open(file_info.filename).read()
-                        ):
-                            continue
-
-                        if (
-                            submit.comment_file
-                            and submit.comment_file.read()
-                            == zip_file.open(file_info.filename).read()
-                        ):
-                            continue
-
-                        raw_data = zip_file.read(file_info.filename)
-
-                        submit.comment_file.save(
-                            file_name,
-                            ContentFile(raw_data),
-                            save=True,
-                        )
-                        submit.scored_by = self.request.user
-                        submit.save(update_fields=["comment_file", "scored_by"])
+        if not start_grading_upload(self.problem.id):
+            form.add_error("file", "Predchádzajúci nahraný ZIP sa ešte spracúva.")
+            return self.form_invalid(form)
 
+        name = storages["private"].save(
+            get_grading_upload_name(self.problem.id), form.cleaned_data["file"]
+        )
+        apply_problem_grading_upload.delay(self.problem.id, name, self.request.user.id)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -359,7 +347,7 @@ class BulkGradingView(ContestOrganizerRequired, WithSubmitList, GenericFormView)
         return ctx
 
     def get_form_links(self):
-        return [
+        links = [
             (
                 "default",
                 "mdi:download",
@@ -370,10 +358,20 @@ class BulkGradingView(ContestOrganizerRequired, WithSubmitList, GenericFormView)
                 ),
             )
         ]
+        if get_grading_upload_status(self.problem.id) is not None:
+            links.append(
+                (
+                    "default",
+                    "mdi:progress-upload",
+                    "Stav nahrávania",
+                    self.get_success_url(),
+                )
+            )
+        return links
 
     def get_success_url(self):
         return reverse(
-            "org:grading_overview", args=[self.problem_set.slug, self.problem.number]
+            "org:bulk_grading_upload", args=[self.problem_set.slug, self.problem.number]
         )
 
     def get_breadcrumbs(self):
@@ -399,63 +397,113 @@ class BulkGradingView(ContestOrganizerRequired, WithSubmitList, GenericFormView)
         ]
 
 
-class BulkGradingDownloadView(ContestOrganizerRequired, WithSubmitList, View):
+class WithGradingArchive(WithSubmitList):
+    @cached_property
+    def archive_name(self) -> str:
+        entries = get_grading_archive_entries(self.rule_engine, self.problem)
+        return get_grading_archive_name(
+            self.problem.id, get_archive_fingerprint(entries)
+        )
+
+    def is_archive_ready(self) -> bool:
+        return storages["private"].exists(self.archive_name)
+
+    def start_archive_build(self):
+        if start_grading_archive_build(self.problem.id):
+            build_problem_grading_archive.delay(self.problem.id)
+
+
+class BulkGradingDownloadView(ContestOrganizerRequired, WithGradingArchive, View):
     def get(self, request, *args, **kwargs):
-        enrollments = self.rule_engine.get_enrollments().select_related("user")
-        enrollments_by_id = {enrollment.id: enrollment for enrollment in enrollments}
-
-        zip_buffer = BytesIO()
-
-        with zipfile.ZipFile(
-            zip_buffer, "w", compression=zipfile.ZIP_DEFLATED
-        ) as zip_file:
-            i = 0
-            for enrollment_id, data in self.get_submits(enrollments).items():
-                enrollment = enrollments_by_id[enrollment_id]
-                user_name = slugify(enrollment.user.display_name)
-                zip_path = f"{i:03d}-{user_name}-{enrollment.id}/"
-                for type, submit in data.items():
-                    if type == "file":
-                        assert isinstance(submit, FileSubmit)
-                        path = submit.file.path
-                        zip_file.write(
-                            path, f"{zip_path}{user_name}{Path(path).suffix}"
-                        )
-                        if submit.comment_file:
-                            path = submit.file.path
-                            zip_file.write(
-                                path,
-                                f"{zip_path}{user_name}.komentar{Path(path).suffix}",
-                            )
-                        if submit.score is not None:
-                            score = f"{submit.score}"
-                        else:
-                            score = ""
-                        zip_file.writestr(
-                            f"{zip_path}body.txt",
-                            score,
-                        )
-                        if submit.comment:
-                            comment = submit.comment
-                        else:
-                            comment = ""
-                        zip_file.writestr(f"{zip_path}komentar.txt", comment)
-                    elif type == "judge":
-                        assert isinstance(submit, JudgeSubmit)
-                        path = submit.program.path
-                        zip_file.write(path, f"{zip_path}judge{Path(path).suffix}")
-                    elif type == "text":
-                        assert isinstance(submit, TextSubmit)
-                        zip_file.writestr(
-                            f"{zip_path}answer.txt",
-                            submit.value,
-                        )
-                i += 1
-
-        zip_buffer.seek(0)
-
-        return FileResponse(
-            zip_buffer,
-            as_attachment=True,
-            filename=f"{self.problem.name}.zip",
+        if self.is_archive_ready():
+            return sendfile(
+                storages["private"].path(self.archive_name), as_attachement=True
+            )
+
+        self.start_archive_build()
+        return HttpResponseRedirect(
+            reverse(
+                "org:bulk_grading_archive",
+                args=[self.problem_set.slug, self.problem.number],
+            )
+        )
+
+
+class BulkGradingArchiveView(
+    ContestOrganizerRequired, WithGradingArchive, WithBreadcrumbs, TemplateView
+):
+    template_name = "org/grading/archive.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["problem"] = self.problem
+        ctx["ready"] = self.is_archive_ready()
+        ctx["building"] = is_grading_archive_building(self.problem.id)
+        ctx["progress"] = get_grading_archive_progress(self.problem.id)
+        ctx["download_url"] = reverse(
+            "org:bulk_grading_download",
+            args=[self.problem_set.slug, self.problem.number],
+        )
+        return ctx
+
+    def get_breadcrumbs(self):
+        return [
+            ("Sady úloh", reverse("org:problemset_list")),
+            (self.problem.problem_set, ""),
+            (
+                "Úlohy",
+                reverse(
+                    "org:problem_list",
+                    args=[self.problem.problem_set.slug],
+                ),
+            ),
+            (self.problem, ""),
+            (
+                "Hromadné opravovanie",
+                reverse(
+                    "org:bulk_grading",
+                    args=[self.problem_set.slug, self.problem.number],
+                ),
+            ),
+            ("ZIP na opravovanie", ""),
+        ]
+
+
+class BulkGradingUploadView(
+    ContestOrganizerRequired, WithProblem, WithBreadcrumbs, TemplateView
+):
+    template_name = "org/grading/upload.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["problem"] = self.problem
+        ctx["status"] = get_grading_upload_status(self.problem.id)
+        ctx["upload_url"] = reverse(
+            "org:bulk_grading", args=[self.problem_set.slug, self.problem.number]
         )
+        ctx["overview_url"] = reverse(
+            "org:grading_overview", args=[self.problem_set.slug, self.problem.number]
+        )
+        return ctx
+
+    def get_breadcrumbs(self):
+        return [
+            ("Sady úloh", reverse("org:problemset_list")),
+            (self.problem.problem_set, ""),
+            (
+                "Úlohy",
+                reverse(
+                    "org:problem_list",
+                    args=[self.problem.problem_set.slug],
+                ),
+            ),
+            (self.problem, ""),
+            (
+                "Hromadné opravovanie",
+                reverse(
+                    "org:bulk_grading",
+                    args=[self.problem_set.slug, self.problem.number],
+                ),
+            ),
+            ("Nahrávanie", ""),
+        ]
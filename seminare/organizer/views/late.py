@@ -1,4 +1,3 @@
-from django.db.models import F
 from django.forms import Form
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
@@ -16,8 +15,7 @@ class WithLatesubmitQuerySet(MixinProtocol):
         contest = get_current_contest(self.request)
 
         return FileSubmit.objects.filter(
-            problem__problem_set__contest=contest,
-            created_at__gt=F("problem__problem_set__end_date"),
+            problem__problem_set__contest=contest, is_late=True
         ).select_related(
             "enrollment__user",
             "problem__problem_set",
@@ -29,6 +27,7 @@ class LateSubmitListView(
 ):
     table_title = "Zoznam oneskorených odovzdaní"
     table_class = LateSubmitTable
+    paginate_by = 50
 
     def get_breadcrumbs(self) -> list[tuple[str, str]]:
         return [("Oneskorenci", "")]
@@ -45,9 +44,9 @@ class LateSubmitAcceptView(
 
     def get_object(self) -> FileSubmit:
         return get_object_or_404(
-            self.get_queryset()
-            .select_related("problem__problem_set", "enrollment__user")
-            .filter(late_accepted=False, id=self.kwargs["submit_id"].split("-")[1])
+            self.get_queryset().filter(
+                late_accepted=False, id=self.kwargs["submit_id"].split("-")[1]
+            )
         )
 
     @property
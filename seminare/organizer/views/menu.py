@@ -3,6 +3,7 @@ from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView, UpdateView
 
 from seminare.content.models import MenuGroup, MenuItem
+from seminare.content.utils import invalidate_navbar_menu
 from seminare.contests.utils import get_current_contest
 from seminare.organizer.forms import MenuGroupForm, MenuItemForm
 from seminare.organizer.tables import MenuGroupTable, MenuItemTable
@@ -28,6 +29,13 @@ class WithMenuItemQuerySet(MixinProtocol):
         return MenuItem.objects.filter(group__contest=contest)
 
 
+class InvalidateNavbarMenuMixin(MixinProtocol):
+    def form_valid(self, form):
+        response = super().form_valid(form)  # pyright: ignore
+        invalidate_navbar_menu(get_current_contest(self.request).id)
+        return response
+
+
 class MenuGroupListView(ContestAdminRequired, WithMenuGroupQuerySet, GenericTableView):
     table_title = "Zoznam skupín menu"
     table_class = MenuGroupTable
@@ -40,7 +48,11 @@ class MenuGroupListView(ContestAdminRequired, WithMenuGroupQuerySet, GenericTabl
 
 
 class MenuGroupUpdateView(
-    ContestAdminRequired, WithMenuGroup, GenericFormTableView, UpdateView
+    ContestAdminRequired,
+    InvalidateNavbarMenuMixin,
+    WithMenuGroup,
+    GenericFormTableView,
+    UpdateView,
 ):
     form_table_title = "Upraviť menu skupinu"
     form_class = MenuGroupForm
@@ -76,7 +88,9 @@ class MenuGroupUpdateView(
         ]
 
 
-class MenuGroupCreateView(ContestAdminRequired, GenericFormView, CreateView):
+class MenuGroupCreateView(
+    ContestAdminRequired, InvalidateNavbarMenuMixin, GenericFormView, CreateView
+):
     form_title = "Nová menu skupina"
     form_class = MenuGroupForm
     success_url = reverse_lazy("org:menu_group_list")
@@ -100,7 +114,10 @@ class MenuGroupCreateView(ContestAdminRequired, GenericFormView, CreateView):
 
 
 class MenuGroupDeleteView(
-    ContestAdminRequired, WithMenuGroupQuerySet, GenericDeleteView
+    ContestAdminRequired,
+    InvalidateNavbarMenuMixin,
+    WithMenuGroupQuerySet,
+    GenericDeleteView,
 ):
     success_url = reverse_lazy("org:menu_group_list")
 
@@ -138,7 +155,11 @@ class MenuItemListView(ContestAdminRequired, WithMenuGroup, GenericTableView):
 
 
 class MenuItemUpdateView(
-    ContestAdminRequired, WithMenuItem, GenericFormView, UpdateView
+    ContestAdminRequired,
+    InvalidateNavbarMenuMixin,
+    WithMenuItem,
+    GenericFormView,
+    UpdateView,
 ):
     form_table_title = "Upraviť položku menu"
     form_class = MenuItemForm
@@ -165,7 +186,11 @@ class MenuItemUpdateView(
 
 
 class MenuItemCreateView(
-    ContestAdminRequired, WithMenuGroup, GenericFormView, CreateView
+    ContestAdminRequired,
+    InvalidateNavbarMenuMixin,
+    WithMenuGroup,
+    GenericFormView,
+    CreateView,
 ):
     form_title = "Nová položka menu"
     form_class = MenuItemForm
@@ -187,7 +212,9 @@ class MenuItemCreateView(
         ]
 
 
-class MenuItemDeleteView(ContestAdminRequired, WithMenuItem, GenericDeleteView):
+class MenuItemDeleteView(
+    ContestAdminRequired, InvalidateNavbarMenuMixin, WithMenuItem, GenericDeleteView
+):
     def get_object(self, queryset=None):
         return self.menu_item
 
@@ -1,15 +1,27 @@
-import csv
 from functools import cached_property
-from io import StringIO
 
+from django.core.files.storage import storages
 from django.db.models import QuerySet
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse
-from django.views.generic import CreateView, UpdateView
+from django.views.generic import CreateView, TemplateView, UpdateView, View
 
 from seminare.organizer.forms import ProblemSetCSVExportForm, ProblemSetForm
+from seminare.organizer.logic.export import (
+    ContestExport,
+    get_contest_export_fingerprint,
+    get_contest_export_progress,
+    get_latest_contest_export,
+    get_result_tables_sheets,
+    is_contest_export_building,
+    start_contest_export_build,
+    stream_csv,
+    stream_csv_archive,
+    stream_xlsx,
+)
 from seminare.organizer.tables import ProblemSetTable, ProblemTable
-from seminare.organizer.views import WithContest, WithProblemSet
+from seminare.organizer.tasks import build_contest_results_export
+from seminare.organizer.views import WithBreadcrumbs, WithContest, WithProblemSet
 from seminare.organizer.views.generic import (
     GenericFormTableView,
     GenericFormView,
@@ -22,6 +34,7 @@ from seminare.users.mixins.permissions import (
     ContestAdminRequired,
     ContestOrganizerRequired,
 )
+from seminare.utils import sendfile
 
 
 class ProblemSetListView(ContestOrganizerRequired, WithContest, GenericTableView):
@@ -41,12 +54,18 @@ class ProblemSetListView(ContestOrganizerRequired, WithContest, GenericTableView
             return []
 
         return [
+            (
+                "blue",
+                "mdi:download",
+                "Export súťaže",
+                reverse("org:contest_export"),
+            ),
             (
                 "green",
                 "mdi:plus",
                 "Pridať",
                 reverse("org:problemset_create"),
-            )
+            ),
         ]
 
     def get_table_context(self):
@@ -151,40 +170,81 @@ class ProblemSetCSVExportView(ContestAdminRequired, WithProblemSet, GenericFormV
         return kw
 
     def form_valid(self, form):
-        response = HttpResponse()
-        response["Content-Type"] = "text/csv"
-        response["Content-Disposition"] = (
-            f'attachment; filename="{self.problem_set.contest.short_name}-{self.problem_set.slug}.csv"'
-        )
-        csv_buffer = StringIO()
-        w = csv.writer(csv_buffer)
-
-        table_data = self.rule_engine.get_result_table(
-            form.cleaned_data["result_table"]
+        result_table = form.cleaned_data["result_table"]
+        if result_table == ProblemSetCSVExportForm.ALL_TABLES:
+            tables = list(self.rule_engine.get_result_tables())
+        else:
+            tables = [result_table]
+        sheets = get_result_tables_sheets(
+            self.rule_engine, tables, form.cleaned_data["include_ghost"]
         )
 
-        w.writerow(
-            ["Meno", "Email", "Škola", "Ročník"]
-            + [c.export() for c in table_data.columns]
-            + ["Body spolu"]
-        )
-        for row in table_data.rows:
-            if row.ghost and not form.cleaned_data["include_ghost"]:
-                continue
-
-            w.writerow(
-                [
-                    row.enrollment.user.display_name,
-                    row.enrollment.user.email,
-                    row.enrollment.school,
-                    row.enrollment.grade,
-                ]
-                + [col.export() if col else "" for col in row.columns]
-                + [row.total]
+        name = f"{self.problem_set.contest.short_name}-{self.problem_set.slug}"
+        if form.cleaned_data["format"] == "xlsx":
+            response = StreamingHttpResponse(
+                stream_xlsx(sheets),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
+            name = f"{name}.xlsx"
+        elif len(tables) > 1:
+            response = StreamingHttpResponse(
+                stream_csv_archive(sheets), content_type="application/zip"
+            )
+            name = f"{name}.zip"
+        else:
+            response = StreamingHttpResponse(
+                stream_csv(next(sheets)[1]), content_type="text/csv"
+            )
+            name = f"{name}.csv"
 
-        response.write(csv_buffer.getvalue())
+        response["Content-Disposition"] = f'attachment; filename="{name}"'
         return response
 
     def get_success_url(self) -> str:
         return reverse("org:problemset_list")
+
+
+class WithContestExport(WithContest):
+    @cached_property
+    def latest_export(self) -> ContestExport | None:
+        return get_latest_contest_export(self.contest.id)
+
+
+class ContestExportDownloadView(ContestAdminRequired, WithContestExport, View):
+    def get(self, request, *args, **kwargs):
+        if self.latest_export is None:
+            return HttpResponseRedirect(reverse("org:contest_export"))
+
+        return sendfile(
+            storages["private"].path(self.latest_export.name), as_attachement=True
+        )
+
+
+class ContestExportView(
+    ContestAdminRequired, WithContestExport, WithBreadcrumbs, TemplateView
+):
+    template_name = "org/export.html"
+
+    def post(self, request, *args, **kwargs):
+        if start_contest_export_build(self.contest.id):
+            build_contest_results_export.delay(self.contest.id)
+        return HttpResponseRedirect(reverse("org:contest_export"))
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["export"] = self.latest_export
+        ctx["outdated"] = (
+            self.latest_export is not None
+            and self.latest_export.fingerprint
+            != get_contest_export_fingerprint(self.contest.id)
+        )
+        ctx["building"] = is_contest_export_building(self.contest.id)
+        ctx["progress"] = get_contest_export_progress(self.contest.id)
+        ctx["download_url"] = reverse("org:contest_export_download")
+        return ctx
+
+    def get_breadcrumbs(self):
+        return [
+            ("Sady úloh", reverse("org:problemset_list")),
+            ("Export súťaže", ""),
+        ]
@@ -10,6 +10,7 @@ from seminare.organizer.views.generic import (
     GenericFormView,
     GenericTableView,
 )
+from seminare.users.logic.permissions import invalidate_contest_roles
 from seminare.users.mixins.permissions import ContestAdminRequired
 from seminare.users.models import ContestRole
 
@@ -20,6 +21,13 @@ class WithRoleQuerySet(MixinProtocol):
         return ContestRole.objects.filter(contest=contest)
 
 
+class InvalidateRolesMixin:
+    def form_valid(self, form):
+        response = super().form_valid(form)  # pyright: ignore
+        invalidate_contest_roles()
+        return response
+
+
 class RoleListView(ContestAdminRequired, WithRoleQuerySet, GenericTableView):
     table_title = "Zoznam organizátorov"
     table_class = RoleTable
@@ -33,7 +41,11 @@ class RoleListView(ContestAdminRequired, WithRoleQuerySet, GenericTableView):
 
 
 class RoleUpdateView(
-    ContestAdminRequired, WithRoleQuerySet, GenericFormView, UpdateView
+    ContestAdminRequired,
+    InvalidateRolesMixin,
+    WithRoleQuerySet,
+    GenericFormView,
+    UpdateView,
 ):
     form_title = "Upraviť organizátora"
     form_class = RoleForm
@@ -52,7 +64,9 @@ class RoleUpdateView(
         ]
 
 
-class RoleCreateView(ContestAdminRequired, GenericFormView, CreateView):
+class RoleCreateView(
+    ContestAdminRequired, InvalidateRolesMixin, GenericFormView, CreateView
+):
     form_title = "Nový organizátor"
     form_class = RoleForm
     success_url = reverse_lazy("org:role_list")
@@ -75,7 +89,9 @@ class RoleCreateView(ContestAdminRequired, GenericFormView, CreateView):
         ]
 
 
-class RoleDeleteView(ContestAdminRequired, WithRoleQuerySet, GenericDeleteView):
+class RoleDeleteView(
+    ContestAdminRequired, InvalidateRolesMixin, WithRoleQuerySet, GenericDeleteView
+):
     success_url = reverse_lazy("org:role_list")
 
     def get_breadcrumbs(self) -> list[tuple[str, str]]:
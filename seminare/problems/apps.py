@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProblemsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "seminare.problems"
+
+    def ready(self) -> None:
+        from seminare.problems import signals  # noqa: F401
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from seminare.problems.models import ProblemSet
+from seminare.rules import RuleEngine
+
+
+class Command(BaseCommand):
+    help = "Measure how long it takes to build result tables of problem sets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "problem_sets",
+            nargs="*",
+            help="Slugs of problem sets to measure, all by default.",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def measure(self, func, repeat: int) -> tuple[float, int]:
+        """
+        Returns the best time of `repeat` runs of `func` and the number of queries it made.
+        """
+        best = float("inf")
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - start)
+        return best, len(queries)
+
+    def benchmark(self, rule_engine: RuleEngine, repeat: int):
+        problem_set = rule_engine.problem_set
+        enrollments = list(rule_engine.get_enrollments())
+        problems = list(problem_set.problems.all())
+
+        duration, queries = self.measure(
+            lambda: rule_engine.get_enrollments_problems_scores(enrollments, problems),
+            repeat,
+        )
+        self.stdout.write(
+            f"{problem_set.slug}: scores of {len(enrollments)} enrollments "
+            f"in {duration * 1000:.1f} ms ({queries} queries)"
+        )
+
+        for table in rule_engine.get_result_tables():
+            duration, queries = self.measure(
+                lambda: rule_engine.build_result_table(table), repeat
+            )
+            self.stdout.write(
+                f"{problem_set.slug}: table {table} "
+                f"in {duration * 1000:.1f} ms ({queries} queries)"
+            )
+
+    def handle(self, *args, **options):
+        problem_sets = ProblemSet.objects.select_related("contest").order_by("id")
+        if options["problem_sets"]:
+            problem_sets = problem_sets.filter(slug__in=options["problem_sets"])
+
+        for problem_set in problem_sets:
+            # Measure building the tables from submits, not loading frozen results.
+            problem_set.is_finalized = False
+            self.benchmark(problem_set.get_rule_engine(), options["repeat"])
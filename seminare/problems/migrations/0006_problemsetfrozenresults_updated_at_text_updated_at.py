@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0005_problemset_solutions_public"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problemsetfrozenresults",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="text",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
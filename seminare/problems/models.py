@@ -1,16 +1,16 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from pathlib import PurePath
 from typing import TYPE_CHECKING, Self, Type, TypedDict
 
 from django.conf import settings
 from django.core.files.storage import storages
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Manager, UniqueConstraint
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
 
-from seminare.rules import RuleEngine, get_rule_engine_class
+from seminare.rules import RuleEngine, get_rule_engine_class, invalidate_problem
 from seminare.submits.models import BaseSubmit, FileSubmit, JudgeSubmit, TextSubmit
 from seminare.users.logic.permissions import is_contest_organizer
 from seminare.users.logic.schools import date_to_academic_year
@@ -96,18 +96,57 @@ class ProblemSet(models.Model):
             self.get_rule_engine().close_problemset()
             self.is_finalized = True
 
-        return super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # New problem sets have no submits; a deferred end date was not changed.
+            if (
+                not adding
+                and "end_date" in self.__dict__
+                and self._end_date != self.end_date
+            ):
+                self.update_late_submits()
+        self._end_date = self.__dict__.get("end_date")
 
     _is_finalized: bool = False
+    _end_date: datetime | None = None
 
     @classmethod
     def from_db(cls, *args, **kwargs) -> Self:
         instance = super().from_db(*args, **kwargs)
 
         instance._is_finalized = instance.is_finalized
+        instance._end_date = instance.__dict__.get("end_date")
 
         return instance
 
+    def update_late_submits(self):
+        """
+        Recomputes the late flag of file submits after the deadline changed.
+
+        Called by save(), so the end date has to be changed through save(). Code that
+        updates it on a queryset has to call this for each updated problem set.
+        """
+        submits = FileSubmit.objects.filter(problem__problem_set=self)
+        updated = submits.filter(created_at__gt=self.end_date, is_late=False).update(
+            is_late=True
+        )
+        updated += submits.filter(created_at__lte=self.end_date, is_late=True).update(
+            is_late=False
+        )
+        if not updated:
+            return
+
+        # Queryset updates send no signals, so cached problems are invalidated here.
+        problem_ids = list(self.problems.values_list("id", flat=True))
+
+        def invalidate():
+            for problem_id in problem_ids:
+                invalidate_problem(problem_id, self.id)
+
+        transaction.on_commit(invalidate)
+
     def get_rule_engine(self) -> RuleEngine:
         class_ = get_rule_engine_class(self.rule_engine)
         return class_(self)
@@ -151,6 +190,7 @@ class ProblemSetFrozenResults(models.Model):
     )
     table = models.CharField(max_length=64)
     data = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("problem_set", "table")
@@ -274,6 +314,7 @@ class Text(models.Model):
     problem = models.ForeignKey(
         Problem, on_delete=models.CASCADE, related_name="text_set"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["problem", "type"]
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save
+
+from seminare.contests.models import RuleData
+from seminare.problems.models import Problem, ProblemSet, ProblemSetFrozenResults
+from seminare.rules import (
+    invalidate_contest_results,
+    invalidate_problem,
+    invalidate_results,
+)
+from seminare.submits.models import FileSubmit, JudgeSubmit, TextSubmit
+from seminare.users.models import ContestRole, Enrollment
+
+
+def invalidate_problem_set_results(sender, instance, **kwargs):
+    invalidate_results(instance.problem_set_id)
+
+
+def invalidate_problem_results(sender, instance, **kwargs):
+    invalidate_problem(instance.id, instance.problem_set_id)
+
+
+def invalidate_submit_results(sender, instance, **kwargs):
+    # The problem is usually loaded already, otherwise fetch only what is needed.
+    if sender.problem.is_cached(instance):
+        problem_set_id = instance.problem.problem_set_id
+    else:
+        problem_set_id = (
+            Problem.objects.filter(id=instance.problem_id)
+            .values_list("problem_set_id", flat=True)
+            .first()
+        )
+    if problem_set_id:
+        invalidate_problem(instance.problem_id, problem_set_id)
+
+
+def invalidate_contest_results_receiver(sender, instance, **kwargs):
+    invalidate_contest_results(instance.contest_id)
+
+
+receivers = [
+    (invalidate_contest_results_receiver, [ProblemSet, RuleData, ContestRole]),
+    (invalidate_problem_set_results, [ProblemSetFrozenResults, Enrollment]),
+    (invalidate_problem_results, [Problem]),
+    (invalidate_submit_results, [FileSubmit, JudgeSubmit, TextSubmit]),
+]
+
+for receiver, models in receivers:
+    for model in models:
+        uid = f"results_{model.__name__}"
+        post_save.connect(receiver, sender=model, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=model, dispatch_uid=uid)
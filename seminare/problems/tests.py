@@ -1 +1,111 @@
-# Create your tests here.
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from seminare.contests.models import Contest
+from seminare.problems.models import Problem, ProblemSet
+from seminare.submits.models import FileSubmit
+from seminare.submits.tests import TemporaryPrivateStorageMixin
+from seminare.users.models import Enrollment, Grade, School, User
+
+
+class ConditionalGetTests(TemporaryPrivateStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        site = Site.objects.create(domain="test.localhost", name="test.localhost")
+        cls.contest = Contest.objects.create(
+            name="Test", short_name="test", contact_email="test@example.com", site=site
+        )
+        cls.problem_set = ProblemSet.objects.create(
+            slug="kolo",
+            contest=cls.contest,
+            name="Kolo",
+            is_public=True,
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=1),
+            rule_engine="seminare.rules.ksp.KSP2025",
+            rule_engine_options={
+                "doprogramovanie_date": (timezone.now() + timedelta(days=2)).isoformat()
+            },
+        )
+        cls.problem = Problem.objects.create(
+            name="Úloha", number=1, problem_set=cls.problem_set, file_points=10
+        )
+        cls.other_problem = Problem.objects.create(
+            name="Iná úloha", number=2, problem_set=cls.problem_set, file_points=10
+        )
+        cls.enrollment = Enrollment.objects.create(
+            problem_set=cls.problem_set,
+            user=User.objects.create(username="contestant"),
+            grade=Grade.SS1,
+            school=School.objects.create(name="Gymnázium", address="Bratislava"),
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+
+    def get(self, url: str, **headers):
+        return self.client.get(url, headers={"host": "test.localhost", **headers})
+
+    def get_etag(self, url: str) -> str:
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+        return etag
+
+    def submit(self, problem: Problem) -> FileSubmit:
+        return FileSubmit.objects.create(
+            problem=problem, enrollment=self.enrollment, score=Decimal(5)
+        )
+
+    def test_results(self):
+        url = reverse("problem_set_results", args=[self.problem_set.slug])
+        etag = self.get_etag(url)
+
+        # The cached table is served for a while, so the validator does not change.
+        self.submit(self.problem)
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+
+        with mock.patch("seminare.rules.RESULT_TABLE_MIN_AGE", 0):
+            response = self.get(url, if_none_match=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_problem_detail(self):
+        url = reverse("problem_detail", args=[self.problem_set.slug, 1])
+        etag = self.get_etag(url)
+
+        self.submit(self.other_problem)
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+
+        self.submit(self.problem)
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 200)
+
+    def test_statement_pdf(self):
+        # The field keeps the storage created at import, outside of the temporary root.
+        field = ProblemSet._meta.get_field("statement_pdf")
+        with mock.patch.object(field, "storage", storages["private"]):
+            self.check_statement_pdf()
+
+    def check_statement_pdf(self):
+        self.problem_set.statement_pdf.save("zadania.pdf", ContentFile(b"%PDF-zadania"))
+        url = reverse("problem_set_statement_pdf", args=[self.problem_set.slug])
+        response = self.get(url)
+        self.assertIn("public", response["Cache-Control"])
+
+        etag = self.get_etag(url)
+        self.problem_set.statement_pdf.save(
+            "zadania.pdf", ContentFile(b"%PDF-nove-zadania")
+        )
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 200)
@@ -2,12 +2,14 @@ from functools import cached_property
 
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import PermissionDenied
+from django.db.models import Max
 from django.http.response import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.views.generic import DetailView, ListView, View
 from django.views.generic.detail import SingleObjectMixin
 
+from seminare.contests.mixins import ConditionalGetMixin
 from seminare.contests.utils import get_current_contest
 from seminare.problems.logic import (
     inject_chips,
@@ -15,7 +17,11 @@ from seminare.problems.logic import (
     inject_user_score,
 )
 from seminare.problems.models import Problem, ProblemSet, Text
-from seminare.rules import RuleEngine
+from seminare.rules import (
+    RuleEngine,
+    get_contest_results_version,
+    get_problem_version,
+)
 from seminare.submits.models import FileSubmit, JudgeSubmit, TextSubmit
 from seminare.users.logic.permissions import (
     is_contest_administrator,
@@ -83,7 +89,7 @@ class ProblemSetDetailView(DetailView):
         return ctx
 
 
-class ProblemSetResultsView(DetailView):
+class ProblemSetResultsView(ConditionalGetMixin, DetailView):
     queryset = ProblemSet.objects.get_queryset()
     template_name = "sets/results.html"
     object: ProblemSet
@@ -96,10 +102,57 @@ class ProblemSetResultsView(DetailView):
             .select_related("contest")
         )
 
+    @cached_property
+    def problem_set(self) -> ProblemSet:
+        return super().get_object()
+
+    def get_object(self, queryset=None):
+        return self.problem_set
+
+    @cached_property
+    def frozen_at(self):
+        if not self.problem_set.is_finalized:
+            return None
+        return self.problem_set.frozen_results.aggregate(Max("updated_at"))[
+            "updated_at__max"
+        ]
+
+    @cached_property
+    def rule_engine(self) -> RuleEngine:
+        return self.problem_set.get_rule_engine()
+
+    @cached_property
+    def selected_table(self) -> str:
+        if "table" in self.kwargs:
+            return self.kwargs["table"]
+
+        user = self.request.user if self.request.user.is_authenticated else None
+        return self.rule_engine.get_default_result_table(user)  # pyright: ignore
+
+    def get_etag_parts(self) -> list:
+        if self.problem_set.is_finalized:
+            table_stamp = self.frozen_at
+        elif self.selected_table in self.rule_engine.get_result_tables():
+            # Stays the same while the cached table is served, see get_cached_result_table.
+            table_stamp = self.rule_engine.get_result_table_stamp(self.selected_table)
+        else:
+            table_stamp = None
+
+        return super().get_etag_parts() + [
+            get_contest_results_version(self.problem_set.contest_id),
+            self.problem_set.id,
+            self.problem_set.is_running,
+            self.selected_table,
+            table_stamp,
+        ]
+
+    def get_last_modified(self):
+        return self.frozen_at
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
 
-        rule_engine: RuleEngine = self.object.get_rule_engine()
+        rule_engine = self.rule_engine
 
         user = None
         if self.request.user.is_authenticated:
@@ -107,11 +160,7 @@ class ProblemSetResultsView(DetailView):
             user = self.request.user
 
         result_tables = rule_engine.get_result_tables()
-        selected_table: str = (
-            self.kwargs["table"]
-            if "table" in self.kwargs
-            else rule_engine.get_default_result_table(user)
-        )
+        selected_table = self.selected_table
 
         if selected_table not in result_tables:
             raise Http404("Result table not found.")
@@ -140,11 +189,15 @@ class ProblemSetResultsView(DetailView):
         return ctx
 
 
-class ProblemDetailView(DetailView):
+class ProblemDetailView(ConditionalGetMixin, DetailView):
     template_name = "problems/detail.html"
     object: Problem
 
     def get_object(self, queryset=None):
+        return self.problem
+
+    @cached_property
+    def problem(self) -> Problem:
         self.contest = get_current_contest(self.request)
         problem_set = get_object_or_404(
             ProblemSet.objects.for_user(self.request.user, self.contest)
@@ -169,7 +222,29 @@ class ProblemDetailView(DetailView):
 
     @cached_property
     def rule_engine(self) -> RuleEngine:
-        return self.object.problem_set.get_rule_engine()
+        return self.problem.problem_set.get_rule_engine()
+
+    @cached_property
+    def texts_updated_at(self):
+        return self.problem.text_set.aggregate(Max("updated_at"))["updated_at__max"]
+
+    def get_etag_parts(self) -> list:
+        problem_set = self.problem.problem_set
+        user = self.request.user
+        return super().get_etag_parts() + [
+            getattr(user, "current_school_id", None),
+            getattr(user, "current_grade", None),
+            get_contest_results_version(self.contest.id),
+            get_problem_version(self.problem.id),
+            self.problem.id,
+            self.texts_updated_at,
+            sorted(self.rule_engine.get_visible_texts(self.problem)),
+            problem_set.is_running,
+            problem_set.deadline_font,
+        ]
+
+    def get_last_modified(self):
+        return self.texts_updated_at
 
     def get_submits(self, enrollment):
         if not self.request.user.is_authenticated:
@@ -274,7 +349,7 @@ class ProblemSolutionView(ProblemDetailView):
         return ctx
 
 
-class StatementPDFView(SingleObjectMixin, View):
+class StatementPDFView(ConditionalGetMixin, SingleObjectMixin, View):
     file_getter = "statement_pdf"
     file_type = Text.Type.PROBLEM_STATEMENT
 
@@ -282,17 +357,37 @@ class StatementPDFView(SingleObjectMixin, View):
         contest = get_current_contest(self.request)
         return ProblemSet.objects.for_user(self.request.user, contest)
 
-    def get(self, request, *args, **kwargs):
-        problem_set: ProblemSet = self.get_object()
-        visible = problem_set.get_rule_engine().get_visible_texts(None)
+    @cached_property
+    def problem_set(self) -> ProblemSet:
+        return self.get_object()
+
+    @cached_property
+    def file(self):
+        visible = self.problem_set.get_rule_engine().get_visible_texts(None)
         if self.file_type not in visible:
             raise PermissionDenied()
 
-        file = getattr(problem_set, self.file_getter)
+        file = getattr(self.problem_set, self.file_getter)
         if not file:
             raise Http404()
 
-        return sendfile(file.path)
+        return file
+
+    def get_etag_parts(self) -> list:
+        # The file does not depend on the user, so it is not part of the ETag.
+        return [self.file.name, self.file.size, self.get_last_modified()]
+
+    def get_last_modified(self):
+        return self.file.storage.get_modified_time(self.file.name)
+
+    def get_cache_control(self) -> dict:
+        # Public statements can be stored by a front proxy, which revalidates them.
+        if self.problem_set.is_public:
+            return {"public": True, "no_cache": True}
+        return super().get_cache_control()
+
+    def get(self, request, *args, **kwargs):
+        return sendfile(self.file.path)
 
 
 class SolutionPDFView(StatementPDFView):
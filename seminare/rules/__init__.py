@@ -1,3 +1,5 @@
+import hashlib
+import time
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
@@ -20,14 +22,17 @@ from seminare.rules.results import (
     ScoreCell,
     Table,
 )
-from seminare.rules.scores import Score
+from seminare.rules.scores import Score, SubmitRecord
 from seminare.submits.models import BaseSubmit
 from seminare.submits.utils import JSON
 from seminare.users.logic.permissions import is_contest_organizer, preload_contest_roles
 from seminare.users.models import Enrollment, Grade, User
 from seminare.utils import (
+    bump_cache_version,
     compress_data,
     decompress_data,
+    get_cache_version,
+    get_versioned_cache_timeout,
 )
 
 if TYPE_CHECKING:
@@ -35,6 +40,82 @@ if TYPE_CHECKING:
     from seminare.users.models import User
 
 
+RESULT_TABLE_CACHE_TIMEOUT = 60 * 60
+RESULT_TABLE_MIN_AGE = 60
+"""Seconds for which a cached result table is served even after results changed."""
+
+
+def get_results_version_key(problem_set_id: int) -> str:
+    return f"results/{problem_set_id}/version"
+
+
+def get_results_version(problem_set_id: int) -> int:
+    """
+    Returns the version of results of the problem set. The version changes whenever
+    submits, problems, enrollments or frozen results of the problem set change.
+    """
+    return get_cache_version(get_results_version_key(problem_set_id))
+
+
+def invalidate_results(problem_set_id: int) -> None:
+    """
+    Invalidates cached result tables of the problem set.
+    """
+    bump_cache_version(get_results_version_key(problem_set_id))
+
+
+def get_contest_results_version_key(contest_id: int) -> str:
+    return f"results/contest/{contest_id}/version"
+
+
+def get_contest_results_version(contest_id: int) -> int:
+    """
+    Returns the version of state shared by results of all problem sets in the contest,
+    such as problem sets themselves, rule data and contest roles.
+    """
+    return get_cache_version(get_contest_results_version_key(contest_id))
+
+
+def invalidate_contest_results(contest_id: int) -> None:
+    """
+    Invalidates cached result tables of all problem sets in the contest.
+    """
+    bump_cache_version(get_contest_results_version_key(contest_id))
+
+
+def get_problem_version_key(problem_id: int) -> str:
+    return f"problem/{problem_id}/version"
+
+
+def get_problem_version(problem_id: int) -> int:
+    """
+    Returns the version of the problem, which changes whenever the problem or
+    any of its submits change.
+    """
+    return get_cache_version(get_problem_version_key(problem_id))
+
+
+def invalidate_problem(problem_id: int, problem_set_id: int) -> None:
+    """
+    Invalidates the problem and results of its problem set.
+    """
+    bump_cache_version(get_problem_version_key(problem_id))
+    invalidate_results(problem_set_id)
+
+
+@dataclass(frozen=True)
+class CachedResultTable:
+    version: tuple
+    built_at: float
+    data: bytes
+    """Compressed serialized table, see Table.serialize."""
+
+    @property
+    def stamp(self) -> str:
+        # Rebuilding an unchanged table keeps the stamp.
+        return hashlib.sha1(self.data).hexdigest()
+
+
 @dataclass
 class Chip:
     message: str
@@ -219,6 +300,12 @@ class AbstractRuleEngine:
         """
         raise NotImplementedError()
 
+    def get_result_table_data(self, table: str) -> dict:
+        """
+        Returns a serialized result table, as stored in the cache or frozen results.
+        """
+        raise NotImplementedError()
+
     def close_problemset(self):
         """
         Called when problem set is marked as closed.
@@ -356,29 +443,29 @@ class RuleEngine(RuleEngineDataMixin, AbstractRuleEngine):
     def get_enrollments_problems_scores(
         self, enrollments: Iterable[Enrollment], problems: Iterable["Problem"]
     ) -> dict[tuple[int, int], Score]:
-        user_problem_submits: dict[tuple[int, int], list[BaseSubmit]]
+        problems = {problem.id: problem for problem in problems}
+        user_problem_submits: dict[tuple[int, int], list[SubmitRecord]]
         user_problem_submits = defaultdict(list)
 
         for type_ in BaseSubmit.get_submit_types():
             if not any(
-                type_ in problem.accepted_submit_classes for problem in problems
+                type_ in problem.accepted_submit_classes
+                for problem in problems.values()
             ):
                 continue
 
+            # Only columns needed for scoring are fetched, without creating model instances.
             submits = self.get_enrollments_problems_effective_submits(
-                type_, enrollments, problems
-            ).select_related("enrollment")
-            for submit in submits:
-                key = (submit.enrollment.user_id, submit.problem_id)
-                user_problem_submits[key].append(submit)
+                type_, enrollments, problems.values()
+            ).values_list("id", "enrollment__user_id", "problem_id", "score")
+            for id, user_id, problem_id, score in submits:
+                record = SubmitRecord(id, score, type_)
+                user_problem_submits[(user_id, problem_id)].append(record)
 
-        output = {}
-        for key, submits in user_problem_submits.items():
-            problem: "Problem" = next(
-                problem for problem in problems if problem.id == key[1]
-            )
-            output[key] = Score(submits, problem)
-        return output
+        return {
+            key: Score(submits, problems[key[1]])
+            for key, submits in user_problem_submits.items()
+        }
 
     def get_enrollments(self) -> QuerySet[Enrollment]:
         return self.problem_set.enrollment_set.get_queryset()
@@ -437,17 +524,42 @@ class RuleEngine(RuleEngineDataMixin, AbstractRuleEngine):
             self.problem_set.contest,
         )
 
-    def get_result_table(self, table: str, **kwargs) -> Table:
-        if self.problem_set.is_finalized:
-            frozen_results = self.problem_set.get_frozen_results(table)
-            return Table.deserialize(frozen_results, problem_set=self.problem_set)
+    def get_results_version(self) -> tuple:
+        """
+        Returns versions of everything result tables of the problem set depend on.
+        """
+        return (
+            get_contest_results_version(self.problem_set.contest_id),
+            get_results_version(self.problem_set.id),
+        )
 
-        key = f"results_table/{self.problem_set.slug}/{table}"
-        if key in cache and (data := cache.get(key)) is not None:
-            return Table.deserialize(
-                decompress_data(data), problem_set=self.problem_set
-            )
+    def get_result_table_cache_key(self, table: str) -> str:
+        return f"results_table/{self.problem_set.id}/{table}"
 
+    def get_cached_result_table(self, table: str) -> CachedResultTable | None:
+        """
+        Returns the cached result table, if it is current or younger than
+        RESULT_TABLE_MIN_AGE. Under a stream of submits, a table is so built at most
+        once per RESULT_TABLE_MIN_AGE instead of after every submit.
+        """
+        cached: CachedResultTable | None = cache.get(
+            self.get_result_table_cache_key(table)
+        )
+        if cached is None:
+            return None
+        if (
+            cached.version == self.get_results_version()
+            or time.time() - cached.built_at < RESULT_TABLE_MIN_AGE
+        ):
+            return cached
+        return None
+
+    def build_result_table(self, table: str) -> tuple[Table, CachedResultTable]:
+        """
+        Builds the result table from submits and stores it in the cache.
+        """
+        # Read before building, so that changes made meanwhile invalidate the table.
+        version = self.get_results_version()
         enrollments = self.get_enrollments().select_related("user", "school")
 
         context = self.result_table_get_context(table, enrollments)
@@ -480,13 +592,54 @@ class RuleEngine(RuleEngineDataMixin, AbstractRuleEngine):
 
         table_obj = Table(columns, rows)
         table_obj.sort()
-        cache.set(key, compress_data(table_obj.serialize()), timeout=60 * 5)
-        return table_obj
+        cached = CachedResultTable(
+            version, time.time(), compress_data(table_obj.serialize())
+        )
+        cache.set(
+            self.get_result_table_cache_key(table),
+            cached,
+            timeout=get_versioned_cache_timeout(RESULT_TABLE_CACHE_TIMEOUT),
+        )
+        return table_obj, cached
+
+    def get_result_table(self, table: str, **kwargs) -> Table:
+        if self.problem_set.is_finalized:
+            frozen_results = self.problem_set.get_frozen_results(table)
+            return Table.deserialize(frozen_results, problem_set=self.problem_set)
+
+        if (cached := self.get_cached_result_table(table)) is not None:
+            return Table.deserialize(
+                decompress_data(cached.data), problem_set=self.problem_set
+            )
+
+        return self.build_result_table(table)[0]
+
+    def get_result_table_data(self, table: str) -> dict:
+        """
+        Returns the serialized result table (see Table.serialize). Frozen and cached
+        tables are returned as they are stored, without building Table objects.
+        """
+        if self.problem_set.is_finalized:
+            return self.problem_set.get_frozen_results(table)
+
+        if (cached := self.get_cached_result_table(table)) is not None:
+            return decompress_data(cached.data)
+
+        return self.get_result_table(table).serialize()
+
+    def get_result_table_stamp(self, table: str) -> str:
+        """
+        Returns a validator of the live result table returned by get_result_table().
+        Builds the table, if it is not cached.
+        """
+        cached = self.get_cached_result_table(table)
+        if cached is None:
+            cached = self.build_result_table(table)[1]
+        return cached.stamp
 
     def close_problemset(self):
         for table in self.get_result_tables().keys():
-            key = f"results_table/{self.problem_set.slug}/{table}"
-            cache.delete(key)
+            cache.delete(self.get_result_table_cache_key(table))
 
             self.problem_set.set_frozen_results(
                 table, self.get_result_table(table).serialize()
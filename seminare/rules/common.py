@@ -167,6 +167,15 @@ class PreviousProblemSetRuleEngine(RuleEngine):
 
         return super().get_enrollments()
 
+    def get_results_version(self) -> tuple:
+        if self.previous_rule_engine is not None:
+            return (
+                *super().get_results_version(),
+                self.previous_rule_engine.get_results_version(),
+            )
+
+        return super().get_results_version()
+
     def result_table_get_context(
         self, table: str, enrollments: QuerySet[Enrollment, Enrollment]
     ) -> dict:
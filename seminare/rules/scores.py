@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from decimal import Decimal
 from typing import TYPE_CHECKING, Self, Sequence
 
@@ -22,8 +23,24 @@ class ResultsSerializable:
         raise NotImplementedError(self)
 
 
+@dataclass(slots=True, frozen=True)
+class SubmitRecord:
+    """
+    Columns of an effective submit needed for scoring, loaded without instantiating the model.
+    """
+
+    id: int
+    score: Decimal | None
+    submit_cls: type[BaseSubmit]
+
+    def points_visible(self, problem: "Problem") -> bool:
+        return self.submit_cls.is_score_visible(self.score, problem)
+
+
 class Score(ResultsSerializable):
-    def __init__(self, submits: Sequence[BaseSubmit], problem: "Problem"):
+    def __init__(
+        self, submits: Sequence[BaseSubmit | SubmitRecord], problem: "Problem"
+    ):
         self.submits = submits
         self.problem = problem
 
@@ -107,3 +107,24 @@ class KSPRulesTests(TestCase):
                     for enrollment in enrollments
                 )
             )
+
+    def test_get_enrollments_problems_scores(self):
+        for rule_engine in self.get_rule_engines():
+            enrollments = rule_engine.get_enrollments()
+            problems = list(rule_engine.problem_set.problems.all())
+            scores = rule_engine.get_enrollments_problems_scores(enrollments, problems)
+
+            for problem in problems:
+                for submit_cls in problem.accepted_submit_classes:
+                    submits = rule_engine.get_enrollments_problems_effective_submits(
+                        submit_cls, enrollments, [problem]
+                    ).select_related("enrollment")
+
+                    for submit in submits:
+                        score = scores[(submit.enrollment.user_id, problem.id)]
+                        record = next(s for s in score.submits if s.id == submit.id)
+                        self.assertEqual(record.score, submit.score)
+                        self.assertEqual(
+                            record.points_visible(problem),
+                            submit.points_visible(problem),
+                        )
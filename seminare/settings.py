@@ -50,6 +50,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "seminare.contests.middleware.CurrentContestMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "mozilla_django_oidc.middleware.SessionRefresh",
@@ -116,6 +117,15 @@ LOGOUT_REDIRECT_URL = "/"
 
 JUDGE_URL: str = env("JUDGE_URL", default="https://judge.ksp.sk")
 JUDGE_TOKEN: str = env("JUDGE_TOKEN")
+# Use "seminare.submits.fake_judge.FakeJudgeClient" to run without a judge.
+JUDGE_CLIENT: str = env("JUDGE_CLIENT", default="judge_client.client.JudgeClient")
+
+# Number of threads decoding images when combining them into a submit PDF.
+SUBMIT_PDF_WORKERS: int = env.int("SUBMIT_PDF_WORKERS", default=4)
+
+# Seconds for which new-submit notifications are collected into one email per reviewer.
+# 0 sends one email per submit.
+REVIEWER_DIGEST_DELAY: int = env.int("REVIEWER_DIGEST_DELAY", default=10 * 60)
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
@@ -128,6 +138,8 @@ REST_FRAMEWORK = {
 }
 
 
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 EMAIL_CONFIG = env.email("EMAIL_URL", default="consolemail://")
 vars().update(EMAIL_CONFIG)
 
@@ -1,18 +1,52 @@
 from django.contrib import admin
 
-from seminare.submits.models import FileSubmit, JudgeSubmit, TextSubmit
+from seminare.submits.models import (
+    FileSubmit,
+    GradingStats,
+    JudgeProtocol,
+    JudgeSubmit,
+    TextSubmit,
+)
+from seminare.submits.tasks import resend_to_judge
 
 
 @admin.register(FileSubmit)
 class FileSubmitAdmin(admin.ModelAdmin):
-    list_display = ["problem", "created_at", "score", "scored_by"]
+    list_display = ["problem", "created_at", "score", "scored_by", "state"]
+    list_filter = ["state"]
+
+
+class JudgeProtocolInline(admin.StackedInline):
+    model = JudgeProtocol
+    can_delete = False
 
 
 @admin.register(JudgeSubmit)
 class JudgeSubmitAdmin(admin.ModelAdmin):
-    list_display = ["problem", "created_at", "score", "scored_by", "judge_id"]
+    list_display = [
+        "problem",
+        "created_at",
+        "score",
+        "scored_by",
+        "judge_id",
+        "judge_failed",
+    ]
+    list_filter = ["judge_failed"]
+    inlines = [JudgeProtocolInline]
+    actions = ["resend"]
+
+    @admin.action(description="Send again to the judge")
+    def resend(self, request, queryset):
+        count = resend_to_judge(queryset)
+        self.message_user(request, f"{count} submits enqueued.")
 
 
 @admin.register(TextSubmit)
 class TextSubmitAdmin(admin.ModelAdmin):
     list_display = ["problem", "created_at", "score", "scored_by"]
+
+
+@admin.register(GradingStats)
+class GradingStatsAdmin(admin.ModelAdmin):
+    list_display = ["problem", "submits", "ungraded", "updated_at"]
+    readonly_fields = ["submits", "ungraded", "latency_histogram"]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SubmitsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "seminare.submits"
+
+    def ready(self) -> None:
+        from seminare.submits import signals  # noqa: F401
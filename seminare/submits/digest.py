@@ -0,0 +1,135 @@
+"""
+Reviewer notifications are collected in Redis lists (one per reviewer) and sent
+as a single digest email per reviewer by a periodic flush.
+"""
+
+from collections import defaultdict
+
+import django_rq
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.urls import reverse
+
+from seminare.submits.models import BaseSubmit
+from seminare.users.models import User
+from seminare.utils import build_mail
+
+DIGEST_REVIEWERS_KEY = "reviewer_digest/reviewers"
+"""Set of reviewers with pending notifications."""
+DIGEST_SCHEDULED_KEY = "reviewer_digest/scheduled"
+"""Present while a flush is scheduled."""
+
+
+def get_digest_key(reviewer_id: int) -> str:
+    return f"reviewer_digest/{reviewer_id}"
+
+
+def add_to_digest(reviewer_id: int, submit_id: str) -> bool:
+    """
+    Adds a new submit to the digest of the reviewer.
+
+    Returns True if no flush was scheduled yet, so the caller has to schedule one.
+    """
+    connection = django_rq.get_connection()
+    with connection.pipeline() as pipe:
+        pipe.rpush(get_digest_key(reviewer_id), submit_id)
+        pipe.sadd(DIGEST_REVIEWERS_KEY, reviewer_id)
+        # Expires on its own, so a lost flush job does not stop future digests.
+        pipe.set(
+            DIGEST_SCHEDULED_KEY, 1, nx=True, ex=2 * settings.REVIEWER_DIGEST_DELAY
+        )
+        _, _, scheduled = pipe.execute()
+    return bool(scheduled)
+
+
+def get_digests() -> dict[int, list[str]]:
+    """
+    Returns all pending notifications as reviewer_id -> submit_ids.
+
+    They are kept until remove_from_digests(), so that a failed send loses none. New
+    notifications schedule another flush from now on.
+    """
+    connection = django_rq.get_connection()
+    connection.delete(DIGEST_SCHEDULED_KEY)
+
+    digests = {}
+    for reviewer_id in connection.smembers(DIGEST_REVIEWERS_KEY):
+        submit_ids = connection.lrange(get_digest_key(int(reviewer_id)), 0, -1)
+        if submit_ids:
+            digests[int(reviewer_id)] = [submit_id.decode() for submit_id in submit_ids]
+    return digests
+
+
+def remove_from_digests(digests: dict[int, list[str]]) -> None:
+    """
+    Removes notifications returned by get_digests() once they are sent. Notifications
+    added since then are kept.
+    """
+    connection = django_rq.get_connection()
+    for reviewer_id, submit_ids in digests.items():
+        key = get_digest_key(reviewer_id)
+        with connection.pipeline() as pipe:
+            pipe.ltrim(key, len(submit_ids), -1)
+            pipe.srem(DIGEST_REVIEWERS_KEY, reviewer_id)
+            pipe.llen(key)
+            _, _, pending = pipe.execute()
+        if pending:
+            connection.sadd(DIGEST_REVIEWERS_KEY, reviewer_id)
+
+
+def get_grade_url(submit: BaseSubmit) -> str:
+    problem = submit.problem
+    path = reverse(
+        "org:grading_submit",
+        args=[problem.problem_set.slug, problem.number, submit.submit_id],
+    )
+    return f"https://{problem.problem_set.contest.site.domain}{path}"
+
+
+def build_digests(digests: dict[int, list[str]]) -> list[EmailMultiAlternatives]:
+    """
+    Builds one email per reviewer and contest listing new submits, that are still not graded.
+    """
+    ids_by_type = defaultdict(set)
+    for submit_ids in digests.values():
+        for submit_id in submit_ids:
+            if (parsed := BaseSubmit.parse_submit_id(submit_id)) is not None:
+                submit_cls, id = parsed
+                ids_by_type[submit_cls].add(id)
+
+    submits: dict[str, BaseSubmit] = {}
+    for submit_cls, ids in ids_by_type.items():
+        for submit in submit_cls.objects.filter(id__in=ids, score=None).select_related(
+            "problem__problem_set__contest__site", "enrollment__user"
+        ):
+            submits[submit.submit_id] = submit
+
+    reviewers = User.objects.in_bulk(digests.keys())
+    messages = []
+    for reviewer_id, submit_ids in digests.items():
+        reviewer = reviewers.get(reviewer_id)
+        if reviewer is None or not reviewer.email:
+            continue
+
+        by_contest = defaultdict(dict)
+        for submit_id in submit_ids:
+            if (submit := submits.get(submit_id)) is not None:
+                contest = submit.problem.problem_set.contest
+                by_contest[contest][submit_id] = submit
+
+        for contest, contest_submits in by_contest.items():
+            messages.append(
+                build_mail(
+                    [reviewer.email],
+                    f"[{contest.short_name}] Nové submity na opravenie ({len(contest_submits)})",
+                    "reviewer_digest",
+                    contest,
+                    {
+                        "submits": [
+                            (submit, get_grade_url(submit))
+                            for submit in contest_submits.values()
+                        ],
+                    },
+                )
+            )
+    return messages
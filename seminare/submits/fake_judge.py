@@ -0,0 +1,54 @@
+import secrets
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FakeSubmit:
+    public_id: str
+    protocol_key: str
+
+
+@dataclass
+class FakeJudgeClient:
+    """
+    Local stand-in for judge_client.client.JudgeClient used in tests and benchmarks.
+
+    Accepts every program after `latency` seconds and keeps it in `submits`.
+    The next `failures` calls raise ConnectionError, to simulate an unavailable judge.
+    """
+
+    judge_token: str
+    judge_url: str
+    latency: float = 0
+    failures: int = 0
+    submits: list[dict] = field(default_factory=list)
+
+    def submit(
+        self,
+        namespace: str,
+        task: str,
+        external_user_id: str,
+        filename: str,
+        program: bytes,
+    ) -> FakeSubmit:
+        time.sleep(self.latency)
+
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Fake judge is unavailable.")
+
+        submit = FakeSubmit(
+            public_id=secrets.token_hex(16), protocol_key=secrets.token_hex(16)
+        )
+        self.submits.append(
+            {
+                "public_id": submit.public_id,
+                "namespace": namespace,
+                "task": task,
+                "external_user_id": external_user_id,
+                "filename": filename,
+                "program": program,
+            }
+        )
+        return submit
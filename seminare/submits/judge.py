@@ -0,0 +1,442 @@
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable
+
+import django_rq
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.module_loading import import_string
+from judge_client.client import JudgeClient, Submit
+from requests.adapters import HTTPAdapter
+
+from seminare.problems.models import Problem
+from seminare.rules import invalidate_problem
+from seminare.submits.models import JudgeProtocol, JudgeSubmit
+from seminare.users.models import User
+
+logger = logging.getLogger(__name__)
+
+JUDGE_TIMEOUT = (5, 30)
+"""Connect and read timeout (in seconds) of requests to the judge."""
+JUDGE_POOL_SIZE = 10
+"""Number of persistent connections kept open to the judge."""
+JUDGE_BULK_CONCURRENCY = 4
+"""Number of concurrent requests when re-submitting many programs."""
+REJUDGE_RATE = 10
+"""Default number of programs sent to the judge per second during a rejudge."""
+REJUDGE_TIMEOUT = 6 * 60 * 60
+"""Seconds after which state of an unfinished rejudge is forgotten."""
+REJUDGE_REPORT_TIMEOUT = 30 * 60
+"""Seconds to wait for judge reports after a rejudge is sent, before it is finished anyway."""
+
+
+class JudgeUnavailableError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling the judge after `threshold` consecutive failures.
+
+    While open, calls fail immediately with JudgeUnavailableError. After `reset_timeout`
+    seconds a single trial call is let through; its success closes the breaker again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.lock = threading.Lock()
+
+    def call(self, func: Callable, *args, **kwargs):
+        with self.lock:
+            if self.opened_at is not None:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise JudgeUnavailableError("Judge is unavailable.")
+                # Let a single trial call through, other calls are still rejected.
+                self.opened_at = time.monotonic()
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            with self.lock:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    self.opened_at = time.monotonic()
+            raise
+
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+        return result
+
+
+class PooledSession(requests.Session):
+    """
+    Session with a bounded pool of persistent connections and default timeouts.
+    """
+
+    def __init__(self, pool_size: int = JUDGE_POOL_SIZE, timeout=JUDGE_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+
+@lru_cache(maxsize=1)
+def get_judge_client() -> JudgeClient:
+    """
+    Returns the process-wide judge client, an instance of settings.JUDGE_CLIENT.
+
+    If the client talks to the judge through a requests session, it gets a shared
+    PooledSession, so connections are kept alive between submissions. A JudgeClient
+    without one (e.g. after an upgrade of judge-client) is logged, as its requests
+    then have no timeouts.
+    """
+    client_class = import_string(settings.JUDGE_CLIENT)
+    client = client_class(
+        judge_token=settings.JUDGE_TOKEN, judge_url=settings.JUDGE_URL
+    )
+
+    if isinstance(getattr(client, "session", None), requests.Session):
+        session = PooledSession()
+        session.headers.update(client.session.headers)
+        client.session = session
+    elif isinstance(client, JudgeClient):
+        logger.warning(
+            "%s has no requests session, requests to the judge are not pooled "
+            "and have no timeouts.",
+            settings.JUDGE_CLIENT,
+        )
+
+    return client
+
+
+@lru_cache(maxsize=1)
+def get_circuit_breaker() -> CircuitBreaker:
+    return CircuitBreaker()
+
+
+def enqueue_judge_submit(namespace: str, task: str, user: User, file) -> Submit:
+    """
+    Sends a program to the judge. Raises JudgeUnavailableError when the judge keeps failing.
+    """
+    return get_circuit_breaker().call(
+        get_judge_client().submit,
+        namespace=namespace,
+        task=task,
+        external_user_id=user.username,
+        filename=Path(file.name or "").name,
+        program=file.read(),
+    )
+
+
+def send_judge_submit(submit: JudgeSubmit) -> Submit:
+    """
+    Sends program of `submit` to the judge. Does not save the submit.
+
+    Problem and enrollment user of the submit should be preloaded.
+    """
+    with submit.program.open("rb") as program:
+        return enqueue_judge_submit(
+            submit.problem.judge_namespace,
+            submit.problem.judge_task,
+            submit.enrollment.user,
+            program,
+        )
+
+
+def resubmit_to_judge(
+    submits: Iterable[JudgeSubmit],
+    concurrency: int = JUDGE_BULK_CONCURRENCY,
+    progress: Callable[[int, int], None] | None = None,
+    on_sent: Callable[[JudgeSubmit], None] | None = None,
+) -> list[JudgeSubmit]:
+    """
+    Sends `submits` to the judge again, with at most `concurrency` requests in flight.
+
+    Judge id of each successfully sent submit is saved right after it is sent, so that
+    the judge report can find it, and the sent submits are returned. Submits that failed
+    keep their previous judge id. If given, `on_sent` is called with every sent submit
+    before its judge id is saved and `progress` with (finished, total) after every submit.
+    """
+    submits = list(submits)
+    sent = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(send_judge_submit, submit): submit for submit in submits
+        }
+        for i, future in enumerate(as_completed(futures)):
+            submit = futures[future]
+            if future.exception() is None:
+                judge_submit = future.result()
+                submit.judge_id = judge_submit.public_id
+                submit.protocol_key = judge_submit.protocol_key
+                if on_sent is not None:
+                    on_sent(submit)
+                JudgeSubmit.objects.filter(id=submit.id).update(
+                    judge_id=submit.judge_id, protocol_key=submit.protocol_key
+                )
+                sent.append(submit)
+
+            if progress is not None:
+                progress(i + 1, len(submits))
+
+    return sent
+
+
+@dataclass
+class RejudgeProgress:
+    total: int
+    sent: int = 0
+    failed: int = 0
+    reported: int = 0
+    sending: bool = True
+
+    @property
+    def finished(self) -> bool:
+        return not self.sending and self.reported >= self.sent
+
+
+def get_rejudge_key(problem_id: int) -> str:
+    return f"rejudge/{problem_id}"
+
+
+def get_rejudged_submit_key(judge_id: str) -> str:
+    return f"rejudge/submit/{judge_id}"
+
+
+def get_rejudge_progress(problem_id: int) -> RejudgeProgress | None:
+    """
+    Returns progress of the running rejudge of the problem, or None if there is none.
+    """
+    state = django_rq.get_connection().hgetall(get_rejudge_key(problem_id))
+    if b"total" not in state:
+        return None
+    return RejudgeProgress(
+        total=int(state[b"total"]),
+        sent=int(state[b"sent"]),
+        failed=int(state[b"failed"]),
+        reported=int(state.get(b"reported", 0)),
+        sending=state[b"sending"] == b"1",
+    )
+
+
+def set_rejudge_progress(problem_id: int, progress: RejudgeProgress) -> None:
+    key = get_rejudge_key(problem_id)
+    with django_rq.get_connection().pipeline() as pipe:
+        pipe.hset(
+            key,
+            mapping={
+                "total": progress.total,
+                "sent": progress.sent,
+                "failed": progress.failed,
+                "sending": int(progress.sending),
+            },
+        )
+        pipe.expire(key, REJUDGE_TIMEOUT)
+        pipe.execute()
+
+
+def start_rejudge(problem_id: int) -> bool:
+    """
+    Marks a rejudge of the problem as running. Returns False if one is already running.
+
+    State of rejudges is kept in Redis, as it is shared by web and worker processes.
+    """
+    key = get_rejudge_key(problem_id)
+    connection = django_rq.get_connection()
+    if not connection.hsetnx(key, "total", 0):
+        return False
+    with connection.pipeline() as pipe:
+        pipe.hset(key, mapping={"sent": 0, "failed": 0, "reported": 0, "sending": 1})
+        pipe.expire(key, REJUDGE_TIMEOUT)
+        pipe.execute()
+    return True
+
+
+def finish_rejudge(problem_id: int) -> None:
+    """
+    Ends the rejudge of the problem and invalidates the problem and its results.
+
+    Does nothing if the rejudge has already been finished.
+    """
+    if not django_rq.get_connection().delete(get_rejudge_key(problem_id)):
+        return
+
+    problem_set_id = (
+        Problem.objects.filter(id=problem_id)
+        .values_list("problem_set_id", flat=True)
+        .first()
+    )
+    if problem_set_id:
+        invalidate_problem(problem_id, problem_set_id)
+
+
+def get_rejudge_submits(
+    problem: Problem, effective_only: bool
+) -> QuerySet[JudgeSubmit]:
+    """
+    Returns judge submits of the problem to rejudge, optionally only the effective ones.
+    """
+    if effective_only:
+        rule_engine = problem.problem_set.get_rule_engine()
+        submits = rule_engine.get_enrollments_problems_effective_submits(
+            JudgeSubmit, rule_engine.get_enrollments(), [problem]
+        )
+    else:
+        submits = JudgeSubmit.objects.filter(problem=problem)
+    return submits.select_related("problem", "enrollment__user")  # pyright: ignore
+
+
+def rejudge(
+    problem_id: int,
+    submits: Iterable[JudgeSubmit],
+    rate: int = REJUDGE_RATE,
+    progress: Callable[[RejudgeProgress], None] | None = None,
+) -> RejudgeProgress:
+    """
+    Sends `submits` of a problem to the judge again, at most `rate` programs per second.
+
+    The rejudge has to be started with start_rejudge() first. Judge reports of rejudged
+    submits do not invalidate results one by one; results are invalidated once, when
+    the last report arrives (see report_rejudged_submit()). Each submit is marked as
+    rejudged before its new judge id is saved, so an early report is never treated
+    as a regular one.
+    """
+    submits = list(submits)
+    state = RejudgeProgress(total=len(submits))
+    set_rejudge_progress(problem_id, state)
+
+    connection = django_rq.get_connection()
+
+    def mark_rejudged(submit: JudgeSubmit) -> None:
+        connection.set(
+            get_rejudged_submit_key(submit.judge_id),  # pyright: ignore
+            problem_id,
+            ex=REJUDGE_TIMEOUT,
+        )
+
+    for start in range(0, len(submits), rate):
+        started_at = time.monotonic()
+        chunk = submits[start : start + rate]
+
+        sent = resubmit_to_judge(chunk, on_sent=mark_rejudged)
+
+        state.sent += len(sent)
+        state.failed += len(chunk) - len(sent)
+        set_rejudge_progress(problem_id, state)
+        if progress is not None:
+            progress(state)
+
+        if start + rate < len(submits):
+            time.sleep(max(0, 1 - (time.monotonic() - started_at)))
+
+    state.sending = False
+    set_rejudge_progress(problem_id, state)
+
+    state.reported = int(connection.hget(get_rejudge_key(problem_id), "reported") or 0)
+    if state.finished:
+        finish_rejudge(problem_id)
+    return state
+
+
+def pop_rejudged_submits(judge_ids: Iterable[str]) -> dict[str, int]:
+    """
+    Returns mapping judge_id -> problem_id of submits waiting for a rejudge report.
+    """
+    judge_ids = list(judge_ids)
+    with django_rq.get_connection().pipeline() as pipe:
+        for judge_id in judge_ids:
+            pipe.getdel(get_rejudged_submit_key(judge_id))
+        problem_ids = pipe.execute()
+    return {
+        judge_id: int(problem_id)
+        for judge_id, problem_id in zip(judge_ids, problem_ids)
+        if problem_id is not None
+    }
+
+
+def report_rejudged_submits(problem_id: int, count: int = 1) -> None:
+    """
+    Records arrived judge reports of a rejudge and finishes it, if they were the last ones.
+    """
+    key = get_rejudge_key(problem_id)
+    connection = django_rq.get_connection()
+    # Only counted while the rejudge is running.
+    if not connection.hexists(key, "total"):
+        return
+    connection.hincrby(key, "reported", count)
+
+    progress = get_rejudge_progress(problem_id)
+    if progress is not None and progress.finished:
+        finish_rejudge(problem_id)
+
+
+def save_judge_reports(reports: list[dict]) -> set[str]:
+    """
+    Saves protocols (and scores) reported by the judge to their submits.
+
+    Submits and their problems are loaded in one query each. Protocols are upserted
+    and scores written in bulk, so no save signals are sent. Results of each affected contest are
+    invalidated once; reports of a rejudge are only counted towards it instead.
+    Returns judge ids of reports without a matching submit.
+    """
+    protocols = {report["public_id"]: report["protocol"] for report in reports}
+    submits = list(
+        JudgeSubmit.objects.filter(judge_id__in=protocols).only(
+            "id", "judge_id", "problem_id", "score"
+        )
+    )
+    problems = Problem.objects.filter(
+        id__in={submit.problem_id for submit in submits}
+    ).only("id", "judge_points", "problem_set_id")
+    problems = {problem.id: problem for problem in problems}
+
+    scored = []
+    for submit in submits:
+        protocol = protocols[submit.judge_id]
+        if "final_score" in protocol:
+            max_points = problems[submit.problem_id].judge_points
+            submit.score = Decimal(str(protocol["final_score"])) * max_points
+            scored.append(submit)
+
+    with transaction.atomic():
+        JudgeProtocol.objects.bulk_create(
+            [
+                JudgeProtocol(submit=submit, data=protocols[submit.judge_id])
+                for submit in submits
+            ],
+            update_conflicts=True,
+            unique_fields=["submit"],
+            update_fields=["data"],
+        )
+        JudgeSubmit.objects.bulk_update(scored, fields=["score"])
+
+    rejudged = pop_rejudged_submits(submit.judge_id for submit in submits)  # pyright: ignore
+    for problem_id, count in Counter(rejudged.values()).items():
+        report_rejudged_submits(problem_id, count)
+
+    problem_ids = {
+        submit.problem_id for submit in submits if submit.judge_id not in rejudged
+    }
+    for problem_id in problem_ids:
+        invalidate_problem(problem_id, problems[problem_id].problem_set_id)
+
+    return set(protocols) - {submit.judge_id for submit in submits}  # pyright: ignore
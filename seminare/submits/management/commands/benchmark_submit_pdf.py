@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from seminare.submits.utils import combine_images_into_pdf
+
+
+def read_memory_status() -> dict[str, int]:
+    """
+    Returns memory counters of the current process in kB (Linux only).
+    """
+    status = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                status[key] = int(value.split()[0])
+    return status
+
+
+def run_benchmark(paths: list[Path], workers: int, queue: multiprocessing.Queue):
+    # Reset peak RSS inherited from the parent, so only the conversion is measured.
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = read_memory_status()["VmRSS"]
+
+    start = time.perf_counter()
+    pdf = combine_images_into_pdf([open(path, "rb") for path in paths], workers=workers)
+    duration = time.perf_counter() - start
+
+    queue.put((duration, read_memory_status()["VmHWM"] - baseline, pdf.size))
+    pdf.close()
+
+
+class Command(BaseCommand):
+    help = "Measure time and peak memory of combining large images into a PDF"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            nargs="+",
+            default=[1, 5, 20],
+            help="Numbers of pages to benchmark.",
+        )
+        parser.add_argument(
+            "--size",
+            type=int,
+            nargs=2,
+            default=[4000, 3000],
+            metavar=("WIDTH", "HEIGHT"),
+            help="Size of generated images.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[1, 2, 4],
+            help="Numbers of decoding threads to benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.stdout.write("Generating images...\n")
+            image = Image.effect_noise(tuple(options["size"]), 64).convert("RGB")
+            sample = Path(tmp) / "sample.jpg"
+            image.save(sample, format="JPEG", quality=90)
+            image.close()
+
+            paths = []
+            for i in range(max(options["pages"])):
+                path = Path(tmp) / f"{i}.jpg"
+                path.write_bytes(sample.read_bytes())
+                paths.append(path)
+
+            self.stdout.write(
+                f"Available CPUs: {os.cpu_count()}\n"
+                "workers\tpages\ttime [s]\tpeak memory [MB]\tPDF size [MB]\n"
+            )
+
+            # Every run is measured in a fresh process, so runs do not affect each other.
+            context = multiprocessing.get_context("fork")
+            for workers in options["workers"]:
+                for pages in options["pages"]:
+                    queue = context.Queue()
+                    process = context.Process(
+                        target=run_benchmark, args=(paths[:pages], workers, queue)
+                    )
+                    process.start()
+                    duration, peak_kb, size = queue.get()
+                    process.join()
+
+                    self.stdout.write(
+                        f"{workers}\t{pages}\t{duration:.2f}\t\t"
+                        f"{peak_kb / 1024:.1f}\t\t\t{size / 1024 / 1024:.1f}\n"
+                    )
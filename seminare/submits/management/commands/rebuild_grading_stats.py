@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from seminare.submits.models import GradingStats
+
+
+class Command(BaseCommand):
+    help = "Recompute grading counters of problems from their file submits"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "problem_ids",
+            nargs="*",
+            type=int,
+            help="Problems to rebuild, all problems with file submits by default.",
+        )
+
+    def handle(self, *args, **options):
+        count = GradingStats.rebuild(options["problem_ids"] or None)
+        self.stdout.write(f"Rebuilt grading stats of {count} problems.")
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seminare.problems.models import Problem
+from seminare.submits.judge import (
+    REJUDGE_RATE,
+    RejudgeProgress,
+    get_rejudge_submits,
+    rejudge,
+    start_rejudge,
+)
+from seminare.submits.tasks import rejudge_problem, schedule_rejudge_expiry
+
+
+class Command(BaseCommand):
+    help = "Send judge submits of a problem to the judge again"
+
+    def add_arguments(self, parser):
+        parser.add_argument("problem_id", type=int)
+        parser.add_argument(
+            "--effective",
+            action="store_true",
+            help="Rejudge only submits counted in results.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=int,
+            default=REJUDGE_RATE,
+            help="Maximum number of submits sent per second.",
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Enqueue the rejudge to a worker instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        problem = (
+            Problem.objects.filter(id=options["problem_id"])
+            .select_related("problem_set")
+            .first()
+        )
+        if problem is None:
+            raise CommandError("Problem does not exist.")
+        if options["rate"] < 1:
+            raise CommandError("Rate has to be positive.")
+
+        if not start_rejudge(problem.id):
+            raise CommandError("A rejudge of this problem is already running.")
+
+        if options["background"]:
+            rejudge_problem.delay(problem.id, options["effective"], options["rate"])
+            self.stdout.write(f"Rejudge of {problem} enqueued.")
+            return
+
+        def print_progress(progress: RejudgeProgress):
+            self.stdout.write(
+                f"Sent {progress.sent + progress.failed}/{progress.total} submits"
+            )
+
+        progress = rejudge(
+            problem.id,
+            get_rejudge_submits(problem, options["effective"]),
+            options["rate"],
+            print_progress,
+        )
+        if not progress.finished:
+            schedule_rejudge_expiry(problem.id)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rejudge of {problem}: {progress.sent} submits sent, {progress.failed} failed."
+            )
+        )
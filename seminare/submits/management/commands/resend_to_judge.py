@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from seminare.submits.models import JudgeSubmit
+from seminare.submits.tasks import resend_to_judge
+
+
+class Command(BaseCommand):
+    help = "Send judge submits, that could not be handed over to the judge, again"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--problem",
+            type=int,
+            help="Resend only submits of this problem.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Resend also submits still waiting for their first attempts.",
+        )
+
+    def handle(self, *args, **options):
+        submits = JudgeSubmit.objects.all()
+        if options["problem"] is not None:
+            submits = submits.filter(problem_id=options["problem"])
+        if not options["all"]:
+            submits = submits.filter(judge_failed=True)
+
+        count = resend_to_judge(submits)
+        self.stdout.write(self.style.SUCCESS(f"{count} submits enqueued."))
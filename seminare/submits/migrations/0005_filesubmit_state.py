@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0004_filesubmit_late_accepted_judgesubmit_late_accepted_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="filesubmit",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("ready", "Ready"),
+                    ("processing", "Processing"),
+                    ("failed", "Failed"),
+                ],
+                default="ready",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0005_filesubmit_state"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="judgesubmit",
+            name="judge_id",
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_protocols(apps, schema_editor):
+    JudgeSubmit = apps.get_model("submits", "JudgeSubmit")
+    JudgeProtocol = apps.get_model("submits", "JudgeProtocol")
+
+    submits = (
+        JudgeSubmit.objects.exclude(protocol={})
+        .values_list("id", "protocol")
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for submit_id, protocol in submits:
+        batch.append(JudgeProtocol(submit_id=submit_id, data=protocol))
+        if len(batch) >= 1000:
+            JudgeProtocol.objects.bulk_create(batch)
+            batch = []
+    JudgeProtocol.objects.bulk_create(batch)
+
+
+def restore_protocols(apps, schema_editor):
+    JudgeSubmit = apps.get_model("submits", "JudgeSubmit")
+    JudgeProtocol = apps.get_model("submits", "JudgeProtocol")
+
+    for protocol in JudgeProtocol.objects.iterator(chunk_size=1000):
+        JudgeSubmit.objects.filter(id=protocol.submit_id).update(protocol=protocol.data)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0006_alter_judgesubmit_judge_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JudgeProtocol",
+            fields=[
+                (
+                    "submit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="judge_protocol",
+                        serialize=False,
+                        to="submits.judgesubmit",
+                    ),
+                ),
+                ("data", models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.RunPython(move_protocols, restore_protocols),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0007_judgeprotocol"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="judgesubmit",
+            name="protocol",
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0008_remove_judgesubmit_protocol"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="filesubmit",
+            name="comment_file_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="filesubmit",
+            name="file_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
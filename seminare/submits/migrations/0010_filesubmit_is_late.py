@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:49
+
+from django.db import migrations, models
+
+
+def mark_late_submits(apps, schema_editor):
+    FileSubmit = apps.get_model("submits", "FileSubmit")
+
+    FileSubmit.objects.filter(
+        created_at__gt=models.F("problem__problem_set__end_date")
+    ).update(is_late=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0006_problemsetfrozenresults_updated_at_text_updated_at"),
+        ("submits", "0009_filesubmit_file_hashes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="filesubmit",
+            name="is_late",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_late_submits, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="filesubmit",
+            index=models.Index(
+                condition=models.Q(("is_late", True)),
+                fields=["problem", "created_at"],
+                name="filesubmit_late_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_submits(apps, schema_editor):
+    FileSubmit = apps.get_model("submits", "FileSubmit")
+    GradingStats = apps.get_model("submits", "GradingStats")
+
+    # Grading times of existing submits are unknown, so the latency histogram starts
+    # empty. Enrollments without a graded submit stand in for ungraded effective
+    # submits, which depend on rule engines; rebuild_grading_stats counts them exactly.
+    GradingStats.objects.bulk_create(
+        GradingStats(
+            problem_id=row["problem_id"],
+            submits=row["submits"],
+            ungraded=row["enrollments"] - row["graded_enrollments"],
+        )
+        for row in FileSubmit.objects.order_by()
+        .values("problem_id")
+        .annotate(
+            submits=models.Count("id"),
+            enrollments=models.Count("enrollment", distinct=True),
+            graded_enrollments=models.Count(
+                "enrollment", distinct=True, filter=~models.Q(score=None)
+            ),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("problems", "0006_problemsetfrozenresults_updated_at_text_updated_at"),
+        ("submits", "0010_filesubmit_is_late"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GradingStats",
+            fields=[
+                (
+                    "problem",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="grading_stats",
+                        serialize=False,
+                        to="problems.problem",
+                    ),
+                ),
+                ("submits", models.IntegerField(default=0)),
+                ("ungraded", models.IntegerField(default=0)),
+                ("latency_histogram", models.JSONField(blank=True, default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "grading stats",
+            },
+        ),
+        migrations.AddField(
+            model_name="filesubmit",
+            name="scored_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(count_submits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+def count_graded(apps, schema_editor):
+    FileSubmit = apps.get_model("submits", "FileSubmit")
+    GradingStats = apps.get_model("submits", "GradingStats")
+
+    # Enrollments with a graded submit stand in for graded effective submits, as in
+    # 0011; rebuild_grading_stats counts them exactly.
+    for row in (
+        FileSubmit.objects.order_by()
+        .values("problem_id")
+        .annotate(
+            graded_enrollments=models.Count(
+                "enrollment", distinct=True, filter=~models.Q(score=None)
+            )
+        )
+    ):
+        GradingStats.objects.filter(problem_id=row["problem_id"]).update(
+            graded=row["graded_enrollments"]
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0011_gradingstats_filesubmit_scored_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gradingstats",
+            name="graded",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_graded, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("submits", "0012_gradingstats_graded"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="judgesubmit",
+            name="judge_failed",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,9 +1,20 @@
 import os
 import secrets
-from typing import TYPE_CHECKING
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+from operator import attrgetter
+from typing import TYPE_CHECKING, Iterable, Self
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from seminare.utils import get_file_hash
 
 if TYPE_CHECKING:
     from seminare.problems.models import Problem
@@ -57,13 +68,18 @@ class BaseSubmit(models.Model):
     def submit_id(self):
         raise NotImplementedError()
 
+    @classmethod
+    def is_score_visible(cls, score: Decimal | None, problem: "Problem") -> bool:
+        return score is not None
+
     def points_visible(self, problem: "Problem") -> bool:
-        return self.score is not None
+        return self.is_score_visible(self.score, problem)
 
     @classmethod
-    def get_submit_by_id_queryset(
-        cls, submit_id: str, **kwargs
-    ) -> "models.QuerySet[BaseSubmit, BaseSubmit]|None":
+    def parse_submit_id(cls, submit_id: str) -> "tuple[type[BaseSubmit], int] | None":
+        """
+        Returns submit class and database id for a submit_id like "F-42".
+        """
         try:
             submit_type, id = submit_id.split("-", 1)
         except ValueError:
@@ -80,7 +96,17 @@ class BaseSubmit(models.Model):
         if not id.isnumeric():
             return None
 
-        return submit_types[submit_type].objects.filter(id=id, **kwargs)
+        return submit_types[submit_type], int(id)
+
+    @classmethod
+    def get_submit_by_id_queryset(
+        cls, submit_id: str, **kwargs
+    ) -> "models.QuerySet[BaseSubmit, BaseSubmit]|None":
+        if (parsed := cls.parse_submit_id(submit_id)) is None:
+            return None
+
+        submit_cls, id = parsed
+        return submit_cls.objects.filter(id=id, **kwargs)
 
     @classmethod
     def get_submit_by_id(cls, submit_id: str, **kwargs) -> "BaseSubmit|None":
@@ -95,16 +121,161 @@ class BaseSubmit(models.Model):
 
 
 class FileSubmit(BaseSubmit):
+    class State(models.TextChoices):
+        READY = "ready", "Ready"
+        PROCESSING = "processing", "Processing"
+        FAILED = "failed", "Failed"
+
     file = models.FileField(upload_to=submit_file_filepath)
+    file_hash = models.CharField(max_length=64, blank=True)
     comment_file = models.FileField(upload_to=submit_file_filepath, blank=True)
+    comment_file_hash = models.CharField(max_length=64, blank=True)
+    state = models.CharField(choices=State.choices, max_length=16, default=State.READY)
+    is_late = models.BooleanField(default=False, editable=False)
+    scored_at = models.DateTimeField(blank=True, null=True, editable=False)
     type = BaseSubmit.SubmitType.FILE
 
+    class Meta(BaseSubmit.Meta):
+        indexes = [
+            # Late submits are a small fraction of all submits.
+            models.Index(
+                fields=["problem", "created_at"],
+                condition=models.Q(is_late=True),
+                name="filesubmit_late_idx",
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            created_at = self.created_at or timezone.now()
+            self.is_late = created_at > self.get_end_date()
+
+        update_fields = kwargs.get("update_fields")
+        if updated := [
+            *self.clear_stale_file_hashes(update_fields),
+            *self.update_scored_at(update_fields),
+        ]:
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *updated}
+
+        super().save(*args, **kwargs)
+
+        # Pending uploads get their final name only when saved to storage.
+        self._hashed_file_names = self._hashed_file_names | {
+            field: getattr(self, field).name or ""
+            for field in self.HASHED_FILE_FIELDS
+            if field in self.__dict__
+        }
+
+    HASHED_FILE_FIELDS = {"file": "file_hash", "comment_file": "comment_file_hash"}
+    _hashed_file_names: dict[str, str] = {}
+
+    @classmethod
+    def from_db(cls, *args, **kwargs) -> Self:
+        instance = super().from_db(*args, **kwargs)
+
+        instance._hashed_file_names = {
+            field: getattr(instance, field).name or ""
+            for field in cls.HASHED_FILE_FIELDS
+            if field in instance.__dict__
+        }
+        return instance
+
+    def update_scored_at(self, fields: Iterable[str] | None = None) -> list[str]:
+        """
+        Sets the time of grading when the submit gets a score, or clears it when the
+        score is removed. Returns names of the updated fields.
+        """
+        if "score" not in self.__dict__ or (
+            fields is not None and "score" not in fields
+        ):
+            return []
+
+        graded = self.score is not None
+        if graded == (self.scored_at is not None):
+            return []
+
+        self.scored_at = timezone.now() if graded else None
+        return ["scored_at"]
+
+    def get_end_date(self) -> datetime:
+        """
+        Returns the end date of the problem set, without a query when the problem
+        and its problem set are loaded, as they are when submitting.
+        """
+        from seminare.problems.models import Problem
+
+        if FileSubmit.problem.is_cached(self) and Problem.problem_set.is_cached(
+            self.problem
+        ):
+            return self.problem.problem_set.end_date
+
+        return (
+            Problem.objects.filter(id=self.problem_id)
+            .values_list("problem_set__end_date", flat=True)
+            .get()
+        )
+
+    def clear_stale_file_hashes(self, fields: Iterable[str] | None = None) -> list[str]:
+        """
+        Clears hashes of files that changed since they were hashed, without reading
+        the files. Returns names of the updated hash fields.
+        """
+        updated = []
+        for field, hash_field in self.HASHED_FILE_FIELDS.items():
+            if field not in self.__dict__ or (
+                fields is not None and field not in fields
+            ):
+                continue
+
+            file: FieldFile = getattr(self, field)
+            if self._hashed_file_names.get(field) != file.name and getattr(
+                self, hash_field
+            ):
+                setattr(self, hash_field, "")
+                updated.append(hash_field)
+
+        return updated
+
+    def update_file_hashes(self) -> list[str]:
+        """
+        Computes missing SHA-256 hashes of stored files. Files are read whole, so this
+        is done by background jobs and bulk grading rather than on every save.
+        Returns names of the updated hash fields.
+        """
+        updated = []
+        for field, hash_field in self.HASHED_FILE_FIELDS.items():
+            file: FieldFile = getattr(self, field)
+            if getattr(self, hash_field) or not file:
+                continue
+
+            with file.open("rb"):
+                setattr(self, hash_field, get_file_hash(file))
+            self._hashed_file_names = self._hashed_file_names | {field: file.name}
+            updated.append(hash_field)
+
+        return updated
+
     @property
     def submit_id(self):
         return f"F-{self.id}"
 
-    def points_visible(self, problem: "Problem") -> bool:
-        return problem.points_publicly_visible and super().points_visible(problem)
+    @property
+    def progress_cache_key(self) -> str:
+        return f"file_submit_progress/{self.id}"
+
+    @property
+    def progress(self) -> tuple[int, int] | None:
+        """
+        Returns (processed pages, total pages) while the submit is being processed.
+        """
+        return cache.get(self.progress_cache_key)
+
+    @classmethod
+    def is_score_visible(cls, score: Decimal | None, problem: "Problem") -> bool:
+        return problem.points_publicly_visible and super().is_score_visible(
+            score, problem
+        )
 
     def is_displayable(self):
         if not self.file:
@@ -121,9 +292,10 @@ class FileSubmit(BaseSubmit):
 
 class JudgeSubmit(BaseSubmit):
     program = models.FileField(upload_to=submit_judge_filepath)
-    protocol = models.JSONField(blank=True, default=dict)
-    judge_id = models.CharField(max_length=255, unique=True)
+    judge_id = models.CharField(max_length=255, unique=True, blank=True, null=True)
     protocol_key = models.CharField(max_length=255, blank=True)
+    judge_failed = models.BooleanField(default=False)
+    """The program could not be handed over to the judge, even after retries."""
     type = BaseSubmit.SubmitType.JUDGE
 
     @property
@@ -134,6 +306,32 @@ class JudgeSubmit(BaseSubmit):
     def judge_url(self):
         return settings.JUDGE_URL
 
+    @property
+    def protocol(self) -> dict:
+        try:
+            return self.judge_protocol.data
+        except JudgeProtocol.DoesNotExist:
+            return {}
+
+
+class JudgeProtocol(models.Model):
+    """
+    Protocol reported by the judge, stored apart from JudgeSubmit,
+    so that queries over submits do not transfer it.
+    """
+
+    submit = models.OneToOneField(
+        JudgeSubmit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="judge_protocol",
+    )
+    submit_id: int
+    data = models.JSONField(blank=True, default=dict)
+
+    def __str__(self):
+        return f"Protocol of {self.submit_id}"
+
 
 class TextSubmit(BaseSubmit):
     value = models.TextField(blank=True)
@@ -146,3 +344,149 @@ class TextSubmit(BaseSubmit):
     @property
     def tooltip(self):
         return f"Odpoveď: {self.value}"
+
+
+GRADING_LATENCY_BUCKETS = [1, 6, 24, 72, 168, 336]
+"""Upper bounds (in hours) of grading latency histogram buckets. Longer latencies fall into an extra bucket."""
+
+
+@dataclass(slots=True, frozen=True)
+class GradingState:
+    """
+    What GradingStats count of a file submit.
+    """
+
+    graded: bool
+    latency_bucket: int | None
+
+    @classmethod
+    def get(
+        cls, created_at: datetime, score: Decimal | None, scored_at: datetime | None
+    ) -> Self:
+        if score is None:
+            return cls(graded=False, latency_bucket=None)
+        if scored_at is None:
+            # Graded before grading times were recorded.
+            return cls(graded=True, latency_bucket=None)
+
+        hours = (scored_at - created_at).total_seconds() / 3600
+        return cls(
+            graded=True, latency_bucket=bisect_left(GRADING_LATENCY_BUCKETS, hours)
+        )
+
+
+class GradingStats(models.Model):
+    """
+    Counters of file submits of a problem, so that grading progress is read without
+    scanning submits. They are refreshed in the background shortly after submits of
+    the problem change, see schedule_grading_stats_refresh().
+    """
+
+    problem = models.OneToOneField(
+        "problems.Problem",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="grading_stats",
+    )
+    problem_id: int
+    submits = models.IntegerField(default=0)
+    ungraded = models.IntegerField(default=0)
+    """Effective submits without a score; superseded submits are not graded."""
+    graded = models.IntegerField(default=0)
+    """Effective submits with a score."""
+    latency_histogram = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "grading stats"
+
+    def __str__(self):
+        return f"Grading stats of {self.problem_id}"
+
+    def add(self, state: GradingState):
+        self.submits += 1
+        if state.latency_bucket is not None:
+            histogram = self.latency_histogram
+            histogram.extend([0] * (len(GRADING_LATENCY_BUCKETS) + 1 - len(histogram)))
+            histogram[state.latency_bucket] += 1
+
+    def get_median_latency_bucket(self) -> int | None:
+        """
+        Returns the index of the histogram bucket (see GRADING_LATENCY_BUCKETS) with
+        the median grading latency.
+        """
+        total = sum(self.latency_histogram)
+        seen = 0
+        for bucket, count in enumerate(self.latency_histogram):
+            seen += count
+            if seen * 2 >= total > 0:
+                return bucket
+        return None
+
+    @classmethod
+    def rebuild(cls, problem_ids: Iterable[int] | None = None) -> int:
+        """
+        Recomputes stats of the problems, or of all problems with file submits, from
+        their submits. Returns the number of rebuilt problems.
+        """
+        from seminare.problems.models import Problem
+
+        submits = FileSubmit.objects.order_by()
+        stats = {}
+        if problem_ids is not None:
+            problem_ids = list(problem_ids)
+            submits = submits.filter(problem_id__in=problem_ids)
+            stats = {
+                problem_id: cls(problem_id=problem_id) for problem_id in problem_ids
+            }
+        else:
+            # Problems whose submits were all deleted are reset.
+            stats = {
+                problem_id: cls(problem_id=problem_id)
+                for problem_id in cls.objects.values_list("problem_id", flat=True)
+            }
+
+        for problem_id, *fields in submits.values_list(
+            "problem_id", "created_at", "score", "scored_at"
+        ).iterator():
+            if problem_id not in stats:
+                stats[problem_id] = cls(problem_id=problem_id)
+            stats[problem_id].add(GradingState.get(*fields))
+
+        problems = (
+            Problem.objects.filter(id__in=stats)
+            .select_related("problem_set")
+            .order_by("problem_set_id")
+        )
+        stats = {problem.id: stats[problem.id] for problem in problems}
+        for problem_set, group in groupby(problems, key=attrgetter("problem_set")):
+            rule_engine = problem_set.get_rule_engine()
+            effective = rule_engine.get_enrollments_problems_effective_submits(
+                FileSubmit, rule_engine.get_enrollments(), list(group)
+            )
+            for problem_id, ungraded, graded in (
+                FileSubmit.objects.filter(id__in=effective.values("id"))
+                .values("problem_id")
+                .annotate(
+                    ungraded=models.Count("id", filter=models.Q(score=None)),
+                    graded=models.Count("id", filter=~models.Q(score=None)),
+                )
+                .values_list("problem_id", "ungraded", "graded")
+            ):
+                stats[problem_id].ungraded = ungraded
+                stats[problem_id].graded = graded
+
+        cls.objects.bulk_create(
+            stats.values(),
+            update_conflicts=True,
+            unique_fields=["problem"],
+            update_fields=[
+                "submits",
+                "ungraded",
+                "graded",
+                "latency_histogram",
+                "updated_at",
+            ],
+        )
+
+        return len(stats)
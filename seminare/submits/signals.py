@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+
+from seminare.submits.models import FileSubmit
+from seminare.submits.tasks import schedule_grading_stats_refresh
+
+
+def refresh_grading_stats(sender, instance: FileSubmit, **kwargs):
+    schedule_grading_stats_refresh(instance.problem_id)
+
+
+for signal in (post_save, post_delete):
+    signal.connect(
+        refresh_grading_stats, sender=FileSubmit, dispatch_uid="grading_stats"
+    )
@@ -1,8 +1,35 @@
-from django.urls import reverse
+from datetime import timedelta
+
+import django_rq
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import QuerySet
 from django_rq import job
+from rq import Retry, get_current_job
 
 from seminare.contests.models import Contest
-from seminare.submits.models import BaseSubmit
+from seminare.problems.models import Problem
+from seminare.submits.digest import (
+    add_to_digest,
+    build_digests,
+    get_digests,
+    get_grade_url,
+    remove_from_digests,
+)
+from seminare.submits.judge import (
+    REJUDGE_RATE,
+    REJUDGE_REPORT_TIMEOUT,
+    REJUDGE_TIMEOUT,
+    finish_rejudge,
+    get_rejudge_submits,
+    rejudge,
+    send_judge_submit,
+)
+from seminare.submits.models import BaseSubmit, FileSubmit, GradingStats, JudgeSubmit
+from seminare.submits.utils import combine_images_into_pdf, highlight_file
 from seminare.users.models import User
 from seminare.utils import send_mail
 
@@ -14,7 +41,9 @@ def mail_reviewer(submit_id: str):
         return
 
     submit = submit.select_related(
-        "problem__reviewer", "problem__problem_set__contest", "enrollment__user"
+        "problem__reviewer",
+        "problem__problem_set__contest__site",
+        "enrollment__user",
     ).first()
 
     if submit is None or submit.problem.reviewer is None or submit.score is not None:
@@ -28,17 +57,208 @@ def mail_reviewer(submit_id: str):
         f"[{contest.short_name}] Nový submit v úlohe {submit.problem.name}",
         "reviewer_submit_notification",
         contest,
-        {
-            "submit": submit,
-            "grade_url": f"https://{contest.site.domain}{
-                reverse(
-                    'org:grading_submit',
-                    args=[
-                        submit.problem.problem_set.slug,
-                        submit.problem.number,
-                        submit.submit_id,
-                    ],
-                )
-            }",
-        },
+        {"submit": submit, "grade_url": get_grade_url(submit)},
+    )
+
+
+@job("default", retry=Retry(max=3, interval=[60, 300, 900]))
+def flush_reviewer_digests():
+    """
+    Sends collected new-submit notifications, one email per reviewer, over a single connection.
+
+    Notifications are removed only after they are sent, so a failed flush is retried
+    with all of them.
+    """
+    digests = get_digests()
+    messages = build_digests(digests)
+    if messages:
+        with get_connection() as connection:
+            connection.send_messages(messages)
+    remove_from_digests(digests)
+
+
+def notify_reviewer(reviewer_id: int, submit_id: str):
+    """
+    Notifies the reviewer about a new submit, either directly or in the next digest.
+    """
+    if not settings.REVIEWER_DIGEST_DELAY:
+        mail_reviewer.delay(submit_id)
+        return
+
+    if add_to_digest(reviewer_id, submit_id):
+        django_rq.get_queue("default").enqueue_in(
+            timedelta(seconds=settings.REVIEWER_DIGEST_DELAY), flush_reviewer_digests
+        )
+
+
+@job("default", retry=Retry(max=6, interval=[10, 20, 40, 80, 160, 320]))
+def send_to_judge(submit_id: int):
+    """
+    Hands a JudgeSubmit over to the judge.
+
+    Failed attempts are retried with exponential backoff, which requires
+    a worker running with the scheduler (rqworker --with-scheduler). When the last
+    attempt fails, the submit is marked as failed, see the resend_to_judge command.
+    """
+    submit = (
+        JudgeSubmit.objects.filter(id=submit_id, judge_id=None)
+        .select_related("problem", "enrollment__user")
+        .first()
+    )
+    if submit is None:
+        return
+
+    try:
+        judge_submit = send_judge_submit(submit)
+    except Exception:
+        job = get_current_job()
+        if job is None or not job.retries_left:
+            JudgeSubmit.objects.filter(id=submit.id).update(judge_failed=True)
+        raise
+
+    submit.judge_id = judge_submit.public_id
+    submit.protocol_key = judge_submit.protocol_key
+    submit.judge_failed = False
+    submit.save(update_fields=["judge_id", "protocol_key", "judge_failed"])
+
+
+def resend_to_judge(submits: QuerySet[JudgeSubmit]) -> int:
+    """
+    Enqueues submits, that have not been handed over to the judge, to be sent again.
+    Returns the number of enqueued submits.
+    """
+    submit_ids = list(submits.filter(judge_id=None).values_list("id", flat=True))
+    JudgeSubmit.objects.filter(id__in=submit_ids).update(judge_failed=False)
+    for submit_id in submit_ids:
+        send_to_judge.delay(submit_id)
+    return len(submit_ids)
+
+
+@job("default", timeout=REJUDGE_TIMEOUT)
+def rejudge_problem(
+    problem_id: int, effective_only: bool = False, rate: int = REJUDGE_RATE
+):
+    """
+    Sends judge submits of a problem to the judge again.
+
+    The rejudge has to be started with start_rejudge() first. If some judge reports
+    do not arrive in time, the rejudge is finished anyway by expire_rejudge.
+    """
+    problem = (
+        Problem.objects.filter(id=problem_id).select_related("problem_set").first()
+    )
+    if problem is None:
+        finish_rejudge(problem_id)
+        return
+
+    progress = rejudge(problem_id, get_rejudge_submits(problem, effective_only), rate)
+    if not progress.finished:
+        schedule_rejudge_expiry(problem_id)
+
+
+@job
+def expire_rejudge(problem_id: int):
+    finish_rejudge(problem_id)
+
+
+def schedule_rejudge_expiry(problem_id: int):
+    django_rq.get_queue("default").enqueue_in(
+        timedelta(seconds=REJUDGE_REPORT_TIMEOUT), expire_rejudge, problem_id
     )
+
+
+@job
+def highlight_program(submit_id: int):
+    submit = JudgeSubmit.objects.filter(id=submit_id).only("id", "program").first()
+    if submit is None or not submit.program:
+        return
+
+    highlight_file(submit.program)
+
+
+@job
+def build_submit_pdf(submit_id: int, images: list[str]):
+    """
+    Combines uploaded images of a FileSubmit into a single PDF and marks the submit as ready.
+
+    Images are deleted afterwards. On failure the submit is marked as failed and
+    the images are kept, so the job can be requeued.
+    """
+    submit = (
+        FileSubmit.objects.filter(id=submit_id)
+        .select_related("enrollment", "problem")
+        .first()
+    )
+    if submit is None:
+        for name in images:
+            default_storage.delete(name)
+        return
+
+    def set_progress(done: int, total: int):
+        cache.set(submit.progress_cache_key, (done, total), timeout=60 * 60)
+
+    set_progress(0, len(images))
+    try:
+        files = [default_storage.open(name) for name in images]
+        try:
+            pdf = combine_images_into_pdf(files, progress=set_progress)
+        finally:
+            for file in files:
+                file.close()
+    except Exception:
+        submit.state = FileSubmit.State.FAILED
+        submit.save(update_fields=["state"])
+        raise
+    finally:
+        cache.delete(submit.progress_cache_key)
+
+    try:
+        submit.file.save(pdf.name, pdf, save=False)
+    finally:
+        pdf.close()
+    submit.state = FileSubmit.State.READY
+    submit.save(update_fields=["file", "state", *submit.update_file_hashes()])
+
+    for name in images:
+        default_storage.delete(name)
+
+    if submit.problem.reviewer_id is not None:
+        notify_reviewer(submit.problem.reviewer_id, submit.submit_id)
+
+
+GRADING_STATS_REFRESH_DELAY = 10
+
+
+def get_grading_stats_refresh_key(problem_id: int) -> str:
+    return f"grading_stats/{problem_id}/refresh"
+
+
+@job
+def refresh_grading_stats(problem_id: int):
+    # Changes made from now on schedule another refresh.
+    django_rq.get_connection().delete(get_grading_stats_refresh_key(problem_id))
+    GradingStats.rebuild([problem_id])
+
+
+def schedule_grading_stats_refresh(problem_id: int):
+    """
+    Refreshes grading stats of the problem in the background, once the current
+    transaction commits. Changes within GRADING_STATS_REFRESH_DELAY seconds are
+    refreshed together, so a burst of submits does not contend for the stats row.
+    """
+
+    def enqueue():
+        # Kept in Redis, as the worker clears it and the cache may be per process.
+        if django_rq.get_connection().set(
+            get_grading_stats_refresh_key(problem_id),
+            1,
+            nx=True,
+            ex=GRADING_STATS_REFRESH_DELAY * 30,
+        ):
+            django_rq.get_queue("default").enqueue_in(
+                timedelta(seconds=GRADING_STATS_REFRESH_DELAY),
+                refresh_grading_stats,
+                problem_id,
+            )
+
+    transaction.on_commit(enqueue)
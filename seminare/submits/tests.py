@@ -1 +1,511 @@
-# Create your tests here.
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO
+from smtplib import SMTPException
+from unittest import mock
+
+import django_rq
+import requests
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from judge_client.client import JudgeClient
+from PIL import Image
+
+from seminare.contests.models import Contest
+from seminare.problems.models import Problem, ProblemSet
+from seminare.rules import get_problem_version, get_results_version
+from seminare.submits import digest, judge, utils
+from seminare.submits.models import (
+    FileSubmit,
+    GradingStats,
+    JudgeProtocol,
+    JudgeSubmit,
+)
+from seminare.submits.tasks import (
+    build_submit_pdf,
+    flush_reviewer_digests,
+    get_grading_stats_refresh_key,
+    refresh_grading_stats,
+    resend_to_judge,
+    send_to_judge,
+)
+from seminare.users.models import Enrollment, Grade, User
+from seminare.utils import stream_zip
+
+
+class TemporaryMediaMixin:
+    def setUp(self) -> None:
+        super().setUp()  # pyright: ignore
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)  # pyright: ignore
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)  # pyright: ignore
+        cache.clear()
+
+
+class TemporaryPrivateStorageMixin:
+    def setUp(self) -> None:
+        super().setUp()  # pyright: ignore
+        private_root = tempfile.TemporaryDirectory()
+        self.addCleanup(private_root.cleanup)  # pyright: ignore
+        private = settings.STORAGES["private"] | {
+            "OPTIONS": {"location": private_root.name, "base_url": "/.private/"}
+        }
+        settings_override = override_settings(
+            STORAGES=settings.STORAGES | {"private": private}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)  # pyright: ignore
+
+
+class HighlightTests(TemporaryMediaMixin, SimpleTestCase):
+    def get_program(self, name: str, content: str):
+        name = default_storage.save(name, ContentFile(content.encode()))
+        return JudgeSubmit(program=name).program
+
+    def test_highlight_is_cached(self):
+        program = self.get_program("program.py", "print('hello')\n")
+
+        html = utils.highlight_file(program)
+        self.assertIn("codehilite", html)
+        self.assertEqual(cache.get(utils.get_highlight_cache_key(program)), html)
+
+    def test_large_file_is_plain_text(self):
+        code = "<b>x</b>\n" * (utils.HIGHLIGHT_MAX_SIZE // 8)
+        program = self.get_program("program.cpp", code)
+
+        html = utils.highlight_file(program)
+        self.assertTrue(html.startswith('<div class="codehilite"><pre>'))
+        self.assertIn("&lt;b&gt;x&lt;/b&gt;", html)
+        self.assertNotIn("<span", html)
+        # Only the beginning is read and it is not cached.
+        self.assertLess(html.count("&lt;b&gt;"), utils.HIGHLIGHT_MAX_SIZE // 8)
+        self.assertIsNone(cache.get(utils.get_highlight_cache_key(program)))
+
+
+class StreamZipTests(TemporaryMediaMixin, SimpleTestCase):
+    def test_stream_zip(self):
+        name = default_storage.save("riesenie.pdf", ContentFile(b"%PDF" * 50000))
+        pdf = FileSubmit(file=name).file
+
+        chunks = list(stream_zip([("a/riesenie.pdf", pdf), ("a/body.txt", "1.5")]))
+        self.assertGreater(len(chunks), 2)
+
+        with zipfile.ZipFile(BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(archive.read("a/riesenie.pdf"), b"%PDF" * 50000)
+            self.assertEqual(archive.read("a/body.txt"), b"1.5")
+            self.assertEqual(
+                archive.getinfo("a/riesenie.pdf").compress_type, zipfile.ZIP_STORED
+            )
+            self.assertEqual(
+                archive.getinfo("a/body.txt").compress_type, zipfile.ZIP_DEFLATED
+            )
+
+
+class SubmitTestCase(TemporaryMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        site = Site.objects.create(domain="test.localhost", name="test.localhost")
+        contest = Contest.objects.create(
+            name="Test", short_name="test", contact_email="test@example.com", site=site
+        )
+        cls.contest = contest
+        problem_set = ProblemSet.objects.create(
+            slug="kolo",
+            contest=contest,
+            name="Kolo",
+            start_date=timezone.now() - timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=1),
+            rule_engine="seminare.rules.ksp.KSP2025",
+            rule_engine_options={
+                "doprogramovanie_date": (timezone.now() + timedelta(days=2)).isoformat()
+            },
+        )
+        cls.problem = Problem.objects.create(
+            name="Úloha", number=1, problem_set=problem_set, file_points=10
+        )
+        cls.enrollment = Enrollment.objects.create(
+            problem_set=problem_set,
+            user=User.objects.create(username="contestant"),
+            grade=Grade.SS1,
+        )
+
+
+class LateSubmitTests(SubmitTestCase):
+    def test_late_flag(self):
+        submit = FileSubmit.objects.create(
+            problem=self.problem, enrollment=self.enrollment
+        )
+        self.assertFalse(submit.is_late)
+
+        problem_set = ProblemSet.objects.get(id=self.problem.problem_set_id)
+        version = get_problem_version(self.problem.id)
+        problem_set.end_date = timezone.now() - timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            problem_set.save()
+        self.assertTrue(FileSubmit.objects.get(id=submit.id).is_late)
+        self.assertNotEqual(get_problem_version(self.problem.id), version)
+
+        problem = Problem.objects.select_related("problem_set").get(id=self.problem.id)
+        late = FileSubmit.objects.create(problem=problem, enrollment=self.enrollment)
+        self.assertTrue(late.is_late)
+
+        problem_set.end_date = timezone.now() + timedelta(days=1)
+        problem_set.save()
+        self.assertFalse(FileSubmit.objects.filter(is_late=True).exists())
+
+
+class GradingStatsTests(SubmitTestCase):
+    def get_stats(self) -> tuple[int, int, int, list[int]]:
+        stats = GradingStats.objects.get(problem=self.problem)
+        return stats.submits, stats.ungraded, stats.graded, stats.latency_histogram
+
+    def test_counters(self):
+        submits = [
+            FileSubmit.objects.create(problem=self.problem, enrollment=self.enrollment)
+            for _ in range(3)
+        ]
+        other = Enrollment.objects.create(
+            problem_set=self.problem.problem_set,
+            user=User.objects.create(username="other"),
+            grade=Grade.SS2,
+        )
+        FileSubmit.objects.create(problem=self.problem, enrollment=other)
+        self.assertEqual(GradingStats.rebuild([self.problem.id]), 1)
+        # Only the effective submit of each enrollment waits for grading.
+        self.assertEqual(self.get_stats(), (4, 2, 0, []))
+
+        FileSubmit.objects.filter(id=submits[0].id).update(
+            created_at=timezone.now() - timedelta(hours=30)
+        )
+        for submit, score in zip(FileSubmit.objects.order_by("id"), [4, 2]):
+            submit.score = score
+            submit.save()
+        GradingStats.rebuild([self.problem.id])
+        self.assertEqual(self.get_stats(), (4, 1, 1, [1, 0, 0, 1, 0, 0, 0]))
+        self.assertEqual(
+            GradingStats.objects.get(problem=self.problem).get_median_latency_bucket(),
+            0,
+        )
+
+        # Regrading keeps the time of the first grading.
+        submit = FileSubmit.objects.get(id=submits[1].id)
+        submit.score = 3
+        submit.save()
+        submit = FileSubmit.objects.get(id=submits[0].id)
+        submit.score = None
+        submit.save(update_fields=["score"])
+        self.assertIsNone(FileSubmit.objects.get(id=submit.id).scored_at)
+
+        submits[2].delete()
+        self.assertEqual(GradingStats.rebuild(), 1)
+        self.assertEqual(self.get_stats(), (3, 1, 1, [1, 0, 0, 0, 0, 0, 0]))
+
+    def test_superseded_submits(self):
+        FileSubmit.objects.create(problem=self.problem, enrollment=self.enrollment)
+        FileSubmit.objects.create(
+            problem=self.problem, enrollment=self.enrollment, score=5
+        )
+        GradingStats.rebuild([self.problem.id])
+        # The ungraded submit is superseded, so it is neither graded nor ungraded.
+        self.assertEqual(self.get_stats()[:3], (2, 0, 1))
+
+    def test_refresh_is_scheduled_once(self):
+        django_rq.get_connection().delete(
+            get_grading_stats_refresh_key(self.problem.id)
+        )
+        with mock.patch("django_rq.get_queue") as get_queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(2):
+                    FileSubmit.objects.create(
+                        problem=self.problem, enrollment=self.enrollment
+                    )
+
+        get_queue.return_value.enqueue_in.assert_called_once()
+        refresh_grading_stats(self.problem.id)
+        self.assertEqual(self.get_stats(), (2, 1, 0, []))
+
+
+class ReviewerDigestTests(SubmitTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        connection = django_rq.get_connection()
+        for reviewer_id in connection.smembers(digest.DIGEST_REVIEWERS_KEY):
+            connection.delete(digest.get_digest_key(int(reviewer_id)))
+        connection.delete(digest.DIGEST_REVIEWERS_KEY, digest.DIGEST_SCHEDULED_KEY)
+
+    def test_add_and_remove(self):
+        self.assertTrue(digest.add_to_digest(1, "F-1"))
+        self.assertFalse(digest.add_to_digest(1, "F-2"))
+        digest.add_to_digest(2, "F-3")
+
+        digests = digest.get_digests()
+        self.assertEqual(digests, {1: ["F-1", "F-2"], 2: ["F-3"]})
+        # Notifications added from now on schedule another flush.
+        self.assertTrue(digest.add_to_digest(1, "F-4"))
+
+        digest.remove_from_digests(digests)
+        self.assertEqual(digest.get_digests(), {1: ["F-4"]})
+
+    def test_failed_flush(self):
+        reviewer = User.objects.create(username="reviewer", email="r@example.com")
+        submit = FileSubmit.objects.create(
+            problem=self.problem, enrollment=self.enrollment
+        )
+        digest.add_to_digest(reviewer.id, submit.submit_id)
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=SMTPException,
+        ):
+            with self.assertRaises(SMTPException):
+                flush_reviewer_digests()
+        self.assertEqual(digest.get_digests(), {reviewer.id: [submit.submit_id]})
+
+        flush_reviewer_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(digest.get_digests(), {})
+
+    def test_build_digests(self):
+        reviewer = User.objects.create(username="reviewer", email="r@example.com")
+        submits = [
+            FileSubmit.objects.create(problem=self.problem, enrollment=self.enrollment)
+            for _ in range(3)
+        ]
+        submits[2].score = 1
+        submits[2].save()
+
+        with self.assertNumQueries(2):
+            messages = digest.build_digests(
+                {reviewer.id: [submit.submit_id for submit in submits] + ["X-1"]}
+            )
+
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].to, ["r@example.com"])
+        self.assertIn("(2)", messages[0].subject)
+        self.assertEqual(messages[0].body.count("contestant"), 2)
+
+
+class BuildSubmitPDFTests(SubmitTestCase):
+    def save_image(self, name: str) -> str:
+        buffer = BytesIO()
+        Image.new("RGB", (400, 600), "white").save(buffer, format="JPEG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_build(self):
+        submit = FileSubmit.objects.create(
+            problem=self.problem,
+            enrollment=self.enrollment,
+            state=FileSubmit.State.PROCESSING,
+        )
+        images = [self.save_image("a.jpg"), self.save_image("b.jpg")]
+
+        build_submit_pdf(submit.id, images)
+
+        submit.refresh_from_db()
+        self.assertEqual(submit.state, FileSubmit.State.READY)
+        self.assertTrue(submit.file.name.endswith(".pdf"))
+        self.assertTrue(submit.file.read().startswith(b"%PDF"))
+        self.assertEqual(len(submit.file_hash), 64)
+        self.assertFalse(any(default_storage.exists(name) for name in images))
+
+    def test_failure_keeps_images(self):
+        submit = FileSubmit.objects.create(
+            problem=self.problem,
+            enrollment=self.enrollment,
+            state=FileSubmit.State.PROCESSING,
+        )
+        name = default_storage.save("broken.jpg", ContentFile(b"not an image"))
+
+        with self.assertRaises(RuntimeError):
+            build_submit_pdf(submit.id, [name])
+
+        submit.refresh_from_db()
+        self.assertEqual(submit.state, FileSubmit.State.FAILED)
+        self.assertTrue(default_storage.exists(name))
+
+
+class SessionlessJudgeClient(JudgeClient):
+    def __init__(self, judge_token: str, judge_url: str):
+        pass
+
+
+class SessionJudgeClient(SessionlessJudgeClient):
+    def __init__(self, judge_token: str, judge_url: str):
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = judge_token
+
+
+class JudgeClientTests(SimpleTestCase):
+    def setUp(self) -> None:
+        judge.get_judge_client.cache_clear()
+        self.addCleanup(judge.get_judge_client.cache_clear)
+
+    @override_settings(
+        JUDGE_CLIENT="seminare.submits.tests.SessionJudgeClient", JUDGE_TOKEN="token"
+    )
+    def test_pooled_session(self):
+        client = judge.get_judge_client()
+        self.assertIsInstance(client.session, judge.PooledSession)  # pyright: ignore
+        self.assertEqual(client.session.headers["Authorization"], "token")  # pyright: ignore
+
+    @override_settings(JUDGE_CLIENT="seminare.submits.tests.SessionlessJudgeClient")
+    def test_missing_session(self):
+        with self.assertLogs("seminare.submits.judge", "WARNING"):
+            judge.get_judge_client()
+
+
+@override_settings(JUDGE_CLIENT="seminare.submits.fake_judge.FakeJudgeClient")
+class SendToJudgeTests(SubmitTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for cached in (judge.get_judge_client, judge.get_circuit_breaker):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+    def create_submit(self) -> JudgeSubmit:
+        return JudgeSubmit.objects.create(
+            problem=self.problem,
+            enrollment=self.enrollment,
+            program=default_storage.save("program.py", ContentFile(b"print(1)\n")),
+        )
+
+    def test_send(self):
+        submit = self.create_submit()
+        client = judge.get_judge_client()
+        client.failures = 1
+
+        with self.assertRaises(ConnectionError):
+            send_to_judge(submit.id)
+        submit.refresh_from_db()
+        self.assertIsNone(submit.judge_id)
+        # Outside of a worker there are no retries left.
+        self.assertTrue(submit.judge_failed)
+
+        with mock.patch.object(send_to_judge, "delay") as delay:
+            self.assertEqual(resend_to_judge(JudgeSubmit.objects.all()), 1)
+        delay.assert_called_once_with(submit.id)
+
+        send_to_judge(submit.id)
+        submit.refresh_from_db()
+        self.assertFalse(submit.judge_failed)
+        self.assertEqual(submit.judge_id, client.submits[0]["public_id"])
+        self.assertEqual(client.submits[0]["program"], b"print(1)\n")
+
+        # Already handed over submits are not sent again.
+        send_to_judge(submit.id)
+        self.assertEqual(len(client.submits), 1)
+
+    def test_circuit_breaker(self):
+        breaker = judge.get_circuit_breaker()
+        client = judge.get_judge_client()
+        client.failures = breaker.threshold
+        submit = self.create_submit()
+
+        for _ in range(breaker.threshold):
+            with self.assertRaises(ConnectionError):
+                judge.send_judge_submit(submit)
+
+        with self.assertRaises(judge.JudgeUnavailableError):
+            judge.send_judge_submit(submit)
+        self.assertEqual(client.submits, [])
+
+        breaker.reset_timeout = 0
+        judge.send_judge_submit(submit)
+        self.assertEqual(len(client.submits), 1)
+
+    def test_resubmit(self):
+        submits = [self.create_submit() for _ in range(5)]
+        for submit in submits:
+            submit.judge_id = f"old-{submit.id}"
+        JudgeSubmit.objects.bulk_update(submits, fields=["judge_id"])
+
+        def on_sent(submit: JudgeSubmit):
+            # Called before the new judge id is saved.
+            self.assertFalse(JudgeSubmit.objects.filter(judge_id=submit.judge_id))
+            marked.append(submit)
+
+        marked = []
+        sent = judge.resubmit_to_judge(
+            JudgeSubmit.objects.select_related("problem", "enrollment__user"),
+            concurrency=2,
+            on_sent=on_sent,
+        )
+
+        self.assertEqual(len(sent), 5)
+        self.assertEqual(marked, sent)
+        self.assertFalse(JudgeSubmit.objects.filter(judge_id__startswith="old-"))
+
+    def post_report(self, data: dict):
+        return self.client.post(
+            reverse("judge_report"),
+            json.dumps({"token": "token", **data}),
+            content_type="application/json",
+        )
+
+    @override_settings(JUDGE_TOKEN="token")
+    def test_rejudge(self):
+        for _ in range(3):
+            self.create_submit()
+
+        django_rq.get_connection().delete(judge.get_rejudge_key(self.problem.id))
+        self.assertTrue(judge.start_rejudge(self.problem.id))
+        self.assertFalse(judge.start_rejudge(self.problem.id))
+        progress = judge.rejudge(
+            self.problem.id, judge.get_rejudge_submits(self.problem, False), rate=2
+        )
+        self.assertEqual((progress.sent, progress.failed), (3, 0))
+        self.assertFalse(progress.finished)
+
+        version = get_results_version(self.problem.problem_set_id)
+        for i, judge_id in enumerate(
+            JudgeSubmit.objects.values_list("judge_id", flat=True)
+        ):
+            self.assertEqual(get_results_version(self.problem.problem_set_id), version)
+            self.assertEqual(judge.get_rejudge_progress(self.problem.id).reported, i)  # pyright: ignore
+            response = self.post_report(
+                {"public_id": judge_id, "protocol": {"final_score": 1}}
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(get_results_version(self.problem.problem_set_id), version + 1)
+        self.assertIsNone(judge.get_rejudge_progress(self.problem.id))
+        self.assertFalse(JudgeSubmit.objects.filter(score=None))
+
+    @override_settings(JUDGE_TOKEN="token")
+    def test_batch_reports(self):
+        submits = [self.create_submit() for _ in range(2)]
+        for submit in submits:
+            submit.judge_id = f"judge-{submit.id}"
+        JudgeSubmit.objects.bulk_update(submits, fields=["judge_id"])
+
+        version = get_results_version(self.problem.problem_set_id)
+        reports = [
+            {"public_id": submit.judge_id, "protocol": {"final_score": 0.5}}
+            for submit in submits
+        ]
+        response = self.post_report(
+            {"reports": reports + [{"public_id": "unknown", "protocol": {}}]}
+        )
+
+        self.assertEqual(response.json(), {"ok": True, "missing": ["unknown"]})
+        self.assertEqual(get_results_version(self.problem.problem_set_id), version + 1)
+        self.assertEqual(JudgeProtocol.objects.filter(data__final_score=0.5).count(), 2)
+
+        self.post_report(reports[0] | {"protocol": {"final_score": 1}})
+        self.assertEqual(
+            JudgeSubmit.objects.get(id=submits[0].id).protocol, {"final_score": 1}
+        )
+        self.assertEqual(
+            self.post_report(reports[0] | {"public_id": "x"}).status_code, 404
+        )
@@ -1,71 +1,172 @@
-from io import BytesIO
+import codecs
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import TypeAlias
+from typing import Callable, Iterator, TypeAlias
 
 from django.conf import settings
-from django.contrib.auth.models import User
-from django.core.files import File
-from django.core.files.base import ContentFile
-from judge_client.client import JudgeClient, Submit
-from PIL import Image
+from django.core.cache import cache
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db.models.fields.files import FieldFile
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from PIL import Image, ImageOps
+from pygments import highlight as pyg_highlight
+from pygments.formatters.html import HtmlFormatter
+from pygments.lexers import get_lexer_by_name, get_lexer_for_filename, guess_lexer
+from pygments.util import ClassNotFound
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
 
 JSON: TypeAlias = dict[str, "JSON"] | list["JSON"] | str | int | float | bool | None
 
+HIGHLIGHT_MAX_SIZE = 256 * 1024
+"""Files larger than this (in bytes) are shown as plain text instead of being highlighted."""
+HIGHLIGHT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
 
-def combine_images_into_pdf(files):
+
+PDF_PAGE_DPI = 200
+"""Resolution of pages in PDFs combined from images."""
+
+
+def get_pdf_page_size() -> tuple[int, int]:
+    """
+    Returns size of an A4 page in pixels at PDF_PAGE_DPI.
+    """
+    width, height = A4
+    return round(width / 72 * PDF_PAGE_DPI), round(height / 72 * PDF_PAGE_DPI)
+
+
+def render_pdf_page(file, page_size: tuple[int, int]) -> Image.Image:
+    """
+    Decodes an image scaled to fit `page_size` and centers it on a white page.
+    """
+    with Image.open(file) as img:
+        # Let the decoder downscale (JPEG) before the full image is decoded.
+        img.draft("RGB", page_size)
+        img = img.convert("RGB")
+
+    img = ImageOps.contain(img, page_size)
+
+    page = Image.new("RGB", page_size, "white")
+    page.paste(img, ((page_size[0] - img.width) // 2, (page_size[1] - img.height) // 2))
+    return page
+
+
+def render_pdf_pages(
+    files, page_size: tuple[int, int], workers: int
+) -> Iterator[Image.Image]:
+    """
+    Renders pages for `files` concurrently and yields them in the original order.
+
+    Decoding and scaling release the GIL, so threads run in parallel. At most
+    `workers` pages are rendered ahead of the consumer.
+    """
+    if workers <= 1:
+        for file in files:
+            yield render_pdf_page(file, page_size)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: deque[Future[Image.Image]] = deque()
+        for file in files:
+            pending.append(executor.submit(render_pdf_page, file, page_size))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def combine_images_into_pdf(
+    files,
+    progress: Callable[[int, int], None] | None = None,
+    workers: int | None = None,
+) -> TemporaryUploadedFile:
     """
     Combines multiple image files into a single PDF.
     Assumes all files are images; validation should be handled in the form.
+
+    Pages are rendered by `workers` threads (SUBMIT_PDF_WORKERS by default) and
+    every page is appended to a temporary file right away, so memory usage does
+    not depend on the number of pages. Storage moves the returned file into place
+    when saving.
+
+    If given, `progress` is called with (processed pages, total pages) after every page.
     """
+    if workers is None:
+        workers = settings.SUBMIT_PDF_WORKERS
+
+    output = TemporaryUploadedFile("combined_files.pdf", "application/pdf", 0, None)
+    page_size = get_pdf_page_size()
+
     try:
-        output = BytesIO()
-        pdf_canvas = canvas.Canvas(output, pagesize=A4)
-        width, height = A4
+        pages = render_pdf_pages(files, page_size, workers)
+        for i, page in enumerate(pages):
+            page.save(output.file, format="PDF", resolution=PDF_PAGE_DPI, append=i > 0)
+            page.close()
 
-        for file in files:
-            img = Image.open(file)
-            img = img.convert("RGB")  # Convert to RGB mode
-
-            # Scale the image to fit the page
-            img_width, img_height = img.size
-            scale = min(width / img_width, height / img_height)
-            scaled_width = img_width * scale
-            scaled_height = img_height * scale
-            x_offset = (width - scaled_width) / 2
-            y_offset = (height - scaled_height) / 2
-
-            # Draw the image on the PDF canvas
-            img_path = BytesIO()
-            img.save(img_path, format="JPEG")
-            img_path.seek(0)
-            pdf_canvas.drawImage(
-                ImageReader(img_path), x_offset, y_offset, scaled_width, scaled_height
-            )
-            pdf_canvas.showPage()  # Start a new page
-
-        pdf_canvas.save()
-
-        # Create a Django ContentFile from the output PDF
+            if progress is not None:
+                progress(i + 1, len(files))
+
+        output.size = output.file.tell()
         output.seek(0)
-        pdf_content = ContentFile(output.read(), name="combined_files.pdf")
-        return pdf_content
+        return output
     except Exception as e:
+        output.close()
         raise RuntimeError(f"Failed to combine files into a PDF: {e}")
 
 
-def enqueue_judge_submit(namespace: str, task: str, user: User, file: File) -> Submit:
-    judge = JudgeClient(judge_token=settings.JUDGE_TOKEN, judge_url=settings.JUDGE_URL)
+def get_highlight_cache_key(file: FieldFile, language: str | None = None) -> str:
+    modified = file.storage.get_modified_time(file.name or "").timestamp()
+    return f"highlight/{file.name}/{modified}/{language or ''}"
+
+
+def highlight_file(file: FieldFile, language: str | None = None) -> str:
+    """
+    Returns HTML with syntax highlighted contents of `file`.
+
+    The output is cached by file path and modification time. Of files larger than
+    HIGHLIGHT_MAX_SIZE, only the beginning is read and rendered as plain text.
+    """
+    if file.size > HIGHLIGHT_MAX_SIZE:
+        with file.open("rb") as f:
+            data = f.read(HIGHLIGHT_MAX_SIZE)
+        try:
+            # Not final, so a character cut at the end is dropped instead of failing.
+            code = codecs.getincrementaldecoder("utf-8")().decode(data)
+        except UnicodeDecodeError:
+            return render_to_string("public/_protocol_binary.html")
+        # Not cached, the bounded read is cheap and the text would take up the cache.
+        return (
+            f'<div class="codehilite"><pre>{escape(code)}</pre></div>'
+            '<p class="text-muted">Súbor je príliš veľký, zobrazuje sa iba jeho začiatok.</p>'
+        )
+
+    key = get_highlight_cache_key(file, language)
+    if (html := cache.get(key)) is not None:
+        return html
+
+    try:
+        with file.open("r") as f:
+            code = f.read()
+    except UnicodeDecodeError:
+        return render_to_string("public/_protocol_binary.html")
+
+    if not language:
+        language = get_extension(file.name or "").lstrip(".")
+
+    try:
+        lexer = get_lexer_by_name(language)
+    except ClassNotFound:
+        try:
+            lexer = get_lexer_for_filename(file.name or "")
+        except ClassNotFound:
+            lexer = guess_lexer(code)
+
+    html = pyg_highlight(code, lexer, HtmlFormatter(cssclass="codehilite"))
 
-    return judge.submit(
-        namespace=namespace,
-        task=task,
-        external_user_id=user.username,
-        filename=file.name or "",
-        program=file.read(),
-    )
+    cache.set(key, html, timeout=HIGHLIGHT_CACHE_TIMEOUT)
+    return html
 
 
 def get_extension(path: str | Path) -> str:
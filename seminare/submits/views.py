@@ -1,9 +1,10 @@
 import json
 import os.path
-from decimal import Decimal
 
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils.decorators import method_decorator
@@ -11,13 +12,23 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import DetailView, View
 from django.views.generic.edit import FormView
 
-from seminare import settings
 from seminare.problems.models import Problem
 from seminare.rules import RuleEngine
 from seminare.submits.forms import FileFieldForm, JudgeSubmitForm, TextSubmitForm
-from seminare.submits.models import BaseSubmit, FileSubmit, JudgeSubmit, TextSubmit
-from seminare.submits.tasks import mail_reviewer
-from seminare.submits.utils import combine_images_into_pdf, enqueue_judge_submit
+from seminare.submits.judge import save_judge_reports
+from seminare.submits.models import (
+    BaseSubmit,
+    FileSubmit,
+    JudgeSubmit,
+    TextSubmit,
+    submit_file_filepath,
+)
+from seminare.submits.tasks import (
+    build_submit_pdf,
+    highlight_program,
+    notify_reviewer,
+    send_to_judge,
+)
 from seminare.users.mixins.permissions import ContestOrganizerRequired
 from seminare.users.models import User
 
@@ -44,11 +55,14 @@ class SubmitCreateView(FormView):
 
         return super().dispatch(request, *args, **kwargs)
 
+    def should_notify_reviewer(self) -> bool:
+        return self.problem.reviewer is not None
+
     def form_valid(self, form):
         self.submit.save()
 
-        if self.problem.reviewer is not None:
-            mail_reviewer.delay(self.submit.submit_id)
+        if self.should_notify_reviewer():
+            notify_reviewer(self.problem.reviewer_id, self.submit.submit_id)  # pyright: ignore
 
         return super().form_valid(form)
 
@@ -60,20 +74,37 @@ class FileSubmitCreateView(SubmitCreateView):
     form_class = FileFieldForm
     submit_type = FileSubmit
 
+    def should_notify_reviewer(self) -> bool:
+        # Reviewer of a processing submit is notified once the PDF is built.
+        assert isinstance(self.submit, FileSubmit)
+        return (
+            super().should_notify_reviewer()
+            and self.submit.state == FileSubmit.State.READY
+        )
+
     def form_valid(self, form):
         files = form.cleaned_data["files"]
-        final_file = files[0]
         _, ext = os.path.splitext(files[0].name)
-        if len(files) > 1 or ext.lower() in {".jpg", ".jpeg", ".png"}:
-            final_file = combine_images_into_pdf(files)
 
         self.submit = FileSubmit(
-            file=final_file,
             problem=self.problem,
             enrollment=self.enrollment,
         )
 
-        return super().form_valid(form)
+        if len(files) == 1 and ext.lower() not in {".jpg", ".jpeg", ".png"}:
+            self.submit.file = files[0]
+            return super().form_valid(form)
+
+        # Images are combined into a PDF in the background.
+        images = [
+            default_storage.save(submit_file_filepath(self.submit, file.name), file)
+            for file in files
+        ]
+        self.submit.state = FileSubmit.State.PROCESSING
+
+        response = super().form_valid(form)
+        build_submit_pdf.delay(self.submit.id, images)
+        return response
 
 
 class JudgeSubmitCreateView(SubmitCreateView):
@@ -81,24 +112,16 @@ class JudgeSubmitCreateView(SubmitCreateView):
     submit_type = JudgeSubmit
 
     def form_valid(self, form):
-        program = form.cleaned_data["program"]
-
-        submit = enqueue_judge_submit(
-            self.problem.judge_namespace,
-            self.problem.judge_task,
-            self.request.user,
-            program,
-        )
-
         self.submit = JudgeSubmit(
-            program=program,
+            program=form.cleaned_data["program"],
             problem=self.problem,
-            judge_id=submit.public_id,
-            protocol_key=submit.protocol_key,
             enrollment=self.enrollment,
         )
 
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        send_to_judge.delay(self.submit.id)
+        highlight_program.delay(self.submit.id)
+        return response
 
 
 class TextSubmitCreateView(SubmitCreateView):
@@ -167,16 +190,12 @@ class JudgeReportView(View):
                 {"errors": "Wrong access token.", "ok": False}, status=403
             )
 
-        submit: JudgeSubmit = get_object_or_404(
-            JudgeSubmit, judge_id=json_data["public_id"]
-        )
-
-        submit.protocol = json_data["protocol"]
-
-        if "final_score" in submit.protocol:
-            max_points = submit.problem.judge_points
-            submit.score = Decimal(str(submit.protocol["final_score"])) * max_points
+        # The judge can send either a single report or a batch of them in "reports".
+        if "reports" in json_data:
+            missing = save_judge_reports(json_data["reports"])
+            return JsonResponse({"ok": True, "missing": sorted(missing)})
 
-        submit.save()
+        if save_judge_reports([json_data]):
+            raise Http404("No JudgeSubmit matches the given query.")
 
         return JsonResponse({"ok": True})
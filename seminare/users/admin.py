@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
+from .logic.permissions import invalidate_contest_roles
 from .models import ContestRole, Enrollment, School, User
 
 
@@ -31,3 +32,15 @@ class ContestRoleAdmin(admin.ModelAdmin):
     list_display = ["user", "contest", "role"]
     list_filter = ["role"]
     search_fields = ["user__username", "contest__name"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_contest_roles()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_contest_roles()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidate_contest_roles()
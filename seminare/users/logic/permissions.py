@@ -1,9 +1,47 @@
 from collections import defaultdict
 
+from django.core.cache import cache
 from django.core.exceptions import SuspiciousOperation
 
 from seminare.contests.models import Contest
 from seminare.users.models import ContestRole, User
+from seminare.utils import (
+    bump_cache_version,
+    get_cache_version,
+    get_versioned_cache_timeout,
+)
+
+CONTEST_ROLES_VERSION_KEY = "contest_roles/version"
+CONTEST_ROLES_CACHE_TIMEOUT = 60 * 60
+
+
+def get_user_contest_roles(user: User) -> dict[int, ContestRole]:
+    """
+    Returns a mapping contest_id -> ContestRole with all roles of `user`.
+
+    Roles are stored in the shared cache and are valid until invalidate_contest_roles() is called.
+    Without a shared cache, other processes would keep revoked roles, so they expire within seconds.
+    """
+    key = f"contest_roles/{get_cache_version(CONTEST_ROLES_VERSION_KEY)}/{user.id}"
+    roles = cache.get(key)
+
+    if roles is None:
+        roles = {
+            role.contest_id: role
+            for role in ContestRole.objects.filter(user_id=user.id)
+        }
+        cache.set(
+            key, roles, timeout=get_versioned_cache_timeout(CONTEST_ROLES_CACHE_TIMEOUT)
+        )
+
+    return roles
+
+
+def invalidate_contest_roles() -> None:
+    """
+    Invalidates cached roles of all users. Must be called after any ContestRole change.
+    """
+    bump_cache_version(CONTEST_ROLES_VERSION_KEY)
 
 
 def get_contest_role(user: User, contest: Contest) -> ContestRole | None:
@@ -19,7 +57,7 @@ def get_contest_role(user: User, contest: Contest) -> ContestRole | None:
     else:
         role_cache = {}
 
-    role = ContestRole.objects.filter(user=user, contest=contest).first()
+    role = get_user_contest_roles(user).get(contest.id)
     role_cache[contest.id] = role
     setattr(user, "_contest_role_cache", role_cache)
     return role
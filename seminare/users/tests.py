@@ -1 +1,63 @@
-# Create your tests here.
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from seminare.contests.models import Contest
+from seminare.users.logic.permissions import (
+    get_contest_role,
+    invalidate_contest_roles,
+    is_contest_organizer,
+)
+from seminare.users.models import ContestRole, User
+from seminare.utils import LOCAL_CACHE_TIMEOUT, get_versioned_cache_timeout
+
+
+class ContestRoleCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        site = Site.objects.create(domain="test.localhost", name="test.localhost")
+        cls.contest = Contest.objects.create(
+            name="Test", short_name="test", contact_email="test@example.com", site=site
+        )
+        cls.user = User.objects.create(username="organizer")
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def fresh_user(self) -> User:
+        return User.objects.get(id=self.user.id)
+
+    def test_roles_are_shared_between_user_instances(self):
+        ContestRole.objects.create(
+            user=self.user, contest=self.contest, role=ContestRole.Role.ORGANIZER
+        )
+        self.assertTrue(is_contest_organizer(self.fresh_user(), self.contest))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_contest_organizer(user, self.contest))
+
+    def test_invalidation(self):
+        self.assertIsNone(get_contest_role(self.fresh_user(), self.contest))
+
+        ContestRole.objects.create(
+            user=self.user, contest=self.contest, role=ContestRole.Role.ADMINISTRATOR
+        )
+        self.assertIsNone(get_contest_role(self.fresh_user(), self.contest))
+
+        invalidate_contest_roles()
+        role = get_contest_role(self.fresh_user(), self.contest)
+        self.assertIsNotNone(role)
+        assert role is not None
+        self.assertEqual(role.role, ContestRole.Role.ADMINISTRATOR)
+
+    def test_local_cache_timeout(self):
+        local = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with override_settings(CACHES=local):
+            self.assertEqual(get_versioned_cache_timeout(3600), LOCAL_CACHE_TIMEOUT)
+
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(get_versioned_cache_timeout(3600), 3600)
@@ -1,23 +1,111 @@
 import gzip
+import hashlib
 import json
+import time
+import zipfile
 from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Protocol
 
+import django_rq
 from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files import File
 from django.core.mail import EmailMultiAlternatives
 from django.http import FileResponse, HttpResponse
 from django.template.loader import render_to_string
 
 from seminare.contests.models import Contest
 
+ZIP_STORED_EXTENSIONS = {
+    ".pdf",
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".webp",
+    ".zip",
+    ".gz",
+}
+"""Extensions of already compressed files, which are stored in ZIP archives as they are."""
+ZIP_CHUNK_SIZE = 64 * 1024
+
+LOCAL_CACHE_TIMEOUT = 5
+"""Seconds for which version-invalidated entries are kept in a cache local to one process."""
+
 
 def compress_data(data: dict) -> bytes:
-    return gzip.compress(json.dumps(data).encode("utf-8"))
+    # Without a timestamp, equal data is compressed to equal bytes.
+    return gzip.compress(json.dumps(data).encode("utf-8"), mtime=0)
 
 
 def decompress_data(data: bytes) -> dict:
     return json.loads(gzip.decompress(data).decode("utf-8"))
 
 
+def get_cache_version(key: str) -> int:
+    """
+    Returns the current value of a version counter stored in the cache under `key`.
+
+    Version counters are used to build cache keys, so that bumping the version
+    invalidates every entry built from the previous one.
+    """
+    version = cache.get(key)
+    if version is None:
+        # Seed with current time, so an evicted counter never returns to a previous value.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_cache_version(key: str) -> None:
+    """
+    Increments the version counter stored in the cache under `key`.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def is_cache_shared() -> bool:
+    """
+    Returns whether the default cache is shared between processes, so that
+    bump_cache_version() in one process invalidates entries in all of them.
+    """
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def get_versioned_cache_timeout(timeout: int) -> int:
+    """
+    Returns the timeout for an entry invalidated by bump_cache_version().
+
+    A local cache does not see bumps made by other processes, so entries there
+    expire after LOCAL_CACHE_TIMEOUT instead of `timeout`.
+    """
+    if is_cache_shared():
+        return timeout
+    return min(timeout, LOCAL_CACHE_TIMEOUT)
+
+
+def set_job_progress(key: str, done: int, total: int, timeout: int) -> None:
+    """
+    Stores progress of a background job in Redis, where web processes read it.
+    """
+    django_rq.get_connection().set(key, f"{done}/{total}", ex=timeout)
+
+
+def get_job_progress(key: str) -> tuple[int, int] | None:
+    """
+    Returns (done, total) stored by set_job_progress(), or None.
+    """
+    progress = django_rq.get_connection().get(key)
+    if progress is None:
+        return None
+    done, total = progress.split(b"/")
+    return int(done), int(total)
+
+
 def sendfile(filename: str | Path, as_attachement: bool = False):
     filename = str(filename)
 
@@ -31,15 +119,118 @@ def sendfile(filename: str | Path, as_attachement: bool = False):
     return response
 
 
-def send_mail(
+def get_file_hash(file: File) -> str:
+    """
+    Returns SHA-256 hex digest of the file contents, read in chunks. The file is left open.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Openable(Protocol):
+    def open(self, mode: str): ...
+
+
+class _ChunkBuffer:
+    """
+    Write-only file collecting data written by ZipFile until it is taken.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def get_zip_info(name: str) -> zipfile.ZipInfo:
+    """
+    Returns ZipInfo for a new entry. Files with ZIP_STORED_EXTENSIONS are stored,
+    other entries are deflated.
+    """
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    if Path(name).suffix.lower() in ZIP_STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+ZipContent = str | bytes | Openable | BinaryIO | Iterable[str | bytes]
+
+
+def write_zip_entry(
+    zip_file: zipfile.ZipFile, info: zipfile.ZipInfo, content: ZipContent
+) -> Iterator[None]:
+    """
+    Writes `content` into the archive, yielding after every chunk of a file.
+
+    Content is text, bytes, a file object, a file (FieldFile, Path) that is opened
+    and read in chunks, or an iterable of text or bytes chunks, e.g. a generator.
+    """
+    with zip_file.open(info, "w") as entry:
+        if isinstance(content, str):
+            entry.write(content.encode())
+        elif isinstance(content, bytes):
+            entry.write(content)
+        elif hasattr(content, "read"):
+            while chunk := content.read(ZIP_CHUNK_SIZE):  # pyright: ignore
+                entry.write(chunk)
+                yield
+        elif hasattr(content, "open"):
+            with content.open("rb") as file:  # pyright: ignore
+                while chunk := file.read(ZIP_CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield
+        else:
+            for chunk in content:  # pyright: ignore
+                entry.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                yield
+
+
+def stream_zip(entries: Iterable[tuple[str, ZipContent]]) -> Iterator[bytes]:
+    """
+    Yields a ZIP archive of `entries` chunk by chunk, e.g. for a StreamingHttpResponse.
+
+    Entries are pairs of archive name and content (see write_zip_entry). Files are read
+    in chunks, so memory use does not depend on the size of the archive.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, content in entries:
+            for _ in write_zip_entry(zip_file, get_zip_info(name), content):
+                if data := buffer.take():
+                    yield data
+
+            if data := buffer.take():
+                yield data
+
+    yield buffer.take()
+
+
+def build_mail(
     emails: list[str],
     subject: str,
     template_name: str,
     contest: Contest,
     context: dict = {},
     reply_to: list[str] | None = None,
-):
-    context["contest"] = contest
+) -> EmailMultiAlternatives:
+    """
+    Renders emails/<template_name>.txt and .html into a message sent in the name of the contest.
+    """
+    context = {**context, "contest": contest}
 
     text_content = render_to_string(f"emails/{template_name}.txt", context)
     html_content = render_to_string(f"emails/{template_name}.html", context)
@@ -53,5 +244,15 @@ def send_mail(
     )
 
     email.attach_alternative(html_content, "text/html")
+    return email
 
-    email.send()
+
+def send_mail(
+    emails: list[str],
+    subject: str,
+    template_name: str,
+    contest: Contest,
+    context: dict = {},
+    reply_to: list[str] | None = None,
+):
+    build_mail(emails, subject, template_name, contest, context, reply_to).send()